@@ -0,0 +1,246 @@
+# bench_api.py
+# Reproducible API / WebSocket benchmark: local mongod seeded at a fixed scale, stub RPC,
+# the real FastAPI app under uvicorn, and JSON results that can be diffed between commits.
+#
+#   cd backend && python -m benchmarks.bench_api --scale 1m --output bench-1m.json
+#   python -m benchmarks.bench_api --scale 1m --compare bench-1m.json
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+import websockets
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.stub_rpc import start_stub
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+TOKEN_CONTRACT = "9BB6NFEcjBCtnNLFko2FqVQBq8HHM13kCyYcdQbgpump"
+SEED = 42
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    arr = np.asarray(samples_ms)
+    return {
+        "count": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p90_ms": round(float(np.percentile(arr, 90)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+async def ensure_seeded(mongo_url: str, db_name: str, count: int, wallets: int):
+    os.environ.setdefault("MONGO_URL", mongo_url)
+    import seed_db
+
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    try:
+        existing = await db.realtime_transactions.estimated_document_count()
+        if existing >= count:
+            print(f"[seed] {db_name} already has {existing} transactions", file=sys.stderr)
+        else:
+            holders = await seed_db.seed_top_holders(db)
+            await seed_db.seed_transactions(db, count, wallets, days=7, seed=SEED, batch_size=10_000,
+                                            concurrency=4, zipf=1.1, extra_wallets=holders)
+        sample = await db.realtime_transactions.find_one({}, {"wallet": 1})
+        return sample["wallet"] if sample else None
+    finally:
+        client.close()
+
+
+def start_server(port: int, mongo_url: str, db_name: str, rpc_port: int):
+    env = dict(os.environ,
+               MONGO_URL=mongo_url,
+               DB_NAME=db_name,
+               SOLANA_RPC_URL=f"http://127.0.0.1:{rpc_port}/",
+               SOLANA_WS_URL=f"ws://127.0.0.1:{rpc_port}/",
+               TOKEN_CONTRACT=TOKEN_CONTRACT,
+               # every benchmark client comes from 127.0.0.1: per-address admission limits would throttle the load itself
+               RATE_LIMIT_PER_SECOND="0",
+               QUERY_PER_CLIENT="0",
+               WS_MAX_CONNECTIONS_PER_IP="0")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(BACKEND_DIR), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+
+
+async def wait_ready(base: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base}/api/status") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError("server did not become ready")
+
+
+async def load_endpoint(base: str, path: str, duration: float, concurrency: int):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def worker(session):
+        nonlocal errors
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                async with session.get(f"{base}{path}") as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        errors += 1
+                        continue
+            except aiohttp.ClientError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"path": path, "concurrency": concurrency, "duration_s": round(elapsed, 2),
+            "throughput_rps": round(len(latencies) / elapsed, 1), "errors": errors, **percentiles(latencies)}
+
+
+async def websocket_fanout(base: str, clients: int, duration: float):
+    """Open `clients` sockets and measure send->receive delay of broadcast messages."""
+    ws_url = base.replace("http://", "ws://") + "/ws/transactions"
+    delays = {"new_transaction": [], "dashboard_update": []}
+    received = 0
+
+    async def client():
+        nonlocal received
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            end = time.monotonic() + duration
+            while (remaining := end - time.monotonic()) > 0:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                now = datetime.utcnow()
+                msg = json.loads(raw)
+                received += 1
+                if msg.get("type") in delays and msg.get("timestamp"):
+                    sent = datetime.fromisoformat(msg["timestamp"])
+                    delays[msg["type"]].append((now - sent).total_seconds() * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    return {"clients": clients, "duration_s": round(elapsed, 2), "messages": received,
+            "messages_per_s": round(received / elapsed, 1),
+            **{f"{kind}_delay": percentiles(samples) for kind, samples in delays.items()}}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(BACKEND_DIR),
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path: str):
+    baseline = json.loads(Path(baseline_path).read_text())
+    base_by_path = {r["path"]: r for r in baseline.get("endpoints", [])}
+    print(f"\nvs {baseline.get('revision')} ({baseline_path}):", file=sys.stderr)
+    for r in current["endpoints"]:
+        b = base_by_path.get(r["path"])
+        if not b or not b.get("count") or not r.get("count"):
+            continue
+        print(f"  {r['path']:<50} rps {b['throughput_rps']:>8} -> {r['throughput_rps']:>8}   "
+              f"p99 {b['p99_ms']:>8} -> {r['p99_ms']:>8} ms", file=sys.stderr)
+
+
+async def run(args):
+    count = SCALES[args.scale]
+    db_name = args.db_name or f"tokenwise_bench_{args.scale}"
+    wallet = await ensure_seeded(args.mongo_url, db_name, count, wallets=max(1000, count // 20))
+
+    runner, stub = await start_stub(args.rpc_port, accounts=args.rpc_accounts)
+    server = start_server(args.port, args.mongo_url, db_name, args.rpc_port)
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        await wait_ready(base)
+        await asyncio.sleep(args.warmup)
+        paths = [
+            "/api/analytics/dashboard",
+            "/api/analytics/volume",
+            f"/api/token-holders/{TOKEN_CONTRACT}",
+            f"/api/wallets/{wallet}/transactions",
+        ]
+        endpoints = []
+        for path in paths:
+            result = await load_endpoint(base, path, args.duration, args.concurrency)
+            endpoints.append(result)
+            print(f"  {path:<50} {result['throughput_rps']:>8} rps  p50 {result.get('p50_ms')} ms  "
+                  f"p99 {result.get('p99_ms')} ms  errors {result['errors']}", file=sys.stderr)
+        fanout = await websocket_fanout(base, args.ws_clients, args.ws_duration)
+        print(f"  websocket fan-out x{args.ws_clients}: {fanout['messages_per_s']} msg/s", file=sys.stderr)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        await runner.cleanup()
+
+    return {
+        "revision": git_revision(),
+        "scale": args.scale,
+        "transactions": count,
+        "concurrency": args.concurrency,
+        "timestamp": datetime.utcnow().isoformat(),
+        "rpc_calls": stub.calls,
+        "endpoints": endpoints,
+        "websocket": fanout,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TokenWise API/WebSocket benchmark")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--mongo-url", default=os.environ.get("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", help="Defaults to tokenwise_bench_<scale>; reused across runs once seeded.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpc-port", type=int, default=8899)
+    parser.add_argument("--rpc-accounts", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load per endpoint.")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--ws-clients", type=int, default=200)
+    parser.add_argument("--ws-duration", type=float, default=20.0)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    parser.add_argument("--compare", help="Print deltas against a previous JSON result.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_archive.py
+# Generates a synthetic date-partitioned Parquet archive and times the offline analytics queries.
+#
+#   cd backend && python -m benchmarks.bench_archive --rows 50000000 --days 90
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.archive import partition_dir
+from core.historical import HistoricalAnalytics
+
+PROTOCOLS = ["Jupiter", "Raydium", "Orca", "Saber", "Serum"]
+PROTOCOL_WEIGHTS = [0.45, 0.3, 0.15, 0.05, 0.05]
+
+
+def generate(root: Path, rows: int, days: int, wallets: int, chunk_rows: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    wallet_names = np.array([f"W{i:08d}{'x' * 35}" for i in range(wallets)])
+    # power-law activity: a few wallets produce most of the flow
+    wallet_weights = 1.0 / np.arange(1, wallets + 1) ** 1.1
+    wallet_weights /= wallet_weights.sum()
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    per_day = rows // days
+    written = 0
+    for d in range(days):
+        day = start + timedelta(days=d)
+        target = partition_dir(root, day)
+        target.mkdir(parents=True, exist_ok=True)
+        n_day = per_day if d < days - 1 else rows - written
+        part = 0
+        for offset in range(0, n_day, chunk_rows):
+            n = min(chunk_rows, n_day - offset)
+            seconds = np.sort(rng.integers(0, 86400, n))
+            frame = pd.DataFrame({
+                "timestamp": pd.Timestamp(day) + pd.to_timedelta(seconds, unit="s"),
+                "signature": pd.Series(np.arange(written, written + n)).astype(str),
+                "wallet": pd.Categorical.from_codes(rng.choice(wallets, n, p=wallet_weights), wallet_names),
+                "token_address": pd.Categorical(["T"] * n),
+                "action_type": pd.Categorical.from_codes(rng.integers(0, 2, n), ["buy", "sell"]),
+                "protocol": pd.Categorical.from_codes(rng.choice(len(PROTOCOLS), n, p=PROTOCOL_WEIGHTS), PROTOCOLS),
+                "amount": rng.lognormal(4.0, 1.5, n),
+                "price": rng.lognormal(0.0, 0.1, n),
+                "slot": rng.integers(100_000_000, 200_000_000, n),
+                "block_time": rng.integers(1_700_000_000, 1_800_000_000, n),
+                "from_address": None,
+                "to_address": None,
+            })
+            frame.to_parquet(target / f"part-{part:05d}.parquet", engine="pyarrow", compression="zstd", index=False)
+            part += 1
+            written += n
+    return start
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--wallets", type=int, default=200_000)
+    parser.add_argument("--chunk-rows", type=int, default=2_000_000)
+    parser.add_argument("--dir", help="Reuse/keep an archive directory instead of a temporary one.")
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args()
+
+    root = Path(args.dir) if args.dir else Path(tempfile.mkdtemp(prefix="tokenwise-archive-"))
+    try:
+        results = {"rows": args.rows, "days": args.days, "wallets": args.wallets}
+        if not any(root.glob("date=*")):
+            gen_s, start = timed(generate, root, args.rows, args.days, args.wallets, args.chunk_rows)
+            results["generate_s"] = round(gen_s, 2)
+        results["archive_bytes"] = sum(p.stat().st_size for p in root.rglob("*.parquet"))
+
+        analytics = HistoricalAnalytics(str(root))
+        now = datetime.utcnow()
+        queries = {
+            "volume_90d_daily": lambda: analytics.volume(now - timedelta(days=90), now),
+            "volume_7d_hourly": lambda: analytics.volume(now - timedelta(days=7), now, freq="h"),
+            "protocol_share_30d": lambda: analytics.protocol_share(now - timedelta(days=30), now),
+            "top_accumulators_90d": lambda: analytics.top_wallets(now - timedelta(days=90), now, by="net_buy"),
+            "top_volume_1d": lambda: analytics.top_wallets(now - timedelta(days=1), now, by="volume"),
+        }
+        for name, query in queries.items():
+            elapsed, _ = timed(query)
+            results[f"{name}_s"] = round(elapsed, 3)
+            print(f"{name:>24}: {elapsed:8.3f}s", file=sys.stderr)
+
+        print(json.dumps(results, indent=2))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=2))
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# bench_clusters.py
+# Ingest rate, memory per edge and query latency of the transfer graph on a synthetic wallet population:
+# planted clusters of linked wallets, exchange-like hubs everyone trades with, and random noise transfers.
+#
+#   cd backend && python -m benchmarks.bench_clusters --wallets 200000 --edges 2000000
+import argparse
+import json
+import random
+import string
+import time
+import tracemalloc
+
+from core.clusters import SOL, TransferGraph
+
+B58 = "".join(c for c in string.ascii_letters + string.digits if c not in "0OIl")
+
+
+def make_edges(wallets: int, edges: int, cluster_size: int, hubs: int, hub_share: float, noise: float, seed: int = 7):
+    """Synthetic transfers as (source, destination, amount, asset) plus the planted clusters."""
+    rng = random.Random(seed)
+    pool = ["".join(rng.choices(B58, k=44)) for _ in range(wallets)]
+    hub_pool = ["".join(rng.choices(B58, k=44)) for _ in range(hubs)]
+    mints = ["".join(rng.choices(B58, k=44)) for _ in range(3)] + [SOL]
+    planted = [pool[i:i + cluster_size] for i in range(0, wallets, cluster_size)]
+    out = []
+    for _ in range(edges):
+        r = rng.random()
+        if hub_pool and r < hub_share:
+            pair = (rng.choice(hub_pool), rng.choice(pool))
+            if rng.random() < 0.5:
+                pair = pair[::-1]
+        elif r < hub_share + noise:
+            pair = (rng.choice(pool), rng.choice(pool))
+        else:
+            group = rng.choice(planted)
+            pair = (rng.choice(group), rng.choice(group))
+        out.append((pair[0], pair[1], round(rng.paretovariate(1.2) * 10, 6), rng.choice(mints)))
+    return out, planted
+
+
+def _timed(fn, samples):
+    started = time.perf_counter()
+    for arg in samples:
+        fn(arg)
+    return round((time.perf_counter() - started) / len(samples) * 1e6, 2)
+
+
+def _build(stream, args) -> TransferGraph:
+    graph = TransferGraph(max_edges=args.max_edges, hub_degree=args.hub_degree)
+    for source, destination, amount, asset in stream:
+        graph.add_transfer(source, destination, amount, asset)
+    return graph
+
+
+def run(args):
+    stream, planted = make_edges(args.wallets, args.edges, args.cluster_size, args.hubs, args.hub_share, args.noise)
+    started = time.perf_counter()
+    graph = _build(stream, args)
+    ingest = time.perf_counter() - started
+    # a separate traced build: tracing slows ingestion down too much to time it
+    tracemalloc.start()
+    traced_graph = _build(stream, args)
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced_graph
+
+    rng = random.Random(3)
+    sample = [rng.choice(group) for group in rng.sample(planted, min(args.queries, len(planted)))]
+    recovered = sum(len({graph.root(w) for w in group}) == 1 for group in planted)
+    stats = graph.stats()
+    return {
+        "wallets": args.wallets,
+        "edges": args.edges,
+        "graph": stats,
+        "ingest_seconds": round(ingest, 3),
+        "edges_per_second": round(args.edges / ingest),
+        "array_bytes_per_edge": round(stats["array_bytes"] / max(stats["edges"], 1), 1),
+        "traced_bytes_per_edge": round(traced / max(stats["edges"], 1), 1),
+        "planted_clusters": len(planted),
+        "planted_clusters_joined": round(recovered / len(planted), 4),
+        "query_us": {
+            "cluster_size": _timed(graph.cluster_size, sample),
+            "members": _timed(graph.members, sample),
+            "flows": _timed(graph.flows, sample),
+            "group_top_100": _timed(graph.group, [sample[i:i + 100] for i in range(0, len(sample), 100)] or [[]]),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfer graph / wallet clustering benchmark")
+    parser.add_argument("--wallets", type=int, default=200_000)
+    parser.add_argument("--edges", type=int, default=2_000_000)
+    parser.add_argument("--cluster-size", type=int, default=8, help="Wallets per planted cluster.")
+    parser.add_argument("--hubs", type=int, default=20, help="Exchange-like addresses trading with everyone.")
+    parser.add_argument("--hub-share", type=float, default=0.3, help="Fraction of transfers touching a hub.")
+    parser.add_argument("--noise", type=float, default=0.0005, help="Fraction of transfers between random wallets.")
+    parser.add_argument("--hub-degree", type=int, default=200)
+    parser.add_argument("--max-edges", type=int, default=5_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args()
+
+    out = json.dumps(run(args), indent=2)
+    print(out)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
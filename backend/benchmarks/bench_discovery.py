@@ -0,0 +1,122 @@
+# bench_discovery.py
+# Measures HTTP request latency on the event loop while a synthetic holder discovery runs,
+# with the aggregation inline on the loop, on a thread, and in the holder process pool.
+#
+#   cd backend && python -m benchmarks.bench_discovery --accounts 500000
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.bench_api import percentiles
+from benchmarks.stub_rpc import make_token_accounts
+from core.holder_pool import HolderPool, aggregate_payload
+
+
+async def _ping(request):
+    return web.json_response({"ok": True})
+
+
+async def measure(port: int, discovery, rounds: int, interval: float):
+    """Issue requests back to back while `discovery()` runs `rounds` times; returns latencies in ms."""
+    latencies = []
+    done = asyncio.Event()
+
+    async def client():
+        # fixed schedule, latency measured from the intended start so time spent
+        # waiting on a blocked loop counts against the request (no coordinated omission)
+        async with aiohttp.ClientSession() as session:
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                async with session.get(f"http://127.0.0.1:{port}/ping") as resp:
+                    await resp.read()
+                now = time.perf_counter()
+                latencies.append((now - scheduled) * 1000)
+                scheduled = max(scheduled + interval, now)
+                await asyncio.sleep(max(scheduled - now, 0))
+
+    async def run_discovery():
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await discovery()
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.2)
+        done.set()
+        return elapsed
+
+    elapsed, _ = await asyncio.gather(run_discovery(), client())
+    return elapsed, latencies
+
+
+async def run(args):
+    accounts = make_token_accounts("BenchMint", args.accounts)
+    payload = json.dumps({"jsonrpc": "2.0", "id": 1, "result": accounts}).encode()
+    del accounts
+    print(f"payload: {len(payload) / 1e6:.1f} MB, {args.accounts} token accounts", file=sys.stderr)
+
+    app = web.Application()
+    app.router.add_get("/ping", _ping)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    thread_pool = HolderPool(max_workers=0)
+    process_pool = HolderPool(max_workers=args.workers)
+    await process_pool.start()
+
+    async def inline():
+        aggregate_payload(payload, 6, args.top_n)
+
+    async def baseline():
+        await asyncio.sleep(0.5)
+
+    modes = {
+        "idle": baseline,
+        "inline": inline,
+        "thread": lambda: thread_pool.aggregate(payload, 6, args.top_n),
+        "process": lambda: process_pool.aggregate(payload, 6, args.top_n),
+    }
+    results = {"accounts": args.accounts, "payload_bytes": len(payload), "workers": args.workers, "modes": {}}
+    try:
+        for name, discovery in modes.items():
+            elapsed, latencies = await measure(args.port, discovery, args.rounds, args.interval)
+            stats = {"discovery_s": round(elapsed / args.rounds, 3), **percentiles(latencies)}
+            results["modes"][name] = stats
+            print(f"{name:>8}: discovery {stats['discovery_s']:7.3f}s   request p50 {stats.get('p50_ms')} ms  "
+                  f"p99 {stats.get('p99_ms')} ms  max {stats.get('max_ms')} ms", file=sys.stderr)
+    finally:
+        process_pool.shutdown()
+        await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency during holder discovery")
+    parser.add_argument("--accounts", type=int, default=300_000)
+    parser.add_argument("--top-n", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--interval", type=float, default=0.005, help="Pause between probe requests (s).")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--max-p99-ms", type=float,
+                        help="Exit non-zero if the process-pool p99 exceeds this (for CI gating).")
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.max_p99_ms is not None and results["modes"]["process"].get("p99_ms", 0) > args.max_p99_ms:
+        print(f"process-pool p99 above {args.max_p99_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
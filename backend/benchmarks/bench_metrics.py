@@ -0,0 +1,69 @@
+# bench_metrics.py
+# Measures what the /metrics instrumentation costs per request, against an identical uninstrumented app.
+#
+#   cd backend && python -m benchmarks.bench_metrics --requests 20000
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from core import metrics
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        metrics.instrument_app(app)
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id, "values": list(range(20))}
+
+    return app
+
+
+async def run_requests(app: FastAPI, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(200):
+            await client.get(f"/api/items/{i}")
+        start = time.perf_counter()
+        for i in range(n):
+            await client.get(f"/api/items/{i}")
+        return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    plain, instrumented = [], []
+    for _ in range(args.rounds):
+        plain.append(asyncio.run(run_requests(make_app(False), args.requests)))
+        instrumented.append(asyncio.run(run_requests(make_app(True), args.requests)))
+
+    child = metrics.RPC_LATENCY.labels("bench")
+    n = 1_000_000
+    start = time.perf_counter()
+    for _ in range(n):
+        child.observe(0.01)
+    observe_ns = (time.perf_counter() - start) / n * 1e9
+
+    base, inst = statistics.median(plain), statistics.median(instrumented)
+    print(json.dumps({
+        "request_us_plain": round(base * 1e6, 2),
+        "request_us_instrumented": round(inst * 1e6, 2),
+        "overhead_us_per_request": round((inst - base) * 1e6, 2),
+        "overhead_pct": round((inst - base) / base * 100, 2),
+        "histogram_observe_ns": round(observe_ns, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
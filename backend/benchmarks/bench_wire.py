@@ -0,0 +1,112 @@
+# bench_wire.py
+# Bytes per message on /ws/transactions for each wire format, with and without permessage-deflate,
+# over a synthetic stream of new_transaction and dashboard_update messages.
+#
+#   cd backend && python -m benchmarks.bench_wire --messages 5000 --wallets 2000
+import argparse
+import json
+import random
+import string
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from core.wire import AddressBook, ClientCodec, WireFormat, msgpack
+
+PROTOCOLS = ["Jupiter", "Raydium", "Orca", "Saber", "Serum"]
+B58 = "".join(c for c in string.ascii_letters + string.digits if c not in "0OIl")
+
+
+def _address(rng: random.Random) -> str:
+    return "".join(rng.choice(B58) for _ in range(44))
+
+
+def make_stream(messages: int, wallets: int, dashboard_every: int, seed: int = 11):
+    rng = random.Random(seed)
+    pool = [_address(rng) for _ in range(wallets)]
+    mint = _address(rng)
+    now = datetime(2025, 1, 1)
+    recent = []
+    stream = []
+    for i in range(messages):
+        now += timedelta(milliseconds=rng.randint(5, 500))
+        tx = {
+            "_id": "".join(rng.choice("0123456789abcdef") for _ in range(24)),
+            "signature": "".join(rng.choice(B58) for _ in range(88)),
+            "timestamp": now.isoformat(),
+            "wallet": rng.choice(pool[:max(wallets // 10, 1)] if rng.random() < 0.8 else pool),
+            "token_address": mint,
+            "amount": round(rng.paretovariate(1.5) * 100, 6),
+            "action_type": rng.choice(["buy", "sell"]),
+            "protocol": rng.choice(PROTOCOLS),
+            "block_time": int(now.timestamp()),
+            "slot": 250_000_000 + i,
+            "from_address": None, "to_address": None, "pre_balance": None, "post_balance": None,
+            "price": round(rng.uniform(0.9, 1.1), 6),
+        }
+        recent = [tx] + recent[:19]
+        stream.append(json.dumps({"type": "new_transaction", "data": tx, "timestamp": now.isoformat()}))
+        if dashboard_every and i % dashboard_every == dashboard_every - 1:
+            stream.append(json.dumps({
+                "type": "dashboard_update", "token": mint, "monitoring_active": True,
+                "top_holders": [{"owner": w, "address": _address(rng), "balance": 1e6 / (k + 1), "ui_amount": 1e6 / (k + 1),
+                                 "percentage": 10.0 / (k + 1), "decimals": 6} for k, w in enumerate(pool[:10])],
+                "recent_transactions": recent,
+                "most_active_wallets": [{"wallet_address": w, "tx_count": 100 - k} for k, w in enumerate(pool[:10])],
+                "protocol_usage": [{"_id": p, "count": 100} for p in PROTOCOLS],
+                "timestamp": now.isoformat(),
+            }))
+    return stream
+
+
+def measure(stream, encoding: str, addresses: bool):
+    wire = WireFormat(encoding, addresses, AddressBook())
+    codec = ClientCodec(wire)
+    # permessage-deflate with context takeover: one raw deflate stream, sync-flushed per message (RFC 7692)
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+    raw_bytes = deflated_bytes = frames = 0
+    started = time.perf_counter()
+    for message in stream:
+        payload, ids = wire.encode(message)
+        for frame in filter(None, (codec.definitions(ids) if ids else None, payload)):
+            data = frame if isinstance(frame, bytes) else frame.encode()
+            raw_bytes += len(data)
+            deflated_bytes += len(deflate.compress(data) + deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+            frames += 1
+    encode_us = (time.perf_counter() - started) / len(stream) * 1e6
+    return {
+        "format": wire.name,
+        "frames": frames,
+        "bytes_per_message": round(raw_bytes / len(stream), 1),
+        "deflated_bytes_per_message": round(deflated_bytes / len(stream), 1),
+        "encode_and_deflate_us_per_message": round(encode_us, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket wire format size benchmark")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--wallets", type=int, default=2000)
+    parser.add_argument("--dashboard-every", type=int, default=25,
+                        help="One dashboard_update per this many new_transaction messages (0 = none).")
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args()
+
+    stream = make_stream(args.messages, args.wallets, args.dashboard_every)
+    formats = [("json", False), ("json", True)]
+    if msgpack is not None:
+        formats += [("msgpack", False), ("msgpack", True)]
+    results = [measure(stream, encoding, addresses) for encoding, addresses in formats]
+    baseline = results[0]["bytes_per_message"]
+    for r in results:
+        r["vs_json"] = round(r["bytes_per_message"] / baseline, 3)
+        r["deflated_vs_json"] = round(r["deflated_bytes_per_message"] / baseline, 3)
+    out = json.dumps({"messages": len(stream), "wallets": args.wallets, "results": results}, indent=2)
+    print(out)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(out)
+
+
+if __name__ == "__main__":
+    main()
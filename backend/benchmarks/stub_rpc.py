@@ -0,0 +1,98 @@
+# stub_rpc.py
+# Minimal Solana JSON-RPC stand-in for benchmarks: canned, deterministic answers with no rate limits.
+#
+#   python -m benchmarks.stub_rpc --port 8899 --accounts 50000
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+SPL_TOKEN_DECIMALS = 6
+
+
+def make_token_accounts(mint: str, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    accounts = []
+    for i in range(count):
+        # heavy-tailed balances so there is a clear top-holder set
+        amount = int(rng.paretovariate(1.2) * 10 ** SPL_TOKEN_DECIMALS * 1000)
+        accounts.append({
+            "pubkey": f"StubAcct{i:010d}{'A' * 26}",
+            "account": {"data": {"parsed": {"info": {
+                "mint": mint,
+                "owner": f"StubOwner{i % max(count // 2, 1):010d}{'B' * 25}",
+                "tokenAmount": {"amount": str(amount), "decimals": SPL_TOKEN_DECIMALS},
+            }}}},
+        })
+    return accounts
+
+
+class StubRpc:
+    def __init__(self, accounts: int = 10000, latency_ms: float = 0.0):
+        self.accounts = accounts
+        self.latency_ms = latency_ms
+        self.calls = {}
+        self._accounts_cache = {}
+
+    def _program_accounts(self, mint: str):
+        if mint not in self._accounts_cache:
+            self._accounts_cache[mint] = make_token_accounts(mint, self.accounts)
+        return self._accounts_cache[mint]
+
+    def result(self, method: str, params: list):
+        if method == "getProgramAccounts":
+            filters = params[1].get("filters", []) if len(params) > 1 else []
+            mint = next((f["memcmp"]["bytes"] for f in filters if "memcmp" in f), "StubMint")
+            return self._program_accounts(mint)
+        if method == "getAccountInfo":
+            supply = sum(int(a["account"]["data"]["parsed"]["info"]["tokenAmount"]["amount"])
+                         for a in self._program_accounts(params[0]))
+            return {"value": {"data": {"parsed": {"info": {"supply": str(supply), "decimals": SPL_TOKEN_DECIMALS}}}}}
+        if method == "getTokenAccountsByOwner":
+            return {"value": []}
+        if method == "getSignaturesForAddress":
+            return []
+        if method == "getTransaction":
+            return None
+        if method == "getBalance":
+            return {"value": 1_000_000_000}
+        if method == "getSlot":
+            return 250_000_000
+        return None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        method = payload.get("method")
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return web.json_response({"jsonrpc": "2.0", "id": payload.get("id"),
+                                  "result": self.result(method, payload.get("params", []))})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/", self.handle)
+        return app
+
+
+async def start_stub(port: int, accounts: int = 10000, latency_ms: float = 0.0):
+    """Start the stub in the running loop; returns (runner, stub) — call `await runner.cleanup()` to stop."""
+    stub = StubRpc(accounts=accounts, latency_ms=latency_ms)
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Solana JSON-RPC server")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(StubRpc(args.accounts, args.latency_ms).app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
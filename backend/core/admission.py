@@ -0,0 +1,228 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from core import metrics
+
+# The per-client limits below are off by default: behind a reverse proxy every user shares the proxy's
+# address (one bucket for everyone) unless TRUST_FORWARDED_FOR is set, so enable them deliberately.
+# Per-IP token bucket over /api requests (0 disables)
+RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', '0'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '60'))
+# Take the client address from X-Forwarded-For (only behind a proxy that sets it)
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+# Expensive (Mongo-backed) queries: global concurrency, bounded wait queue, per-client cap
+QUERY_CONCURRENCY = int(os.environ.get('QUERY_CONCURRENCY', '8'))
+QUERY_QUEUE_LIMIT = int(os.environ.get('QUERY_QUEUE_LIMIT', '32'))
+QUERY_QUEUE_TIMEOUT = float(os.environ.get('QUERY_QUEUE_TIMEOUT', '5'))
+QUERY_PER_CLIENT = int(os.environ.get('QUERY_PER_CLIENT', '0'))  # 0 = unlimited
+# New expensive queries and WebSocket connections are shed while the event loop lags more than this
+SHED_LOOP_LAG_MS = float(os.environ.get('SHED_LOOP_LAG_MS', '500'))
+# Open /ws/transactions connections and SSE streams per client address (0 = unlimited)
+WS_MAX_CONNECTIONS_PER_IP = int(os.environ.get('WS_MAX_CONNECTIONS_PER_IP', '0'))
+WS_COMMANDS_PER_SECOND = float(os.environ.get('WS_COMMANDS_PER_SECOND', '5'))
+WS_COMMAND_BURST = float(os.environ.get('WS_COMMAND_BURST', '20'))
+
+# WebSocket close codes (RFC 6455): policy violation, and "try again later"
+WS_CLOSE_POLICY = 1008
+WS_CLOSE_TRY_AGAIN = 1013
+
+# Paths never rate limited: probes and scrapes must keep working under load
+EXEMPT_PREFIXES = ("/api/health/", "/metrics")
+
+REJECTED = metrics.REGISTRY.counter(
+    "tokenwise_admission_rejected_total", "Requests, connections and commands refused by admission control.", ("reason",))
+
+
+class Overloaded(Exception):
+    """Raised when a request is refused; `status` is 429 (this client) or 503 (the server)."""
+
+    def __init__(self, reason: str, status: int, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+        REJECTED.labels(reason).inc()
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, cost: float = 1.0, now: Optional[float] = None) -> float:
+        """Spend `cost` tokens; returns 0 if admitted, else the seconds until it would be."""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets keyed by client; the least recently seen keys are dropped beyond `max_keys`."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def check(self, key: str, cost: float = 1.0) -> float:
+        if not self.enabled:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(cost)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"per_second": self.rate, "burst": self.burst, "clients": len(self._buckets)}
+
+
+class QueryGate:
+    """Admission and concurrency control for expensive queries.
+
+    `admit(client)` decides up front whether a request may run at all: it is shed
+    with 503 while the event loop lags or the wait queue is full, and refused with
+    429 when that client already has `per_client` queries running (0: no cap). `slot()` then
+    bounds how many queries hit Mongo at once; the rest wait in FIFO order. Work
+    shared between callers (coalesced analytics) takes one slot, not one per caller.
+    """
+
+    def __init__(self, concurrency: int = QUERY_CONCURRENCY, queue_limit: int = QUERY_QUEUE_LIMIT,
+                 queue_timeout: float = QUERY_QUEUE_TIMEOUT, per_client: int = QUERY_PER_CLIENT,
+                 shed_lag: float = SHED_LOOP_LAG_MS / 1000, lag: Optional[Callable[[], float]] = None):
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.per_client = per_client
+        self.shed_lag = shed_lag
+        self.lag = lag
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._clients: Dict[str, int] = defaultdict(int)
+        self.running = 0
+        self.waiting = 0
+
+    def check_load(self):
+        """Raise Overloaded if the server is too busy to take on new work."""
+        if self.lag is not None and self.shed_lag > 0 and self.lag() > self.shed_lag:
+            raise Overloaded("event_loop_lag", 503, 1.0)
+        if self.waiting >= self.queue_limit:
+            raise Overloaded("query_queue_full", 503, 1.0)
+
+    @asynccontextmanager
+    async def admit(self, client: str):
+        self.check_load()
+        if self.per_client and self._clients.get(client, 0) >= self.per_client:
+            raise Overloaded("client_concurrency", 429, 1.0)
+        self._clients[client] += 1
+        try:
+            yield
+        finally:
+            self._clients[client] -= 1
+            if not self._clients[client]:
+                del self._clients[client]
+
+    @asynccontextmanager
+    async def slot(self, timeout: Optional[float] = None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded("query_queue_timeout", 503, 1.0)
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    async def run(self, awaitable: Awaitable[Any]) -> Any:
+        """Await already-admitted work once a slot is free."""
+        async with self.slot():
+            return await awaitable
+
+    def stats(self) -> Dict[str, Any]:
+        return {"concurrency": self.concurrency, "running": self.running, "waiting": self.waiting,
+                "queue_limit": self.queue_limit, "per_client": self.per_client, "active_clients": len(self._clients)}
+
+
+class ConnectionCounter:
+    """Open streaming connections (WebSocket and SSE) per client address."""
+
+    def __init__(self, per_ip: int = WS_MAX_CONNECTIONS_PER_IP):
+        self.per_ip = per_ip
+        self._open: Dict[str, int] = defaultdict(int)
+
+    def acquire(self, ip: str) -> bool:
+        if self.per_ip and self._open[ip] >= self.per_ip:
+            return False
+        self._open[ip] += 1
+        return True
+
+    def release(self, ip: str):
+        self._open[ip] -= 1
+        if self._open[ip] <= 0:
+            del self._open[ip]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"per_ip": self.per_ip, "addresses": len(self._open),
+                "busiest": max(self._open.values(), default=0)}
+
+
+def client_ip(scope) -> str:
+    if TRUST_FORWARDED_FOR:
+        for name, value in scope.get("headers") or ():
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Plain ASGI middleware applying the per-IP token bucket to /api requests, answering 429 when empty."""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        wait = self.limiter.check(client_ip(scope))
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+        REJECTED.labels("rate_limited").inc()
+        body = json.dumps({"detail": "Rate limit exceeded.", "retry_after": round(wait, 3)}).encode()
+        await send({"type": "http.response.start", "status": 429, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(math.ceil(wait)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,290 @@
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+METRICS = ("volume", "count", "pct_of_holding", "tx_amount")
+ACTIONS = ("buy", "sell", "any")
+WALLET_SETS = ("top_holders",)
+
+
+class SlidingWindowCounter:
+    """Sum and count over the last `window` seconds, kept in one-second buckets."""
+
+    __slots__ = ("window", "_buckets", "total", "count")
+
+    def __init__(self, window: int):
+        self.window = window
+        self._buckets: Deque[List[float]] = deque()
+        self.total = 0.0
+        self.count = 0
+
+    def evict(self, now: float):
+        cutoff = int(now) - self.window
+        buckets = self._buckets
+        while buckets and buckets[0][0] <= cutoff:
+            _, total, count = buckets.popleft()
+            self.total -= total
+            self.count -= int(count)
+        if not buckets:
+            # avoid float drift accumulating forever
+            self.total = 0.0
+            self.count = 0
+
+    def add(self, now: float, value: float):
+        sec = int(now)
+        if self._buckets and self._buckets[-1][0] == sec:
+            bucket = self._buckets[-1]
+            bucket[1] += value
+            bucket[2] += 1
+        else:
+            self._buckets.append([sec, value, 1])
+        self.total += value
+        self.count += 1
+
+
+class AlertRule:
+    __slots__ = ("id", "name", "metric", "action_type", "threshold", "window_seconds", "wallets",
+                 "wallet_set", "protocols", "token", "cooldown_seconds", "enabled", "last_fired")
+
+    def __init__(self, name: str, metric: str, threshold: float, action_type: str = "any",
+                 window_seconds: int = 300, wallets: Optional[Iterable[str]] = None,
+                 wallet_set: Optional[str] = None, protocols: Optional[Iterable[str]] = None,
+                 token: Optional[str] = None, cooldown_seconds: int = 300, enabled: bool = True, id: Optional[str] = None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+        if action_type not in ACTIONS:
+            raise ValueError(f"Unknown action_type '{action_type}', expected one of {ACTIONS}")
+        if wallet_set is not None and wallet_set not in WALLET_SETS:
+            raise ValueError(f"Unknown wallet_set '{wallet_set}', expected one of {WALLET_SETS}")
+        if metric == "pct_of_holding" and not wallets and not wallet_set:
+            raise ValueError("pct_of_holding rules need a wallet list or wallet_set")
+        if metric != "tx_amount" and window_seconds <= 0:
+            raise ValueError("window_seconds must be positive for windowed metrics")
+        self.id = id or str(uuid.uuid4())
+        self.name = name
+        self.metric = metric
+        self.action_type = action_type
+        self.threshold = float(threshold)
+        self.window_seconds = 0 if metric == "tx_amount" else int(window_seconds)
+        self.wallets = tuple(wallets) if wallets else None
+        self.wallet_set = wallet_set
+        self.protocols = frozenset(protocols) if protocols else None
+        self.token = token or None  # None: every mint, each with its own windows
+        self.cooldown_seconds = int(cooldown_seconds)
+        self.enabled = enabled
+        self.last_fired: Dict[Tuple[Optional[str], Optional[str]], float] = {}  # (mint, wallet)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "metric": self.metric,
+            "action_type": self.action_type,
+            "threshold": self.threshold,
+            "window_seconds": self.window_seconds,
+            "wallets": list(self.wallets) if self.wallets else None,
+            "wallet_set": self.wallet_set,
+            "protocols": sorted(self.protocols) if self.protocols else None,
+            "token": self.token,
+            "cooldown_seconds": self.cooldown_seconds,
+            "enabled": self.enabled,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AlertRule":
+        fields = ("id", "name", "metric", "threshold", "action_type", "window_seconds", "wallets",
+                  "wallet_set", "protocols", "token", "cooldown_seconds", "enabled")
+        return cls(**{k: data[k] for k in fields if data.get(k) is not None})
+
+
+class _RuleGroup:
+    """Rules sharing one (wallet, action, protocols, token, window) scope, sorted by threshold per metric.
+
+    Amounts of different mints don't add up, so the group keeps one window counter per mint.
+    """
+
+    __slots__ = ("wallet", "window", "counters", "thresholds", "rules")
+
+    def __init__(self, wallet: Optional[str], window: int,
+                 counters: Optional[Dict[Optional[str], SlidingWindowCounter]] = None):
+        self.wallet = wallet
+        self.window = window
+        self.counters = counters if counters is not None else {}
+        self.thresholds: Dict[str, List[float]] = {}
+        self.rules: Dict[str, List[AlertRule]] = {}
+
+    def add_rule(self, rule: AlertRule):
+        thresholds = self.thresholds.setdefault(rule.metric, [])
+        rules = self.rules.setdefault(rule.metric, [])
+        idx = bisect_right(thresholds, rule.threshold)
+        thresholds.insert(idx, rule.threshold)
+        rules.insert(idx, rule)
+
+    def counter(self, mint: Optional[str]) -> Optional[SlidingWindowCounter]:
+        if not self.window:
+            return None
+        counter = self.counters.get(mint)
+        if counter is None:
+            counter = self.counters[mint] = SlidingWindowCounter(self.window)
+        return counter
+
+
+class AlertEngine:
+    """Compiles alert rules into counter groups indexed by (wallet, action, protocol, token).
+
+    Evaluating a transaction touches at most sixteen index buckets. Rules that share a
+    scope and window share one sliding-window counter, and only rules whose threshold
+    was crossed by this transaction are visited (bisect over sorted thresholds), so
+    the per-transaction cost does not grow with the number of rules. Recompiling
+    keeps the counter of every scope that still exists, so windows survive rule
+    and holder-set changes.
+    """
+
+    def __init__(self, max_recent_alerts: int = 500):
+        self.rules: Dict[str, AlertRule] = {}
+        self.holder_balances: Dict[str, Dict[str, float]] = {}  # mint -> owner -> balance
+        self.recent_alerts: Deque[Dict[str, Any]] = deque(maxlen=max_recent_alerts)
+        self.evaluated = 0
+        self.fired = 0
+        self._index: Dict[Tuple[Optional[str], str, Optional[str], Optional[str]], List[_RuleGroup]] = defaultdict(list)
+        self._groups: Dict[Tuple, _RuleGroup] = {}
+
+    def add_rule(self, rule: AlertRule):
+        self.rules[rule.id] = rule
+        self.compile()
+
+    def remove_rule(self, rule_id: str) -> bool:
+        if self.rules.pop(rule_id, None) is None:
+            return False
+        self.compile()
+        return True
+
+    def load_rules(self, rules: Iterable[AlertRule]):
+        self.rules = {r.id: r for r in rules}
+        self.compile()
+
+    def set_holder_balances(self, token: str, balances: Dict[str, float]):
+        """Refresh `token`'s top-holder balances; the index is only rebuilt when its set of holders changed."""
+        current = self.holder_balances.get(token, {})
+        if balances == current and token in self.holder_balances:
+            return
+        same_holders = balances.keys() == current.keys()
+        self.holder_balances[token] = dict(balances)
+        if not same_holders:
+            self.compile()
+
+    def drop_holder_balances(self, token: str):
+        if self.holder_balances.pop(token, None):
+            self.compile()
+
+    def compile(self):
+        previous = self._groups
+        groups: Dict[Tuple, _RuleGroup] = {}
+        index: Dict[Tuple[Optional[str], str, Optional[str], Optional[str]], List[_RuleGroup]] = defaultdict(list)
+        for rule in self.rules.values():
+            if not rule.enabled:
+                continue
+            wallets: List[Optional[str]] = [None]
+            if rule.wallets or rule.wallet_set:
+                scoped = set(rule.wallets or ())
+                if rule.wallet_set == "top_holders":
+                    for mint, balances in self.holder_balances.items():
+                        if rule.token in (None, mint):
+                            scoped.update(balances)
+                wallets = sorted(scoped)
+            for wallet in wallets:
+                key = (wallet, rule.action_type, rule.protocols, rule.token, rule.window_seconds)
+                group = groups.get(key)
+                if group is None:
+                    old = previous.get(key)
+                    group = groups[key] = _RuleGroup(wallet, rule.window_seconds, old.counters if old else None)
+                    for protocol in (rule.protocols or (None,)):
+                        index[(wallet, rule.action_type, protocol, rule.token)].append(group)
+                group.add_rule(rule)
+        self._index = index
+        self._groups = groups
+
+    def evaluate(self, tx: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        if not self._index:
+            return []
+        now = time.time() if now is None else now
+        self.evaluated += 1
+        wallet = tx.get("wallet")
+        action = tx.get("action_type")
+        protocol = tx.get("protocol")
+        mint = tx.get("token_address")
+        amount = float(tx.get("amount") or 0.0)
+
+        alerts = []
+        index = self._index
+        # a missing field only matches the unscoped bucket, which must not be visited twice
+        wallets = (wallet, None) if wallet is not None else (None,)
+        protocols = (protocol, None) if protocol is not None else (None,)
+        mints = (mint, None) if mint is not None else (None,)
+        for w in wallets:
+            for a in (action, "any"):
+                for p in protocols:
+                    for t in mints:
+                        for group in index.get((w, a, p, t), ()):
+                            self._evaluate_group(group, tx, mint, amount, now, alerts)
+        return alerts
+
+    def _evaluate_group(self, group: _RuleGroup, tx: Dict[str, Any], mint: Optional[str], amount: float,
+                        now: float, alerts: List[Dict[str, Any]]):
+        counter = group.counter(mint)
+        if counter is not None:
+            counter.evict(now)
+            before_total, before_count = counter.total, counter.count
+            counter.add(now, amount)
+        for metric, thresholds in group.thresholds.items():
+            if metric == "tx_amount":
+                before, after = 0.0, amount
+            elif metric == "volume":
+                before, after = before_total, counter.total
+            elif metric == "count":
+                before, after = before_count, counter.count
+            else:
+                balance = self.holder_balances.get(mint, {}).get(group.wallet)
+                if not balance:
+                    continue
+                before, after = before_total / balance * 100, counter.total / balance * 100
+            # edge-triggered: only rules whose threshold lies in (before, after] fire
+            lo = bisect_left(thresholds, before) if metric == "tx_amount" else bisect_right(thresholds, before)
+            hi = bisect_right(thresholds, after)
+            for rule in group.rules[metric][lo:hi]:
+                last = rule.last_fired.get((mint, group.wallet))
+                if last is not None and now - last < rule.cooldown_seconds:
+                    continue
+                rule.last_fired[(mint, group.wallet)] = now
+                alerts.append(self._make_alert(rule, group, tx, after))
+
+    def _make_alert(self, rule: AlertRule, group: _RuleGroup, tx: Dict[str, Any], value: float) -> Dict[str, Any]:
+        alert = {
+            "id": str(uuid.uuid4()),
+            "rule_id": rule.id,
+            "rule_name": rule.name,
+            "metric": rule.metric,
+            "threshold": rule.threshold,
+            "value": value,
+            "window_seconds": rule.window_seconds,
+            "wallet": tx.get("wallet"),
+            "token": tx.get("token_address"),
+            "action_type": tx.get("action_type"),
+            "protocol": tx.get("protocol"),
+            "signature": tx.get("signature"),
+            "timestamp": datetime.utcnow(),
+        }
+        self.fired += 1
+        self.recent_alerts.append(alert)
+        return alert
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rules": len(self.rules),
+            "index_buckets": len(self._index),
+            "evaluated": self.evaluated,
+            "fired": self.fired,
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns written to the archive, in file order. `amount`/`price` are float64, the
+# low-cardinality strings are dictionary-encoded by Parquet.
+ARCHIVE_COLUMNS = ("timestamp", "signature", "wallet", "token_address", "action_type", "protocol",
+                   "amount", "price", "slot", "block_time", "from_address", "to_address")
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '7'))
+# Only meaningful for plain collections; time-series collections expire rows via TTL.
+ARCHIVE_DELETE = os.environ.get('ARCHIVE_DELETE', 'false').lower() == 'true'
+
+
+def partition_dir(root: Path, day: datetime) -> Path:
+    return root / f"date={day:%Y-%m-%d}"
+
+
+def write_parquet_chunk(path: Path, rows: Dict[str, List[Any]]):
+    """Write one column-oriented chunk as a zstd-compressed Parquet file (runs in an executor)."""
+    import pandas as pd
+
+    frame = pd.DataFrame(rows, columns=list(ARCHIVE_COLUMNS))
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"])
+    for col in ("amount", "price"):
+        frame[col] = frame[col].astype("float64")
+    for col in ("slot", "block_time"):
+        frame[col] = frame[col].fillna(0).astype("int64")
+    for col in ("wallet", "action_type", "protocol", "token_address"):
+        frame[col] = frame[col].astype("category")
+    frame.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+
+
+class TransactionArchiver:
+    """Streams whole days of aged transactions from Mongo into date-partitioned Parquet.
+
+    Each day is written into a staging directory and swapped into place once
+    complete, so readers never see a half-written partition and re-running a day
+    simply replaces it. Progress is checkpointed in the storage_state collection.
+    """
+
+    def __init__(self, db, root: str, archive_after_days: int = ARCHIVE_AFTER_DAYS,
+                 delete_after_archive: bool = ARCHIVE_DELETE, chunk_rows: int = 250_000):
+        self.db = db
+        self.root = Path(root)
+        self.archive_after_days = archive_after_days
+        self.delete_after_archive = delete_after_archive
+        self.chunk_rows = chunk_rows
+
+    async def _checkpoint(self) -> Optional[datetime]:
+        state = await self.db.storage_state.find_one({"_id": "archive"}) or {}
+        return state.get("archived_through")
+
+    async def run(self) -> int:
+        """Archive every complete day older than the cutoff. Returns the number of rows archived."""
+        cutoff = (datetime.utcnow() - timedelta(days=self.archive_after_days)) \
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+        day = await self._checkpoint()
+        if day is None:
+            first = await self.db.realtime_transactions.find({}, {"timestamp": 1}) \
+                .sort("timestamp", 1).limit(1).to_list(1)
+            if not first:
+                return 0
+            day = first[0]["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0)
+
+        total = 0
+        while day < cutoff:
+            total += await self.archive_day(day)
+            day += timedelta(days=1)
+            await self.db.storage_state.update_one(
+                {"_id": "archive"}, {"$set": {"archived_through": day}}, upsert=True
+            )
+        return total
+
+    async def archive_day(self, day: datetime) -> int:
+        start, end = day, day + timedelta(days=1)
+        query = {"timestamp": {"$gte": start, "$lt": end}}
+        projection = {"_id": 0, **{c: 1 for c in ARCHIVE_COLUMNS}}
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".staging-{day:%Y-%m-%d}-{uuid.uuid4().hex[:8]}"
+        staging.mkdir()
+        loop = asyncio.get_running_loop()
+        rows: Dict[str, List[Any]] = {c: [] for c in ARCHIVE_COLUMNS}
+        count = parts = 0
+        try:
+            cursor = self.db.realtime_transactions.find(query, projection).batch_size(10000)
+            async for doc in cursor:
+                for col in ARCHIVE_COLUMNS:
+                    rows[col].append(doc.get(col))
+                count += 1
+                if len(rows["timestamp"]) >= self.chunk_rows:
+                    await loop.run_in_executor(None, write_parquet_chunk, staging / f"part-{parts:05d}.parquet", rows)
+                    parts += 1
+                    rows = {c: [] for c in ARCHIVE_COLUMNS}
+            if rows["timestamp"]:
+                await loop.run_in_executor(None, write_parquet_chunk, staging / f"part-{parts:05d}.parquet", rows)
+                parts += 1
+
+            target = partition_dir(self.root, day)
+            if parts:
+                if target.exists():
+                    shutil.rmtree(target)
+                staging.rename(target)
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging)
+
+        if count and self.delete_after_archive:
+            await self.db.realtime_transactions.delete_many(query)
+        if count:
+            logger.info(f"Archived {count} transactions for {day:%Y-%m-%d} into {parts} Parquet file(s).")
+        return count
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# "true" follows change streams on realtime_transactions, token_holders and wallets (needs a replica set)
+# and pushes dashboards when data changes instead of on every monitor tick
+CHANGE_STREAMS = os.environ.get('CHANGE_STREAMS', 'false').lower() == 'true'
+# Changes arriving within this many seconds are folded into one dashboard push per mint
+CHANGE_STREAM_DEBOUNCE = float(os.environ.get('CHANGE_STREAM_DEBOUNCE', '1.0'))
+# Resume tokens are persisted at most this often (and on shutdown)
+CHANGE_STREAM_CHECKPOINT_SECONDS = float(os.environ.get('CHANGE_STREAM_CHECKPOINT_SECONDS', '2'))
+
+# Server errors meaning the resume point is no longer in the oplog
+HISTORY_LOST_CODES = frozenset({136, 280, 286})
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ChangeStreams:
+    """Tails change streams on a few collections and hands every change to a handler.
+
+    Each stream's resume token is checkpointed in storage_state, so a restart
+    continues exactly after the last applied change. Streams with no checkpoint
+    yet start at the cluster time captured by `prepare()`, which runs before the
+    in-memory state is loaded, so nothing written while loading is missed. If a
+    checkpoint has fallen off the oplog, `on_history_lost` is awaited (to reload
+    state from the collections) and the stream starts over from now.
+    """
+
+    def __init__(self, db, checkpoint_seconds: float = CHANGE_STREAM_CHECKPOINT_SECONDS):
+        self.db = db
+        self.checkpoint_seconds = checkpoint_seconds
+        self._watches: Dict[str, tuple] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.start_at = None
+        self.applied: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.resyncs = 0
+        self.last_change_at: Optional[datetime] = None
+
+    def watch(self, collection: str, handler: Handler, pipeline: Optional[List[Dict[str, Any]]] = None):
+        self._watches[collection] = (handler, pipeline or [])
+
+    async def prepare(self):
+        """Remember the current cluster time; fails on a standalone server, which has no change streams."""
+        reply = await self.db.command("ping")
+        self.start_at = reply.get("operationTime")
+        if self.start_at is None:
+            raise RuntimeError("change streams need a replica set (a single-node one is enough)")
+
+    def start(self, on_history_lost: Callable[[str], Awaitable[None]]):
+        for name, (handler, pipeline) in self._watches.items():
+            self._tasks.append(asyncio.create_task(self._run(name, handler, pipeline, on_history_lost)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _load_token(self, name: str):
+        doc = await self.db.storage_state.find_one({"_id": f"change_stream:{name}"})
+        return doc.get("token") if doc else None
+
+    async def _save_token(self, name: str, token):
+        await self.db.storage_state.update_one(
+            {"_id": f"change_stream:{name}"}, {"$set": {"token": token, "saved_at": datetime.utcnow()}}, upsert=True)
+
+    async def _run(self, name: str, handler: Handler, pipeline, on_history_lost):
+        token = await self._load_token(name)
+        saved = token
+        saved_at = time.monotonic()
+        backoff = 1.0
+        try:
+            while True:
+                options: Dict[str, Any] = {"full_document": "updateLookup"}
+                if token is not None:
+                    options["resume_after"] = token
+                elif self.start_at is not None:
+                    options["start_at_operation_time"] = self.start_at
+                try:
+                    async with self.db[name].watch(pipeline, **options) as stream:
+                        logger.info(f"Following change stream on '{name}'" + (" (resumed)" if token else "") + ".")
+                        backoff = 1.0
+                        async for change in stream:
+                            try:
+                                await handler(change)
+                            except Exception as e:
+                                self.errors[name] = self.errors.get(name, 0) + 1
+                                logger.error(f"Error applying {change.get('operationType')} on '{name}': {e}", exc_info=True)
+                            token = stream.resume_token
+                            self.applied[name] = self.applied.get(name, 0) + 1
+                            self.last_change_at = datetime.utcnow()
+                            if time.monotonic() - saved_at >= self.checkpoint_seconds:
+                                await self._save_token(name, token)
+                                saved, saved_at = token, time.monotonic()
+                except OperationFailure as e:
+                    if e.code in HISTORY_LOST_CODES and token is not None:
+                        logger.warning(f"Change stream on '{name}' cannot resume ({e}); reloading state and starting over.")
+                        self.resyncs += 1
+                        token = saved = None
+                        self.start_at = (await self.db.command("ping")).get("operationTime")
+                        await on_history_lost(name)
+                        continue
+                    logger.error(f"Change stream on '{name}' failed: {e}; retrying in {backoff:.0f}s.")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60.0)
+                except PyMongoError as e:
+                    logger.error(f"Change stream on '{name}' interrupted: {e}; retrying in {backoff:.0f}s.")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60.0)
+        finally:
+            if token is not None and token != saved:
+                await self._save_token(name, token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "collections": sorted(self._watches),
+            "running": sum(not t.done() for t in self._tasks),
+            "applied": dict(self.applied),
+            "errors": dict(self.errors),
+            "resyncs": self.resyncs,
+            "last_change_at": self.last_change_at.isoformat() if self.last_change_at else None,
+        }
@@ -0,0 +1,307 @@
+import os
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Token transfers smaller than this don't link wallets (dust sent to strangers would merge unrelated clusters)
+CLUSTER_MIN_TRANSFER = float(os.environ.get('CLUSTER_MIN_TRANSFER', '0'))
+# A SOL transfer of at least this much links the funding wallet to the funded one
+CLUSTER_MIN_FUNDING_SOL = float(os.environ.get('CLUSTER_MIN_FUNDING_SOL', '0.01'))
+# Addresses with more distinct transfer routes than this are hubs (exchanges, distributors, pools) and don't merge clusters
+CLUSTER_HUB_DEGREE = int(os.environ.get('CLUSTER_HUB_DEGREE', '200'))
+# Routes (source, destination, asset) kept for flow queries; past this, new ones still merge clusters but are not stored
+CLUSTER_MAX_EDGES = int(os.environ.get('CLUSTER_MAX_EDGES', '5000000'))
+
+FUNDING_COLLECTION = "wallet_funding"
+SOL = "SOL"  # asset of funding edges; token transfers use the mint
+LAMPORTS_PER_SOL = 1_000_000_000
+
+_NONE = -1
+
+
+class TransferGraph:
+    """Wallets linked by token transfers and SOL funding, grouped into clusters.
+
+    Every address gets a small integer id; node and edge attributes live in
+    flat typed arrays rather than per-object dicts, which keeps millions of
+    edges at a few dozen bytes each. An edge is one (source, destination,
+    asset) route with its total amount and transfer count. Each node heads an
+    outgoing and an incoming edge list threaded through the edge arrays,
+    clusters are maintained by a union-find with union by size and path
+    halving, and each cluster's members form a circular list, so listing a
+    cluster costs its size rather than a scan of the graph.
+
+    An address with more than `hub_degree` routes is a hub (an exchange hot
+    wallet, a distributor, a pool) rather than one owner's wallet: it is
+    flagged and the union-find is rebuilt from the stored edges without it,
+    undoing the merges it caused. That happens once per hub; otherwise links
+    are only ever added and clusters never split.
+    """
+
+    def __init__(self, max_edges: int = CLUSTER_MAX_EDGES, hub_degree: int = CLUSTER_HUB_DEGREE):
+        self.max_edges = max_edges
+        self.hub_degree = hub_degree
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        self._parent = array("i")
+        self._size = array("i")
+        self._next_member = array("i")
+        self._links = array("i")
+        self._hub = array("b")
+        self._out_head = array("i")
+        self._in_head = array("i")
+        self._out_len = array("i")
+        self._in_len = array("i")
+        self._src = array("i")
+        self._dst = array("i")
+        self._amount = array("d")
+        self._count = array("I")
+        self._asset = array("H")
+        self._next_out = array("i")
+        self._next_in = array("i")
+        self._asset_ids: Dict[str, int] = {}
+        self._assets: List[str] = []
+        self.transfers = 0
+        self.merges = 0
+        self.clusters = 0  # clusters of two or more wallets
+        self.largest = 1
+        self.hub_skips = 0
+        self.hubs = 0
+        self.rebuilds = 0
+        self.dropped_edges = 0
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __contains__(self, address: object) -> bool:
+        return address in self._ids
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._src)
+
+    def _node(self, address: str) -> int:
+        node = self._ids.get(address)
+        if node is None:
+            node = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+            self._parent.append(node)
+            self._size.append(1)
+            self._next_member.append(node)
+            self._links.append(0)
+            self._hub.append(0)
+            self._out_head.append(_NONE)
+            self._in_head.append(_NONE)
+            self._out_len.append(0)
+            self._in_len.append(0)
+        return node
+
+    def _asset_id(self, asset: str) -> int:
+        idx = self._asset_ids.get(asset)
+        if idx is None:
+            idx = self._asset_ids[asset] = len(self._assets)
+            self._assets.append(asset)
+        return idx
+
+    def _find(self, node: int) -> int:
+        parent = self._parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def _union(self, a: int, b: int):
+        # a and b are distinct roots
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        if self._size[a] == 1:
+            self.clusters += 1
+        elif self._size[b] > 1:
+            self.clusters -= 1
+        self._parent[b] = a
+        self._size[a] += self._size[b]
+        self.largest = max(self.largest, self._size[a])
+        # splice the two circular member lists into one
+        self._next_member[a], self._next_member[b] = self._next_member[b], self._next_member[a]
+        self.merges += 1
+
+    def _rebuild(self):
+        """Recompute clusters from the stored edges, leaving hubs out."""
+        nodes = len(self._addresses)
+        self._parent = array("i", range(nodes))
+        self._size = array("i", [1]) * nodes
+        self._next_member = array("i", range(nodes))
+        self.clusters = 0
+        self.largest = 1
+        self.merges = 0
+        hub = self._hub
+        for s, d in zip(self._src, self._dst):
+            if not hub[s] and not hub[d]:
+                a, b = self._find(s), self._find(d)
+                if a != b:
+                    self._union(a, b)
+        self.rebuilds += 1
+
+    def _find_edge(self, s: int, d: int, asset: int) -> int:
+        # walk the shorter of the two lists (a hub's is long, and between two hubs the smaller one wins)
+        if self._out_len[s] <= self._in_len[d]:
+            edge = self._out_head[s]
+            while edge != _NONE:
+                if self._dst[edge] == d and self._asset[edge] == asset:
+                    return edge
+                edge = self._next_out[edge]
+        else:
+            edge = self._in_head[d]
+            while edge != _NONE:
+                if self._src[edge] == s and self._asset[edge] == asset:
+                    return edge
+                edge = self._next_in[edge]
+        return _NONE
+
+    def add_transfer(self, source: str, destination: str, amount: float, asset: str) -> bool:
+        """Record `amount` of `asset` moving from `source` to `destination`. Returns True if two clusters merged."""
+        if not source or not destination or source == destination:
+            return False
+        s, d = self._node(source), self._node(destination)
+        asset_id = self._asset_id(asset)
+        self.transfers += 1
+        edge = self._find_edge(s, d, asset_id)
+        if edge != _NONE:
+            self._amount[edge] += amount
+            self._count[edge] += 1
+            return False  # a known route: these two are already linked (or one is a hub)
+        if len(self._src) < self.max_edges:
+            edge = len(self._src)
+            self._src.append(s)
+            self._dst.append(d)
+            self._amount.append(amount)
+            self._count.append(1)
+            self._asset.append(asset_id)
+            self._next_out.append(self._out_head[s])
+            self._next_in.append(self._in_head[d])
+            self._out_head[s] = edge
+            self._in_head[d] = edge
+            self._out_len[s] += 1
+            self._in_len[d] += 1
+        else:
+            self.dropped_edges += 1
+        if self._hub[s] or self._hub[d]:
+            self.hub_skips += 1
+            return False
+        crossed = []
+        if edge != _NONE:
+            # unstored routes can't be recognised when they recur, so only stored ones count towards hubs
+            self._links[s] += 1
+            self._links[d] += 1
+            crossed = [n for n in (s, d) if self._links[n] > self.hub_degree]
+        if crossed:
+            for node in crossed:
+                self._hub[node] = 1
+            self.hubs += len(crossed)
+            self.hub_skips += 1
+            self._rebuild()
+            return False
+        a, b = self._find(s), self._find(d)
+        if a == b:
+            return False
+        self._union(a, b)
+        return True
+
+    def root(self, address: str) -> Optional[int]:
+        """Current cluster key of `address` (changes when its cluster merges), or None if never linked."""
+        node = self._ids.get(address)
+        return None if node is None else self._find(node)
+
+    def cluster_size(self, address: str) -> int:
+        node = self._ids.get(address)
+        return 1 if node is None else self._size[self._find(node)]
+
+    def _member_ids(self, node: int) -> Iterator[int]:
+        member = node
+        while True:
+            yield member
+            member = self._next_member[member]
+            if member == node:
+                return
+
+    def members(self, address: str, limit: Optional[int] = None) -> List[str]:
+        """Addresses in the same cluster as `address` (itself included), up to `limit`."""
+        node = self._ids.get(address)
+        if node is None:
+            return [address]
+        out = []
+        for member in self._member_ids(node):
+            if limit is not None and len(out) >= limit:
+                break
+            out.append(self._addresses[member])
+        return out
+
+    def group(self, addresses: Iterable[str]) -> Dict[Any, List[str]]:
+        """Partition `addresses` by cluster; addresses never linked form their own group."""
+        groups: Dict[Any, List[str]] = {}
+        for address in addresses:
+            node = self._ids.get(address)
+            key = address if node is None else self._find(node)
+            groups.setdefault(key, []).append(address)
+        return groups
+
+    def flows(self, address: str) -> Dict[str, Dict[str, float]]:
+        """Per-asset totals for the cluster of `address`: moved between members, received from and sent to outsiders."""
+        node = self._ids.get(address)
+        if node is None:
+            return {}
+        root = self._find(node)
+        totals: Dict[int, List[float]] = {}
+        for member in self._member_ids(node):
+            edge = self._out_head[member]
+            while edge != _NONE:
+                row = totals.setdefault(self._asset[edge], [0.0, 0.0, 0.0, 0])
+                if self._find(self._dst[edge]) == root:
+                    row[0] += self._amount[edge]
+                else:
+                    row[2] += self._amount[edge]
+                row[3] += self._count[edge]
+                edge = self._next_out[edge]
+            edge = self._in_head[member]
+            while edge != _NONE:
+                if self._find(self._src[edge]) != root:
+                    row = totals.setdefault(self._asset[edge], [0.0, 0.0, 0.0, 0])
+                    row[1] += self._amount[edge]
+                    row[3] += self._count[edge]
+                edge = self._next_in[edge]
+        return {self._assets[asset]: {"internal": internal, "inflow": inflow, "outflow": outflow, "transfers": count}
+                for asset, (internal, inflow, outflow, count) in totals.items()}
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the node and edge arrays (the address strings and id map come on top)."""
+        arrays = (self._parent, self._size, self._next_member, self._links, self._hub, self._out_head, self._in_head,
+                  self._out_len, self._in_len, self._src, self._dst, self._amount, self._count, self._asset,
+                  self._next_out, self._next_in)
+        return sum(a.itemsize * len(a) for a in arrays)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"wallets": len(self._addresses), "edges": self.edge_count, "transfers": self.transfers,
+                "clusters": self.clusters, "largest_cluster": self.largest if self.clusters else 0,
+                "merges": self.merges, "hubs": self.hubs, "hub_skips": self.hub_skips, "rebuilds": self.rebuilds,
+                "dropped_edges": self.dropped_edges,
+                "array_bytes": self.memory_bytes()}
+
+
+def sol_transfers(tx: Dict[str, Any], min_sol: float = CLUSTER_MIN_FUNDING_SOL) -> List[Tuple[str, str, float]]:
+    """(source, destination, SOL) for each System Program transfer of at least `min_sol` in a jsonParsed transaction."""
+    meta = (tx or {}).get("meta") or {}
+    if meta.get("err") is not None:
+        return []
+    message = ((tx or {}).get("transaction") or {}).get("message") or {}
+    instructions = list(message.get("instructions") or [])
+    for inner in meta.get("innerInstructions") or []:
+        instructions.extend(inner.get("instructions") or [])
+    out = []
+    for instruction in instructions:
+        parsed = instruction.get("parsed")
+        if instruction.get("program") != "system" or not isinstance(parsed, dict) or parsed.get("type") != "transfer":
+            continue
+        info = parsed.get("info") or {}
+        sol = (info.get("lamports") or 0) / LAMPORTS_PER_SOL
+        if info.get("source") and info.get("destination") and sol >= min_sol:
+            out.append((info["source"], info["destination"], sol))
+    return out
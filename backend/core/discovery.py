@@ -0,0 +1,257 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Fraction of the top-N set that changed in a full scan above which the interval halves / below which it grows.
+CHURN_HIGH = float(os.environ.get('DISCOVERY_CHURN_HIGH', '0.10'))
+CHURN_LOW = float(os.environ.get('DISCOVERY_CHURN_LOW', '0.02'))
+# Volume moved by (or into) top holders, relative to their combined balance, that pulls the next full scan forward.
+PRESSURE_TRIGGER = float(os.environ.get('DISCOVERY_PRESSURE_TRIGGER', '0.25'))
+# Buys at least this fraction of the smallest top-N balance make a non-holder worth a balance refresh.
+ENTRY_FRACTION = 0.25
+
+
+class AdaptiveSchedule:
+    """Full-scan interval that adapts to observed holder churn.
+
+    After each full scan the interval is halved if a large share of the top-N set
+    changed and stretched by 1.5x if almost nothing did, within
+    [base / 8, base * 4]. Between scans, heavy flow through the top holders
+    (`pressure`) makes a scan due early, but never sooner than the minimum interval.
+    """
+
+    __slots__ = ("base", "interval", "min_interval", "max_interval", "pressure", "full_scans", "early_scans",
+                 "last_churn")
+
+    def __init__(self, base_interval: int):
+        self.base = base_interval
+        self.min_interval = max(300, base_interval // 8)
+        self.max_interval = base_interval * 4
+        self.interval = float(base_interval)
+        self.pressure = 0.0
+        self.full_scans = 0
+        self.early_scans = 0
+        self.last_churn: Optional[float] = None
+
+    def state(self) -> Dict[str, Any]:
+        return {"base": self.base, "interval": self.interval, "pressure": self.pressure,
+                "full_scans": self.full_scans, "early_scans": self.early_scans, "last_churn": self.last_churn}
+
+    def restore(self, state: Dict[str, Any]):
+        """Resume from `state()`; ignored if the configured base interval has changed since."""
+        if state.get("base") != self.base:
+            return
+        self.interval = min(max(float(state["interval"]), self.min_interval), self.max_interval)
+        self.pressure = float(state.get("pressure") or 0.0)
+        self.full_scans = int(state.get("full_scans") or 0)
+        self.early_scans = int(state.get("early_scans") or 0)
+        self.last_churn = state.get("last_churn")
+
+    def rebase(self, base_interval: int):
+        self.__init__(base_interval)
+
+    def due(self, now: datetime, last_run: Optional[datetime]) -> bool:
+        if last_run is None:
+            return True
+        elapsed = (now - last_run).total_seconds()
+        if elapsed >= self.interval:
+            return True
+        return elapsed >= self.min_interval and self.pressure >= PRESSURE_TRIGGER
+
+    def record_scan(self, churn: Optional[float]):
+        self.full_scans += 1
+        if self.pressure >= PRESSURE_TRIGGER:
+            self.early_scans += 1
+        if churn is not None:
+            self.last_churn = churn
+            if churn > CHURN_HIGH:
+                self.interval *= 0.5
+            elif churn < CHURN_LOW and self.pressure < PRESSURE_TRIGGER:
+                self.interval *= 1.5
+            self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        self.pressure = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": round(self.interval),
+            "min_interval_seconds": self.min_interval,
+            "max_interval_seconds": self.max_interval,
+            "pressure": round(self.pressure, 4),
+            "last_churn": self.last_churn,
+            "full_scans": self.full_scans,
+            "early_scans": self.early_scans,
+        }
+
+
+class HolderBook:
+    """Top-N holder snapshot for one mint, patched between full scans.
+
+    Ingested transactions adjust the balances of known top holders straight away.
+    They also queue the wallets involved for an exact `getTokenAccountsByOwner`
+    refresh. A non-holder is queued only when its buy is big enough that it
+    could enter the top N. Refreshed balances re-rank the book, so the snapshot
+    tracks the real top N between full `getProgramAccounts` scans.
+    """
+
+    def __init__(self, top_n: int = 100, refresh_cooldown: float = 60.0):
+        self.top_n = top_n
+        self.refresh_cooldown = refresh_cooldown
+        self.decimals = 0
+        self._balances: Dict[str, float] = {}
+        self._accounts: Dict[str, str] = {}
+        self._dirty: "OrderedDict[str, None]" = OrderedDict()
+        self._refreshed_at: Dict[str, float] = {}
+        self.changed = False
+        self.patches = 0
+
+    def __len__(self) -> int:
+        return len(self._balances)
+
+    def __contains__(self, owner: object) -> bool:
+        return owner in self._balances
+
+    @property
+    def floor(self) -> float:
+        """Smallest balance that still makes the top N (0 while the book is not full)."""
+        if len(self._balances) < self.top_n:
+            return 0.0
+        return min(self._balances.values())
+
+    @property
+    def total(self) -> float:
+        return sum(self._balances.values())
+
+    def load(self, holders: Iterable[Dict[str, Any]]) -> Optional[float]:
+        """Replace the book with a full-scan snapshot. Returns the fraction of the top N that changed."""
+        holders = list(holders)
+        previous = set(self._balances)
+        self._balances = {h["owner"]: float(h.get("balance") or 0.0) for h in holders}
+        self._accounts = {h["owner"]: h.get("address") or h["owner"] for h in holders}
+        if holders:
+            self.decimals = int(holders[0].get("decimals") or self.decimals)
+        self._dirty.clear()
+        self.changed = False
+        if not previous or not self._balances:
+            return None
+        return 1.0 - len(previous & set(self._balances)) / len(self._balances)
+
+    def observe(self, tx: Dict[str, Any]) -> float:
+        """Apply an ingested transaction. Returns the volume it adds to churn pressure."""
+        owner = tx.get("wallet")
+        amount = float(tx.get("amount") or 0.0)
+        if tx.get("is_mock"):
+            return 0.0  # demo/seeded trades say nothing about real balances or churn
+        if not owner or amount <= 0 or not self._balances:
+            # nothing to patch until the first full scan has loaded a baseline
+            return 0.0
+        buy = tx.get("action_type") == "buy"
+        if owner in self._balances:
+            self._balances[owner] = max(self._balances[owner] + (amount if buy else -amount), 0.0)
+            self.changed = True
+            self._mark_dirty(owner)
+            return amount
+        if buy and amount >= self.floor * ENTRY_FRACTION:
+            self._mark_dirty(owner)
+            return amount
+        return 0.0
+
+    def _mark_dirty(self, owner: str):
+        self._dirty[owner] = None
+        self._dirty.move_to_end(owner)
+
+    def take_dirty(self, limit: int) -> List[str]:
+        """Up to `limit` queued wallets whose last refresh is older than the cooldown (oldest first)."""
+        now = time.monotonic()
+        batch = []
+        for owner in list(self._dirty):
+            if len(batch) >= limit:
+                break
+            last = self._refreshed_at.get(owner)
+            if last is not None and now - last < self.refresh_cooldown:
+                continue
+            del self._dirty[owner]
+            self._refreshed_at[owner] = now
+            batch.append(owner)
+        if len(self._refreshed_at) > self.top_n * 50:
+            cutoff = now - self.refresh_cooldown
+            self._refreshed_at = {o: t for o, t in self._refreshed_at.items() if t >= cutoff}
+        return batch
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def apply_refresh(self, owner: str, balance: float, token_account: Optional[str] = None):
+        """Record an exact balance for `owner` and re-rank; wallets that fall out of the top N are dropped."""
+        self.patches += 1
+        if owner in self._balances and balance <= 0:
+            del self._balances[owner]
+            self._accounts.pop(owner, None)
+        elif owner in self._balances:
+            self._balances[owner] = balance
+            if token_account:
+                self._accounts[owner] = token_account
+        elif balance > self.floor:
+            self._balances[owner] = balance
+            self._accounts[owner] = token_account or owner
+        else:
+            return
+        self.changed = True
+        if len(self._balances) > self.top_n:
+            for dropped, _ in sorted(self._balances.items(), key=lambda item: item[1])[:len(self._balances) - self.top_n]:
+                del self._balances[dropped]
+                self._accounts.pop(dropped, None)
+
+    def top(self) -> List[Tuple[str, str, float]]:
+        ranked = sorted(self._balances.items(), key=lambda item: item[1], reverse=True)
+        return [(owner, self._accounts.get(owner, owner), balance) for owner, balance in ranked if balance > 0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"holders": len(self._balances), "floor_balance": self.floor, "pending_refreshes": len(self._dirty),
+                "patches_applied": self.patches}
+
+
+class HolderDiff(NamedTuple):
+    """What changed between two ranked top-holder snapshots (ranks are 1-based)."""
+
+    entered: List[Tuple[str, int, float]]  # owner, rank, balance
+    exited: List[Tuple[str, int, float]]  # owner, previous rank, previous balance
+    moved: List[Tuple[str, int, int]]  # owner, previous rank, rank
+    balances: List[Tuple[str, float, float]]  # owner, previous balance, balance (holders in both snapshots)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.entered or self.exited or self.moved or self.balances)
+
+    def changed_owners(self) -> List[str]:
+        """Holders whose stored wallet needs a write: entrants and balance changes."""
+        return [owner for owner, _, _ in self.entered] + [owner for owner, _, _ in self.balances]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "entered": [{"owner": o, "rank": r, "balance": b} for o, r, b in self.entered],
+            "exited": [{"owner": o, "previous_rank": r, "previous_balance": b} for o, r, b in self.exited],
+            "moved": [{"owner": o, "previous_rank": p, "rank": r} for o, p, r in self.moved],
+            "balances": [{"owner": o, "previous_balance": p, "balance": b, "delta": b - p} for o, p, b in self.balances],
+        }
+
+
+def diff_holders(previous: Sequence[Tuple[str, float]], current: Sequence[Tuple[str, float]],
+                 tolerance: float = 1e-9) -> HolderDiff:
+    """Diff two (owner, balance) lists, each ordered by rank."""
+    before = {owner: (rank, balance) for rank, (owner, balance) in enumerate(previous, 1)}
+    after = {owner: (rank, balance) for rank, (owner, balance) in enumerate(current, 1)}
+    entered, moved, balances = [], [], []
+    for owner, (rank, balance) in after.items():
+        old = before.get(owner)
+        if old is None:
+            entered.append((owner, rank, balance))
+            continue
+        if old[0] != rank:
+            moved.append((owner, old[0], rank))
+        if abs(old[1] - balance) > tolerance:
+            balances.append((owner, old[1], balance))
+    exited = [(owner, rank, balance) for owner, (rank, balance) in before.items() if owner not in after]
+    return HolderDiff(entered, exited, moved, balances)
@@ -0,0 +1,156 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get('LOOP_LAG_THRESHOLD_MS', '250'))
+
+LOOP_LAG = metrics.REGISTRY.histogram(
+    "tokenwise_event_loop_lag_seconds", "Delay between when a loop callback was due and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+LOOP_STALLS = metrics.REGISTRY.counter(
+    "tokenwise_event_loop_stalls_total", "Times the event loop was blocked for longer than the stall threshold.")
+
+_cpu_executor: Optional[ThreadPoolExecutor] = None
+
+
+def cpu_executor() -> ThreadPoolExecutor:
+    global _cpu_executor
+    if _cpu_executor is None:
+        _cpu_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="tokenwise-cpu")
+    return _cpu_executor
+
+
+async def offload(fn: Callable, *args, executor: Optional[Executor] = None, **kwargs) -> Any:
+    """Run a blocking or CPU-heavy call off the event loop and await its result.
+
+    Pure-Python work still holds the GIL, but in a worker thread the loop gets a
+    turn every switch interval (5ms) instead of waiting for the whole call.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or cpu_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class LoopMonitor:
+    """Measures event-loop lag and captures the stack of whatever is blocking it.
+
+    A coroutine sleeps for `interval` and records how late it woke up. A watchdog
+    thread checks the heartbeat it leaves. If the loop has not beaten for
+    `threshold` seconds, the watchdog snapshots the loop thread's stack once per
+    stall, so the log shows the code that was hogging the loop rather than the
+    victim that ran late.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = LOOP_LAG_THRESHOLD_MS / 1000,
+                 window: int = 3000, max_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags = deque(maxlen=window)
+        self.stalls = deque(maxlen=max_stalls)
+        self.stall_count = 0
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="tokenwise-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(now - start - self.interval, 0.0)
+            self._lags.append(lag)
+            LOOP_LAG.observe(lag)
+            if self.stalls and self.stalls[-1]["duration_ms"] is None:
+                stall = self.stalls[-1]
+                stall["duration_ms"] = round(lag * 1000 + self.interval * 1000, 1)
+
+    def _capture_stack(self) -> List[str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return []
+        return [line.rstrip("\n") for line in traceback.format_stack(frame)]
+
+    def _watch(self):
+        captured_beat = None
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._beat
+            if time.monotonic() - beat < self.threshold or captured_beat == beat:
+                continue
+            captured_beat = beat
+            stack = self._capture_stack()
+            self.stall_count += 1
+            LOOP_STALLS.inc()
+            self.stalls.append({
+                "detected_at": datetime.utcnow().isoformat(),
+                "duration_ms": None,  # filled in when the loop wakes up again
+                "stack": stack,
+            })
+            logger.warning(f"Event loop blocked for more than {self.threshold * 1000:.0f}ms; loop thread stack:\n"
+                           + "\n".join(stack[-12:]))
+
+    def recent_lag(self, samples: int = 10) -> float:
+        """Worst lag over the last `samples` measurements (about a second), including a stall in progress."""
+        recent = max(islice(reversed(self._lags), samples), default=0.0)
+        if self.running:
+            recent = max(recent, time.monotonic() - self._beat - self.interval)
+        return recent
+
+    def stats(self, include_stacks: bool = False) -> Dict[str, Any]:
+        ordered = sorted(self._lags)
+        stats = {
+            "running": self.running,
+            "samples": len(ordered),
+            "lag_ms": {f"p{q}": round(_percentile(ordered, q) * 1000, 2) for q in (50, 90, 99)},
+            "max_lag_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "stall_threshold_ms": round(self.threshold * 1000, 1),
+            "stalls": self.stall_count,
+        }
+        if include_stacks:
+            stats["recent_stalls"] = list(self.stalls)
+        return stats
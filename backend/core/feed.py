@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+# Broadcast events kept in memory for SSE / long-poll / resuming WebSocket readers to catch up from
+EVENT_LOG_CAPACITY = int(os.environ.get('EVENT_LOG_CAPACITY', '5000'))
+# Size of the capped Mongo collection older events spill to (0 keeps the log in memory only)
+EVENT_LOG_STORE_MB = int(os.environ.get('EVENT_LOG_STORE_MB', '64'))
+# Events per replay message sent to a WebSocket client that reconnects with resume_from
+EVENT_REPLAY_BATCH = int(os.environ.get('EVENT_REPLAY_BATCH', '200'))
+
+EVENT_LOG_COLLECTION = "feed_events"
+
+
+class FeedEvent(NamedTuple):
+    seq: int
+    kind: str
+    token: Optional[str]
+    message: str  # the JSON text exactly as broadcast over the WebSocket, starting with its "seq"
+    include_unsubscribed: bool
+
+
+def stamp(seq: int, message: str) -> str:
+    """Prefix a JSON object message with its sequence number so clients can resume from it."""
+    return f'{{"seq": {seq}, {message[1:]}' if message != "{}" else f'{{"seq": {seq}}}'
+
+
+def _store_filter(subscribed: Optional[Set[str]]) -> Dict[str, Any]:
+    # should_deliver as a Mongo query
+    if subscribed is None:
+        return {"u": True}
+    return {"token": {"$in": [None, *subscribed]}}
+
+
+def should_deliver(subscribed: Optional[Set[str]], token: Optional[str], include_unsubscribed: bool) -> bool:
+    """Whether a client with this mint subscription (None = not subscribed) receives an event.
+
+    Token-tagged events go to clients subscribed to that mint. Clients without a
+    subscription get everything unless the event says otherwise.
+    """
+    if subscribed is None:
+        return include_unsubscribed
+    return token is None or token in subscribed
+
+
+class EventLog:
+    """Append-only, sequence-numbered log of everything broadcast to real-time clients.
+
+    The WebSocket fan-out appends each message once; SSE streams, long-poll
+    requests and reconnecting WebSocket clients read the same entries by
+    sequence number, so every transport sees identical events in identical
+    order. The newest `capacity` events are held in memory. With a `collection`,
+    events are also spilled to a capped Mongo collection (keyed by seq) on each
+    flush, so sequence numbers keep increasing across restarts and readers
+    further behind are replayed from Mongo.
+    """
+
+    def __init__(self, capacity: int = EVENT_LOG_CAPACITY, collection=None):
+        self._events: Deque[FeedEvent] = deque(maxlen=capacity)
+        self.last_seq = 0
+        self.collection = collection
+        self._unsaved: List[FeedEvent] = []
+        self.saved = 0
+        self.store_reads = 0
+        self._changed: Optional[asyncio.Event] = None
+
+    async def load(self, store_bytes: int = EVENT_LOG_STORE_MB * 1024 * 1024):
+        """Create the capped collection if needed and continue numbering from its newest event."""
+        if self.collection is None:
+            return
+        try:
+            await self.collection.database.create_collection(self.collection.name, capped=True, size=store_bytes)
+            logger.info(f"Created capped collection '{self.collection.name}' ({store_bytes} bytes).")
+        except CollectionInvalid:
+            pass
+        docs = await self.collection.find({}).sort("_id", -1).limit(self._events.maxlen).to_list(None)
+        if not docs:
+            return
+        # only the monitor loop broadcasts and it starts after this, so the memory segment is still empty
+        self.last_seq = max(self.last_seq, docs[0]["_id"])
+        if not self._events:
+            self._events.extend(FeedEvent(d["_id"], d["kind"], d.get("token"), d["message"], d["u"])
+                                for d in reversed(docs))
+        logger.info(f"Event log resumes after seq {self.last_seq} ({len(self._events)} events reloaded).")
+
+    def append(self, kind: str, token: Optional[str], message: str, include_unsubscribed: bool = True) -> FeedEvent:
+        """Log a broadcast; the returned event's message carries its sequence number."""
+        self.last_seq += 1
+        event = FeedEvent(self.last_seq, kind, token, stamp(self.last_seq, message), include_unsubscribed)
+        self._events.append(event)
+        if self.collection is not None:
+            if len(self._unsaved) >= self._events.maxlen:
+                del self._unsaved[0]  # the store has been unreachable for a while; keep the newest
+            self._unsaved.append(event)
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+        return event
+
+    async def flush(self) -> int:
+        """Write events appended since the last flush to the capped collection."""
+        if not self._unsaved:
+            return 0
+        events, self._unsaved = self._unsaved, []
+        await self.collection.insert_many([
+            {"_id": e.seq, "kind": e.kind, "token": e.token, "u": e.include_unsubscribed, "message": e.message,
+             "at": datetime.utcnow()} for e in events
+        ], ordered=False)
+        self.saved += len(events)
+        return len(events)
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest sequence number still held (last_seq + 1 when empty)."""
+        return self._events[0].seq if self._events else self.last_seq + 1
+
+    def since(self, seq: int, subscribed: Optional[Set[str]] = None,
+              limit: int = 500) -> Tuple[List[FeedEvent], int, bool]:
+        """Events after `seq` this subscriber should see.
+
+        Returns the events, the cursor to continue from (the last sequence number
+        scanned) and whether events after `seq` were already evicted (a gap),
+        which also covers cursors from a previous run.
+        """
+        gap = seq + 1 < self.first_seq or seq > self.last_seq
+        if seq > self.last_seq:
+            # a cursor from before a restart (sequence numbers start over): replay what we have
+            seq = 0
+        cursor = self.last_seq
+        out = []
+        if seq < self.last_seq:
+            # sequence numbers are contiguous, so the start position is arithmetic
+            for event in islice(self._events, max(seq + 1 - self.first_seq, 0), None):
+                if should_deliver(subscribed, event.token, event.include_unsubscribed):
+                    out.append(event)
+                    if len(out) >= limit:
+                        cursor = event.seq
+                        break
+        return out, cursor, gap
+
+    async def read(self, seq: int, subscribed: Optional[Set[str]] = None,
+                   limit: int = 500) -> Tuple[List[FeedEvent], int, bool]:
+        """`since`, falling back to the capped collection for cursors older than the memory segment."""
+        if self.collection is None or seq + 1 >= self.first_seq or seq > self.last_seq:
+            return self.since(seq, subscribed, limit)
+        self.store_reads += 1
+        oldest = await self.collection.find_one({}, {"_id": 1}, sort=[("_id", 1)])
+        if oldest is None or seq + 1 < oldest["_id"]:
+            return self.since(seq, subscribed, limit)  # overwritten in the store too: report the gap
+        # everything before the memory segment has been flushed, so the store covers (seq, first_seq)
+        end = self.first_seq
+        docs = await self.collection.find(
+            {"_id": {"$gt": seq, "$lt": end}, **_store_filter(subscribed)}
+        ).sort("_id", 1).limit(limit).to_list(None)
+        events = [FeedEvent(d["_id"], d["kind"], d.get("token"), d["message"], d["u"]) for d in docs]
+        cursor = events[-1].seq if len(events) >= limit else end - 1
+        return events, cursor, False
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """Wait until something newer than `seq` is appended; False on timeout."""
+        if self.last_seq > seq:
+            return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"first_seq": self.first_seq, "last_seq": self.last_seq, "buffered": len(self._events),
+                "capacity": self._events.maxlen, "persistent": self.collection is not None,
+                "saved": self.saved, "unsaved": len(self._unsaved), "store_reads": self.store_reads}
@@ -0,0 +1,120 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class HistoricalAnalytics:
+    """Offline volume / protocol-share / top-wallet queries over the Parquet archive.
+
+    Date partitions outside the requested range are pruned from the directory
+    layout and the timestamp/token/wallet/protocol predicates are pushed down to the
+    Parquet row groups; only the needed columns are read. Aggregation is done per
+    record batch with pandas group-bys and the partial results are combined, so
+    memory stays bounded by the number of groups rather than the number of rows.
+
+    Calls are blocking and should be run in an executor from async code.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        # keep the partition key a plain string so lexical date comparisons prune directories
+        partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+        return ds.dataset(str(self.root), format="parquet", partitioning=partitioning,
+                          exclude_invalid_files=True, ignore_prefixes=[".staging-", "."])
+
+    def _batches(self, columns: Iterable[str], start: datetime, end: datetime,
+                 wallet: Optional[str] = None, protocol: Optional[str] = None, token: Optional[str] = None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if not self.root.exists():
+            return
+        dataset = self._dataset()
+        predicate = (ds.field("date") >= f"{start:%Y-%m-%d}") & (ds.field("date") <= f"{end:%Y-%m-%d}") \
+            & (ds.field("timestamp") >= pa.scalar(start)) & (ds.field("timestamp") < pa.scalar(end))
+        if token:
+            predicate = predicate & (ds.field("token_address") == token)
+        if wallet:
+            predicate = predicate & (ds.field("wallet") == wallet)
+        if protocol:
+            predicate = predicate & (ds.field("protocol") == protocol)
+        scanner = dataset.scanner(columns=list(columns), filter=predicate, batch_size=1 << 20)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    @staticmethod
+    def _with_sides(frame):
+        is_buy = frame["action_type"] == "buy"
+        frame["buy_volume"] = frame["amount"].where(is_buy, 0.0)
+        frame["sell_volume"] = frame["amount"].where(~is_buy & (frame["action_type"] == "sell"), 0.0)
+        return frame
+
+    def volume(self, start: datetime, end: datetime, freq: str = "D", wallet: Optional[str] = None,
+               protocol: Optional[str] = None, token: Optional[str] = None) -> List[Dict[str, Any]]:
+        import pandas as pd
+
+        partials = []
+        for frame in self._batches(("timestamp", "amount", "action_type"), start, end, wallet, protocol, token):
+            frame = self._with_sides(frame)
+            frame["period"] = frame["timestamp"].dt.floor(freq)
+            partials.append(frame.groupby("period").agg(
+                volume=("amount", "sum"),
+                buy_volume=("buy_volume", "sum"),
+                sell_volume=("sell_volume", "sum"),
+                transactions=("amount", "size"),
+            ))
+        if not partials:
+            return []
+        result = pd.concat(partials).groupby(level=0).sum().sort_index()
+        return [{"period": period.isoformat(), **{k: (int(v) if k == "transactions" else float(v)) for k, v in row.items()}}
+                for period, row in result.iterrows()]
+
+    def protocol_share(self, start: datetime, end: datetime, token: Optional[str] = None) -> List[Dict[str, Any]]:
+        import pandas as pd
+
+        partials = []
+        for frame in self._batches(("protocol", "amount"), start, end, token=token):
+            partials.append(frame.groupby("protocol", observed=True).agg(
+                count=("amount", "size"), volume=("amount", "sum")))
+        if not partials:
+            return []
+        result = pd.concat(partials).groupby(level=0, observed=True).sum()
+        total_volume = result["volume"].sum() or 1.0
+        total_count = result["count"].sum() or 1
+        result = result.sort_values("volume", ascending=False)
+        return [{
+            "protocol": str(protocol),
+            "count": int(row["count"]),
+            "volume": float(row["volume"]),
+            "volume_share": float(row["volume"] / total_volume),
+            "count_share": float(row["count"] / total_count),
+        } for protocol, row in result.iterrows()]
+
+    def top_wallets(self, start: datetime, end: datetime, limit: int = 20, by: str = "net_buy",
+                    token: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top wallets by `volume`, `buy_volume`, `sell_volume` or `net_buy` (accumulation)."""
+        import pandas as pd
+
+        if by not in ("volume", "buy_volume", "sell_volume", "net_buy"):
+            raise ValueError(f"Unknown ranking '{by}'")
+        partials = []
+        for frame in self._batches(("wallet", "amount", "action_type"), start, end, token=token):
+            frame = self._with_sides(frame)
+            partials.append(frame.groupby("wallet", observed=True).agg(
+                volume=("amount", "sum"),
+                buy_volume=("buy_volume", "sum"),
+                sell_volume=("sell_volume", "sum"),
+                transactions=("amount", "size"),
+            ))
+        if not partials:
+            return []
+        result = pd.concat(partials).groupby(level=0, observed=True).sum()
+        result["net_buy"] = result["buy_volume"] - result["sell_volume"]
+        top = result.nlargest(limit, by)
+        return [{"wallet": str(wallet), **{k: (int(v) if k == "transactions" else float(v)) for k, v in row.items()}} for wallet, row in top.iterrows()]
@@ -0,0 +1,122 @@
+import asyncio
+import heapq
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HOLDER_POOL_WORKERS = int(os.environ.get('HOLDER_POOL_WORKERS', '2'))
+
+
+class RpcResultError(Exception):
+    def __init__(self, code: Any, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def decode_rpc_result(payload: bytes) -> Any:
+    body = json.loads(payload)
+    if 'error' in body:
+        error = body['error'] or {}
+        raise RpcResultError(error.get('code', 'N/A'), error.get('message', 'Unknown RPC error'))
+    return body.get('result')
+
+
+def aggregate_accounts(accounts: List[dict], token_decimals: int, top_n: int) -> Dict[str, Any]:
+    """Sum token-account balances per owner and keep the top N.
+
+    The result is plain tuples `(owner, first_token_account, ui_balance)` so it
+    crosses the process boundary as a few kilobytes regardless of mint size.
+    """
+    raw_balances: Dict[str, int] = {}
+    first_account: Dict[str, str] = {}
+    for account in accounts:
+        info = account['account']['data']['parsed']['info']
+        owner = info['owner']
+        amount = int(info['tokenAmount']['amount'])
+        if not owner or amount <= 0:
+            continue
+        if owner in raw_balances:
+            raw_balances[owner] += amount
+        else:
+            raw_balances[owner] = amount
+            first_account[owner] = account['pubkey']
+
+    scale = 10 ** token_decimals
+    top = heapq.nlargest(top_n, raw_balances.items(), key=lambda item: item[1])
+    return {
+        "accounts": len(accounts),
+        "holders": len(raw_balances),
+        "top": [(owner, first_account[owner], raw / scale) for owner, raw in top],
+    }
+
+
+def aggregate_payload(payload: bytes, token_decimals: int, top_n: int) -> Dict[str, Any]:
+    """Worker entry point: decode a raw getProgramAccounts response and aggregate it."""
+    return aggregate_accounts(decode_rpc_result(payload) or [], token_decimals, top_n)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+class HolderPool:
+    """Process pool for holder aggregation.
+
+    The RPC response is handed over as the undecoded bytes it arrived as. Pickling
+    bytes is a memcpy, whereas pickling the parsed account dicts (or pydantic
+    models) would cost about as much as the work being offloaded. Workers use the
+    spawn start method so they never inherit the parent's Motor or aiohttp threads.
+    With `max_workers=0` the same function runs on a thread instead.
+    """
+
+    def __init__(self, max_workers: int = HOLDER_POOL_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def start(self):
+        """Spawn the workers ahead of the first discovery run so it doesn't pay interpreter start-up."""
+        executor = self._get_executor()
+        if executor is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*(loop.run_in_executor(executor, _warm_up) for _ in range(self.max_workers)))
+        except Exception as e:
+            logger.warning(f"Could not start holder aggregation processes ({e}); aggregating on a thread instead.")
+            self.shutdown()
+            self.max_workers = 0
+
+    async def aggregate(self, payload: bytes, token_decimals: int, top_n: int) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, aggregate_payload, payload, token_decimals, top_n)
+        except BrokenProcessPool:
+            # a worker died (e.g. OOM on a huge mint); rebuild the pool and retry once
+            logger.warning("Holder aggregation pool broke; restarting it and retrying.")
+            self.shutdown()
+            return await loop.run_in_executor(self._get_executor(), aggregate_payload, payload, token_decimals, top_n)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.max_workers, "mode": "process" if self.max_workers > 0 else "thread",
+                "started": self._executor is not None}
@@ -0,0 +1,133 @@
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BASE_FIELDS = ("tx_count", "buy_count", "sell_count", "buy_volume", "sell_volume")
+
+
+class RingCounters:
+    """Fixed-size ring of time buckets, each holding one value per field.
+
+    A slot is reused once its bucket falls out of the ring; stale slots are detected
+    by their stamp, so there is no background sweeping.
+    """
+
+    __slots__ = ("slots", "resolution", "fields", "_width", "_field_index", "_values", "_stamps")
+
+    def __init__(self, slots: int, resolution: int, fields: Iterable[str]):
+        self.slots = slots
+        self.resolution = resolution
+        self.fields = tuple(fields)
+        self._width = len(self.fields)
+        self._field_index = {f: i for i, f in enumerate(self.fields)}
+        self._values = array("d", bytes(8 * slots * self._width))
+        self._stamps = array("q", [-1] * slots)
+
+    def _slot(self, bucket: int) -> int:
+        slot = bucket % self.slots
+        if self._stamps[slot] != bucket:
+            start = slot * self._width
+            for i in range(start, start + self._width):
+                self._values[i] = 0.0
+            self._stamps[slot] = bucket
+        return slot
+
+    def add(self, now: float, values: Dict[str, float]):
+        slot = self._slot(int(now) // self.resolution)
+        start = slot * self._width
+        index = self._field_index
+        for field, value in values.items():
+            self._values[start + index[field]] += value
+
+    def state(self) -> Tuple[array, array]:
+        return array("d", self._values), array("q", self._stamps)
+
+    def restore(self, values: array, stamps: array):
+        """Adopt bucket state saved by `state()`; buckets that aged out meanwhile are ignored as usual."""
+        if len(values) != len(self._values) or len(stamps) != self.slots:
+            raise ValueError("ring layout does not match")
+        self._values = values
+        self._stamps = stamps
+
+    def totals(self, now: float, buckets: int) -> Dict[str, float]:
+        """Sum the most recent `buckets` buckets (including the current, partial one)."""
+        current = int(now) // self.resolution
+        sums = [0.0] * self._width
+        for bucket in range(current - min(buckets, self.slots) + 1, current + 1):
+            slot = bucket % self.slots
+            if self._stamps[slot] != bucket:
+                continue
+            start = slot * self._width
+            for i in range(self._width):
+                sums[i] += self._values[start + i]
+        return dict(zip(self.fields, sums))
+
+    def series(self, now: float, buckets: int) -> List[Dict[str, Any]]:
+        current = int(now) // self.resolution
+        out = []
+        for bucket in range(current - min(buckets, self.slots) + 1, current + 1):
+            slot = bucket % self.slots
+            point: Dict[str, Any] = {"t": bucket * self.resolution}
+            if self._stamps[slot] == bucket:
+                start = slot * self._width
+                point.update(zip(self.fields, self._values[start:start + self._width]))
+            else:
+                point.update(dict.fromkeys(self.fields, 0.0))
+            out.append(point)
+        return out
+
+
+class LiveMetrics:
+    """Per-second (last 5 minutes) and per-minute (last hour) flow counters fed on ingest."""
+
+    WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+
+    def __init__(self, protocols: Iterable[str]):
+        self.protocols = sorted(set(protocols)) + ["Other"]
+        self._protocol_fields = {p: f"protocol:{p}" for p in self.protocols}
+        fields = BASE_FIELDS + tuple(self._protocol_fields.values())
+        self.per_second = RingCounters(300, 1, fields)
+        self.per_minute = RingCounters(60, 60, fields)
+
+    def record(self, tx: Dict[str, Any], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        amount = float(tx.get("amount") or 0.0)
+        values = {"tx_count": 1.0}
+        action = tx.get("action_type")
+        if action == "buy":
+            values["buy_count"] = 1.0
+            values["buy_volume"] = amount
+        elif action == "sell":
+            values["sell_count"] = 1.0
+            values["sell_volume"] = amount
+        values[self._protocol_fields.get(tx.get("protocol"), "protocol:Other")] = 1.0
+        self.per_second.add(now, values)
+        self.per_minute.add(now, values)
+
+    def _shape(self, totals: Dict[str, float]) -> Dict[str, Any]:
+        out = {f: (int(totals[f]) if f.endswith("_count") else totals[f]) for f in BASE_FIELDS}
+        out["protocols"] = {p: int(totals[self._protocol_fields[p]]) for p in self.protocols
+                            if totals[self._protocol_fields[p]]}
+        return out
+
+    def window(self, name: str, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        seconds = self.WINDOWS[name]
+        if seconds <= self.per_second.slots:
+            totals = self.per_second.totals(now, seconds)
+        else:
+            totals = self.per_minute.totals(now, seconds // self.per_minute.resolution)
+        return self._shape(totals)
+
+    def snapshot(self, now: Optional[float] = None, series_points: int = 60) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        return {
+            "windows": {name: self.window(name, now) for name in self.WINDOWS},
+            "per_second": [self._point(p) for p in self.per_second.series(now, series_points)],
+            "per_minute": [self._point(p) for p in self.per_minute.series(now, series_points)],
+        }
+
+    def _point(self, point: Dict[str, Any]) -> Dict[str, Any]:
+        shaped = self._shape(point)
+        shaped["t"] = point["t"]
+        return shaped
@@ -0,0 +1,291 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from pymongo import monitoring
+
+# Latency buckets in seconds, tuned for sub-millisecond in-memory work up to slow RPC calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            bucket_label = f'le="{le}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, bucket_label)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class GaugeFunction(_Metric):
+    """Gauge whose value(s) are read from a callback at scrape time, so the hot path pays nothing."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for labels, v in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_function(self, name: str, documentation: str, fn, labelnames: Sequence[str] = ()) -> GaugeFunction:
+        return self.register(GaugeFunction(name, documentation, fn, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+RPC_CALLS = REGISTRY.counter("tokenwise_rpc_calls_total", "Solana RPC call attempts by method and outcome.", ("method", "status"))
+RPC_RETRIES = REGISTRY.counter("tokenwise_rpc_retries_total", "Solana RPC retries by method and reason.", ("method", "reason"))
+RPC_LATENCY = REGISTRY.histogram("tokenwise_rpc_duration_seconds", "Solana RPC attempt latency.", ("method",))
+MONGO_LATENCY = REGISTRY.histogram("tokenwise_mongo_duration_seconds", "MongoDB command latency.", ("collection", "operation"))
+MONGO_FAILURES = REGISTRY.counter("tokenwise_mongo_failures_total", "Failed MongoDB commands.", ("collection", "operation"))
+HTTP_LATENCY = REGISTRY.histogram("tokenwise_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+BROADCAST_LATENCY = REGISTRY.histogram("tokenwise_ws_broadcast_duration_seconds", "Time to fan a message out to all WebSocket clients.", ("type",))
+WS_MESSAGES = REGISTRY.counter("tokenwise_ws_messages_sent_total", "WebSocket messages sent by type.", ("type",))
+WS_REPLAYED_EVENTS = REGISTRY.counter("tokenwise_ws_replayed_events_total", "Missed events replayed to WebSocket clients that reconnected with resume_from.")
+TRANSACTIONS_INGESTED = REGISTRY.counter("tokenwise_transactions_ingested_total", "Transactions ingested.", ("action_type",))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command monitor feeding MONGO_LATENCY; pass it via `event_listeners=[...]`."""
+
+    # commands whose first field is not a collection name
+    _ADMIN_COMMANDS = frozenset(("hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions",
+                                 "saslStart", "saslContinue", "getMore", "killCursors", "listCollections"))
+
+    def __init__(self):
+        self._pending: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event):
+        name = event.command_name
+        if name in self._ADMIN_COMMANDS:
+            collection = event.command.get("collection", "-") if name == "getMore" else "-"
+        else:
+            collection = event.command.get(name)
+            collection = collection if isinstance(collection, str) else "-"
+        self._pending[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+
+class RequestLatencyMiddleware:
+    """Plain ASGI middleware recording per-route request latency into HTTP_LATENCY.
+
+    Written against raw ASGI rather than BaseHTTPMiddleware, which adds a task and
+    stream wrapping per request that costs more than the measurement itself.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # the router stores the matched route in the (shared) scope, giving the path template
+            route = scope.get("route")
+            HTTP_LATENCY.labels(scope["method"], getattr(route, "path", "unmatched"), str(status)) \
+                .observe(time.perf_counter() - start)
+
+
+def instrument_app(app):
+    app.add_middleware(RequestLatencyMiddleware)
+    return app
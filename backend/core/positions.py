@@ -0,0 +1,253 @@
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Container, Deque, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COST_METHODS = ("average", "fifo")
+# top-level wallet fields from before positions were kept per mint (the last four were never maintained)
+LEGACY_FIELDS = ("net_position", "buy_volume", "sell_volume", "avg_cost_basis", "cost_basis_total", "cost_method",
+                 "open_lots", "total_buys", "total_sells", "profit_loss", "last_transaction")
+
+
+PositionKey = Tuple[str, str]  # (wallet, mint)
+
+
+class Position:
+    __slots__ = ("wallet", "mint", "net_position", "total_buys", "total_sells", "buy_volume", "sell_volume",
+                 "cost_basis", "realized_pnl", "lots", "last_transaction")
+
+    def __init__(self, wallet: str, mint: str):
+        self.wallet = wallet
+        self.mint = mint
+        self.net_position = 0.0
+        self.total_buys = 0
+        self.total_sells = 0
+        self.buy_volume = 0.0
+        self.sell_volume = 0.0
+        # total cost of the currently held quantity; avg cost = cost_basis / held
+        self.cost_basis = 0.0
+        self.realized_pnl = 0.0
+        self.lots: Deque[List[float]] = deque()
+        self.last_transaction: Optional[datetime] = None
+
+    @property
+    def avg_cost_basis(self) -> Optional[float]:
+        if self.net_position <= 0:
+            return None
+        return self.cost_basis / self.net_position
+
+    def to_doc(self, method: str) -> Dict[str, Any]:
+        doc = {
+            "net_position": self.net_position,
+            "total_buys": self.total_buys,
+            "total_sells": self.total_sells,
+            "buy_volume": self.buy_volume,
+            "sell_volume": self.sell_volume,
+            "avg_cost_basis": self.avg_cost_basis,
+            "cost_basis_total": self.cost_basis,
+            "profit_loss": self.realized_pnl,
+            "last_transaction": self.last_transaction,
+            "cost_method": method,
+        }
+        if method == "fifo":
+            doc["open_lots"] = [list(lot) for lot in self.lots]
+        return doc
+
+    @classmethod
+    def from_doc(cls, wallet: str, mint: str, doc: Dict[str, Any]) -> "Position":
+        pos = cls(wallet, mint)
+        pos.net_position = float(doc.get("net_position") or 0.0)
+        pos.total_buys = int(doc.get("total_buys") or 0)
+        pos.total_sells = int(doc.get("total_sells") or 0)
+        pos.buy_volume = float(doc.get("buy_volume") or 0.0)
+        pos.sell_volume = float(doc.get("sell_volume") or 0.0)
+        pos.cost_basis = float(doc.get("cost_basis_total") or 0.0)
+        pos.realized_pnl = float(doc.get("profit_loss") or 0.0)
+        pos.lots = deque([float(q), float(p)] for q, p in doc.get("open_lots") or [])
+        pos.last_transaction = doc.get("last_transaction")
+        return pos
+
+
+class PositionEngine:
+    """Incremental per-wallet, per-mint position and realized PnL tracking.
+
+    Transactions are applied in memory as they are ingested; changed positions are
+    marked dirty and written back to `positions.<mint>` of the wallet's document in
+    the `wallets` collection, one bulk_write per flush, so reading a wallet's PnL
+    across every mint is a single document read. Each mint keeps its own lots, cost
+    basis and last price.
+    """
+
+    def __init__(self, method: str = "average", flush_batch_size: int = 1000):
+        if method not in COST_METHODS:
+            raise ValueError(f"Unknown cost method '{method}', expected one of {COST_METHODS}")
+        self.method = method
+        self.flush_batch_size = flush_batch_size
+        self.positions: Dict[PositionKey, Position] = {}
+        self.last_price: Dict[str, float] = {}
+        self._dirty: set = set()
+
+    def __contains__(self, key: PositionKey) -> bool:
+        return key in self.positions
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def reset(self):
+        self.positions.clear()
+        self.last_price.clear()
+        self._dirty.clear()
+
+    async def ensure_loaded(self, wallets_collection, wallet: str, mint: str):
+        key = (wallet, mint)
+        if key in self.positions:
+            return
+        doc = await wallets_collection.find_one({"address": wallet}, {"_id": 0, f"positions.{mint}": 1})
+        stored = ((doc or {}).get("positions") or {}).get(mint)
+        if key not in self.positions:
+            self.positions[key] = Position.from_doc(wallet, mint, stored) if stored else Position(wallet, mint)
+
+    def apply(self, tx: Dict[str, Any]) -> Position:
+        wallet = tx["wallet"]
+        token = tx.get("token_address")
+        key = (wallet, token)
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = Position(wallet, token)
+
+        qty = float(tx.get("amount") or 0.0)
+        price = tx.get("price")
+        if price is None:
+            # no quote on this transaction: mark at the last price seen for the token
+            price = self.last_price.get(token, 0.0)
+        else:
+            price = float(price)
+            self.last_price[token] = price
+
+        if tx.get("action_type") == "buy":
+            self._buy(pos, qty, price)
+        elif tx.get("action_type") == "sell":
+            self._sell(pos, qty, price)
+
+        ts = tx.get("timestamp")
+        if ts is not None and (pos.last_transaction is None or ts > pos.last_transaction):
+            pos.last_transaction = ts
+        self._dirty.add(key)
+        return pos
+
+    def _buy(self, pos: Position, qty: float, price: float):
+        pos.total_buys += 1
+        pos.buy_volume += qty
+        if pos.net_position < 0:
+            # covering a short (sold before we saw the matching buys): no basis to realize against
+            covered = min(qty, -pos.net_position)
+            pos.net_position += covered
+            qty -= covered
+        if qty <= 0:
+            return
+        pos.net_position += qty
+        pos.cost_basis += qty * price
+        if self.method == "fifo":
+            pos.lots.append([qty, price])
+
+    def _sell(self, pos: Position, qty: float, price: float):
+        pos.total_sells += 1
+        pos.sell_volume += qty
+        held = max(pos.net_position, 0.0)
+        matched = min(qty, held)
+        if matched > 0:
+            if self.method == "fifo":
+                cost = 0.0
+                remaining = matched
+                while remaining > 1e-12 and pos.lots:
+                    lot = pos.lots[0]
+                    take = min(lot[0], remaining)
+                    cost += take * lot[1]
+                    lot[0] -= take
+                    remaining -= take
+                    if lot[0] <= 1e-12:
+                        pos.lots.popleft()
+            else:
+                cost = pos.cost_basis * (matched / held)
+            pos.realized_pnl += matched * price - cost
+            pos.cost_basis = max(pos.cost_basis - cost, 0.0)
+        pos.net_position -= qty
+        if pos.net_position <= 0:
+            pos.cost_basis = 0.0
+            pos.lots.clear()
+
+    def pending_updates(self) -> List[UpdateOne]:
+        # one update per wallet, however many of its mints changed, so a new wallet is upserted once.
+        # `active` is left unset on insert: only a user's untrack sets it false, and discovery may still track the wallet
+        fields: Dict[str, Dict[str, Any]] = {}
+        for key in self._dirty:
+            pos = self.positions.get(key)
+            if pos is not None:
+                fields.setdefault(pos.wallet, {})[f"positions.{pos.mint}"] = pos.to_doc(self.method)
+        return [
+            UpdateOne(
+                {"address": wallet},
+                {"$set": changed, "$setOnInsert": {"tracked_since": datetime.utcnow()}},
+                upsert=True
+            )
+            for wallet, changed in fields.items()
+        ]
+
+    async def flush(self, wallets_collection) -> int:
+        if not self._dirty:
+            return 0
+        ops = self.pending_updates()
+        self._dirty.clear()
+        written = 0
+        for i in range(0, len(ops), self.flush_batch_size):
+            await wallets_collection.bulk_write(ops[i:i + self.flush_batch_size], ordered=False)
+            written += len(ops[i:i + self.flush_batch_size])
+        return written
+
+    async def replay(self, transactions_collection, wallets_collection, batch_size: int = 10000,
+                     until: Optional[datetime] = None, skip: Optional[Container] = None) -> int:
+        """Rebuild every wallet's position from the transaction history in one streaming pass.
+
+        Only transactions up to `until` are read, and those whose _id is in `skip` (by the
+        time the cursor reaches them) are left out, for the caller to apply afterwards.
+        """
+        self.reset()
+        projection = {"wallet": 1, "amount": 1, "action_type": 1, "price": 1, "token_address": 1, "timestamp": 1}
+        query = {"timestamp": {"$lte": until}} if until is not None else {}
+        cursor = transactions_collection.find(query, projection, allow_disk_use=True) \
+            .sort("timestamp", 1).batch_size(batch_size)
+        count = 0
+        async for tx in cursor:
+            if skip is not None and tx["_id"] in skip:
+                continue
+            self.apply(tx)
+            count += 1
+            if self.dirty_count >= self.flush_batch_size:
+                await self.flush(wallets_collection)
+        await self.flush(wallets_collection)
+        logger.info(f"Replayed {count} transactions into {len(self.positions)} wallet/mint positions ({self.method}).")
+        return count
+
+    async def clear_stale(self, wallets_collection) -> int:
+        """Remove stored positions this engine doesn't hold, and the pre-per-mint top-level fields.
+
+        After a replay, a wallet/mint pair without transactions left in the history
+        would otherwise keep the position it had before. Returns the wallets updated.
+        """
+        ops = []
+        query = {"$or": [{field: {"$exists": True}} for field in ("positions",) + LEGACY_FIELDS]}
+        projection = {"_id": 0, "address": 1, "positions": 1, **{field: 1 for field in LEGACY_FIELDS}}
+        async for doc in wallets_collection.find(query, projection):
+            wallet = doc["address"]
+            unset = {f"positions.{mint}": "" for mint in doc.get("positions") or {} if (wallet, mint) not in self.positions}
+            unset.update({field: "" for field in LEGACY_FIELDS if field in doc})
+            if unset:
+                ops.append(UpdateOne({"address": wallet}, {"$unset": unset}))
+        for i in range(0, len(ops), self.flush_batch_size):
+            await wallets_collection.bulk_write(ops[i:i + self.flush_batch_size], ordered=False)
+        return len(ops)
@@ -0,0 +1,217 @@
+import contextvars
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from starlette.responses import JSONResponse
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("tokenwise_trace", default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("_trace", "_name", "_start")
+
+    def __init__(self, trace: "RequestTrace", name: str):
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._trace.add(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class RequestTrace:
+    __slots__ = ("method", "path", "started_at", "start", "spans", "counts")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+class Tracer:
+    """Opt-in per-request phase timing (db / rpc / validation / serialization / send).
+
+    When disabled, `span()` is one attribute check returning a shared no-op context
+    manager and the middleware passes requests straight through. The slowest
+    `capacity` requests are kept in a min-heap with their phase breakdown.
+    """
+
+    PHASES = ("db", "rpc", "validation", "serialization", "send")
+
+    def __init__(self, enabled: bool = False, capacity: int = 50):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.traced = 0
+        self._slowest: List = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, capacity: Optional[int] = None):
+        if enabled is not None:
+            self.enabled = enabled
+        if capacity is not None:
+            with self._lock:
+                self.capacity = max(1, capacity)
+                while len(self._slowest) > self.capacity:
+                    heapq.heappop(self._slowest)
+
+    def reset(self):
+        with self._lock:
+            self._slowest = []
+            self.traced = 0
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NOOP_SPAN
+        trace = _current_trace.get()
+        if trace is None:
+            return _NOOP_SPAN
+        return _Span(trace, name)
+
+    def start(self, method: str, path: str):
+        trace = RequestTrace(method, path)
+        return trace, _current_trace.set(trace)
+
+    def finish(self, trace: RequestTrace, token, status: int):
+        _current_trace.reset(token)
+        duration = time.perf_counter() - trace.start
+        attributed = sum(trace.spans.values())
+        record = {
+            "method": trace.method,
+            "path": trace.path,
+            "status": status,
+            "started_at": trace.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 3),
+            "spans_ms": {k: round(v * 1000, 3) for k, v in trace.spans.items()},
+            "span_counts": dict(trace.counts),
+            # routing, jsonable_encoder, middleware and anything not wrapped in a span
+            "unattributed_ms": round(max(duration - attributed, 0.0) * 1000, 3),
+        }
+        with self._lock:
+            self.traced += 1
+            entry = (duration, next(self._seq), record)
+            if len(self._slowest) < self.capacity:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = sorted(self._slowest, key=lambda e: e[0], reverse=True)
+        return [e[2] for e in entries[:limit]]
+
+
+TRACER = Tracer(enabled=os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true')
+
+
+class TracingMiddleware:
+    """Raw ASGI middleware that opens a request trace when the tracer is enabled."""
+
+    def __init__(self, app, tracer: Tracer = TRACER):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        trace, token = self.tracer.start(scope["method"], scope["path"])
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            start = time.perf_counter()
+            await send(message)
+            trace.add("send", time.perf_counter() - start)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                trace.path = getattr(route, "path", trace.path)
+            self.tracer.finish(trace, token, status)
+
+
+class TracedJSONResponse(JSONResponse):
+    """JSONResponse whose body rendering is recorded as the `serialization` span."""
+
+    def render(self, content: Any) -> bytes:
+        with TRACER.span("serialization"):
+            return super().render(content)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval into folded-stack format.
+
+    Output lines are `frame;frame;frame count`, readable by flamegraph.pl,
+    speedscope and inferno. Sampling runs on its own thread, so it also catches
+    the event loop while it is blocked.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+    def sample(self, seconds: float) -> Counter:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile capture is already running.")
+        try:
+            stacks: Counter = Counter()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    stacks[";".join(reversed(labels))] += 1
+                time.sleep(self.interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def folded(stacks: Counter) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
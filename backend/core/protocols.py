@@ -0,0 +1,28 @@
+# Known DEX program IDs -> protocol name, shared by the server and the seeding tools.
+PROTOCOL_PROGRAM_IDS = {
+    "JUP4Fb2cqiRUcaTHdrPC8h2gNsA2ETXiPDD33WcGuJB": "Jupiter",
+    "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4": "Jupiter",
+    "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8": "Raydium",
+    "5quBtoiQqxF9Jv6KYKctB59NT3gtJD2Y65kdnB1Uev3h": "Raydium",
+    "27haf8L6oxUeXrHrgEgsexjSY5hbVUWEmvv9Nyxg8vQv": "Raydium",
+    "9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP": "Orca",
+    "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc": "Orca",
+    "DjVE6JNiYqPL2QXyCUUh8rNjHrbz9hXHNYt99MQ59qw1": "Orca",
+    "SwaPpA9LAaLfeLi3a68M4DjnLqgtticKg6CnyNwgAC8": "Saber",
+    "22Y43yTVxuUkoRKdm9thyRhQ3SdgQS7c7kB6UNCiaczD": "Serum",
+    "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin": "Serum",
+}
+
+
+def detect_protocol(tx: dict, default: str = "Unknown") -> str:
+    """Name of the first known DEX program a jsonParsed transaction invokes."""
+    message = ((tx or {}).get("transaction") or {}).get("message") or {}
+    for instruction in message.get("instructions") or []:
+        name = PROTOCOL_PROGRAM_IDS.get(instruction.get("programId"))
+        if name:
+            return name
+    for key in message.get("accountKeys") or []:
+        name = PROTOCOL_PROGRAM_IDS.get(key.get("pubkey") if isinstance(key, dict) else key)
+        if name:
+            return name
+    return default
@@ -0,0 +1,148 @@
+import os
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Most recent transactions kept per scope (global and per tracked mint); deeper reads go to Mongo
+RECENT_TX_CAPACITY = int(os.environ.get('RECENT_TX_CAPACITY', '200'))
+RECENT_TX_WALLET_CAPACITY = int(os.environ.get('RECENT_TX_WALLET_CAPACITY', '50'))
+RECENT_TX_MAX_WALLETS = int(os.environ.get('RECENT_TX_MAX_WALLETS', '10000'))
+# Upper bound on client-supplied limits for "latest N" reads
+MAX_READ_LIMIT = 500
+
+_EPOCH = datetime(1970, 1, 1)
+
+# (transaction dict, its JSON serialization)
+Entry = Tuple[Dict[str, Any], str]
+
+
+def _sort_key(doc: Dict[str, Any]) -> float:
+    ts = doc.get("timestamp")
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if isinstance(ts, datetime):
+        return (ts.replace(tzinfo=None) - _EPOCH).total_seconds()
+    return 0.0
+
+
+class _Ring:
+    """The newest `capacity` entries of one scope, ordered by transaction timestamp.
+
+    A ring only answers reads once it is `complete`, i.e. it was primed with the
+    scope's latest rows from Mongo and has been fed every ingested transaction since.
+    """
+
+    __slots__ = ("capacity", "keys", "entries", "complete")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.keys: List[float] = []
+        self.entries: List[Entry] = []
+        self.complete = False
+
+    def add(self, key: float, entry: Entry):
+        if len(self.keys) >= self.capacity and key < self.keys[0]:
+            return  # older than everything kept, so not among the newest `capacity`
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.entries.insert(i, entry)
+        if len(self.keys) > self.capacity:
+            del self.keys[0]
+            del self.entries[0]
+
+    def prime(self, entries: Iterable[Entry]):
+        # merge with whatever was ingested while the priming query ran
+        seen = {doc.get("_id") for doc, _ in self.entries}
+        for doc, raw in entries:
+            if doc.get("_id") not in seen:
+                self.add(_sort_key(doc), (doc, raw))
+        self.complete = True
+
+    def latest(self, limit: int) -> Optional[List[Entry]]:
+        """Newest-first entries, or None if rows beyond the ring would be needed."""
+        if limit <= 0 or not self.complete or (limit > len(self.entries) and len(self.entries) >= self.capacity):
+            return None
+        return self.entries[:-limit - 1:-1]
+
+
+class RecentTransactions:
+    """In-memory "latest N transactions" index, globally, per tracked mint and per hot wallet.
+
+    Every ingested transaction is serialized to JSON once and the same entry is
+    linked into each scope it belongs to, so dashboard pushes, the recent
+    transactions command and the wallet endpoint neither query Mongo nor
+    re-serialize. Wallet rings are created on first read (primed from Mongo) and
+    evicted least-recently-used beyond `max_wallets`.
+    """
+
+    def __init__(self, capacity: int = RECENT_TX_CAPACITY, wallet_capacity: int = RECENT_TX_WALLET_CAPACITY,
+                 max_wallets: int = RECENT_TX_MAX_WALLETS):
+        self.capacity = capacity
+        self.wallet_capacity = wallet_capacity
+        self.max_wallets = max_wallets
+        self.all = _Ring(capacity)
+        self._tokens: Dict[str, _Ring] = {}
+        self._wallets: "OrderedDict[str, _Ring]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, doc: Dict[str, Any], raw: str):
+        key = _sort_key(doc)
+        entry = (doc, raw)
+        self.all.add(key, entry)
+        ring = self._tokens.get(doc.get("token_address"))
+        if ring is not None:
+            ring.add(key, entry)
+        ring = self._wallets.get(doc.get("wallet"))
+        if ring is not None:
+            ring.add(key, entry)
+
+    def track_token(self, mint: str) -> _Ring:
+        ring = self._tokens.get(mint)
+        if ring is None:
+            ring = self._tokens[mint] = _Ring(self.capacity)
+        return ring
+
+    def untrack_token(self, mint: str):
+        self._tokens.pop(mint, None)
+
+    def open_wallet(self, wallet: str) -> _Ring:
+        """Ring for `wallet`, created (incomplete, to be primed) if it isn't cached yet."""
+        ring = self._wallets.get(wallet)
+        if ring is None:
+            ring = self._wallets[wallet] = _Ring(self.wallet_capacity)
+            while len(self._wallets) > self.max_wallets:
+                self._wallets.popitem(last=False)
+        else:
+            self._wallets.move_to_end(wallet)
+        return ring
+
+    def latest(self, limit: int, token: Optional[str] = None) -> Optional[List[Entry]]:
+        ring = self.all if token is None else self._tokens.get(token)
+        entries = ring.latest(limit) if ring is not None else None
+        self._count(entries)
+        return entries
+
+    def latest_for_wallet(self, wallet: str, limit: int) -> Optional[List[Entry]]:
+        ring = self._wallets.get(wallet)
+        entries = ring.latest(limit) if ring is not None else None
+        if ring is not None:
+            self._wallets.move_to_end(wallet)
+        self._count(entries)
+        return entries
+
+    def _count(self, entries):
+        if entries is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "global": len(self.all.entries), "tokens": len(self._tokens),
+                "wallets": len(self._wallets), "hits": self.hits, "misses": self.misses}
+
+
+def json_array(entries: List[Entry]) -> str:
+    """The pre-serialized entries as one JSON array."""
+    return "[" + ", ".join(raw for _, raw in entries) + "]"
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+def make_key(*parts: Any) -> str:
+    """Build a stable coalescing key from JSON-serialisable parts (e.g. RPC method + params)."""
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers asking for the same key.
+
+    The first caller for a key starts the work as a task; every caller that arrives
+    while it is still running awaits the same task instead of issuing its own.
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+        else:
+            self.coalesced += 1
+        # shield so that one caller being cancelled (e.g. a client hanging up)
+        # does not cancel the shared work for everyone else
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception as retrieved even if every waiter went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,54 @@
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "blocking" finishes warm-up before the app accepts requests; "background" serves
+# immediately (from persisted state) while warm-up runs and /api/health/ready reports progress.
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'blocking').lower()
+
+
+class WarmUp:
+    """Ordered warm-up steps with their state and timings, for the readiness probe.
+
+    Steps run one after another; a failing step stops the sequence so the app
+    stays not-ready (but alive) instead of serving half-initialized state.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._steps: List[Dict[str, Any]] = []
+        self.ready = False
+        self.error: Optional[str] = None
+
+    async def run(self, steps: List[Tuple[str, Callable[[], Awaitable[Any]]]]):
+        """Run `(name, coroutine_function)` pairs in order."""
+        self._steps = [{"name": name, "status": "pending", "seconds": None} for name, _ in steps]
+        for step, (name, fn) in zip(self._steps, steps):
+            step["status"] = "running"
+            started = time.perf_counter()
+            try:
+                await fn()
+            except Exception as e:
+                step["status"] = "failed"
+                self.error = f"{name}: {e}"
+                logger.error(f"Warm-up step '{name}' failed: {e}", exc_info=True)
+                raise
+            finally:
+                step["seconds"] = round(time.perf_counter() - started, 3)
+            step["status"] = "done"
+        self.ready = True
+        logger.info(f"Warm-up complete in {time.time() - self.started_at:.2f}s.")
+
+    def to_dict(self) -> Dict[str, Any]:
+        done = sum(1 for step in self._steps if step["status"] == "done")
+        return {
+            "ready": self.ready,
+            "mode": STARTUP_MODE,
+            "progress": f"{done}/{len(self._steps)}",
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "steps": self._steps,
+            "error": self.error,
+        }
@@ -0,0 +1,192 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+# "standard" keeps realtime_transactions as a plain collection; "timeseries" stores it
+# as a MongoDB time-series collection with TTL retention and hourly rollups.
+TRANSACTION_STORAGE = os.environ.get('TRANSACTION_STORAGE', 'standard').lower()
+TX_RETENTION_DAYS = float(os.environ.get('TX_RETENTION_DAYS', '30'))
+
+TX_COLLECTION = "realtime_transactions"
+LEGACY_TX_COLLECTION = "realtime_transactions_legacy"
+ROLLUP_COLLECTION = "transaction_rollups_hourly"
+WALLET_ROLLUP_COLLECTION = "wallet_rollups_hourly"
+STATE_COLLECTION = "storage_state"
+
+# In time-series mode wallet/protocol are also written under the metaField so buckets
+# are grouped per wallet+protocol; the top-level copies keep existing queries working.
+WALLET_FILTER_FIELD = "meta.wallet" if TRANSACTION_STORAGE == "timeseries" else "wallet"
+
+
+def retention_seconds() -> Optional[int]:
+    if TX_RETENTION_DAYS <= 0:
+        return None
+    return int(TX_RETENTION_DAYS * 86400)
+
+
+def to_storage_doc(tx_doc: Dict[str, Any]) -> Dict[str, Any]:
+    if TRANSACTION_STORAGE != "timeseries":
+        return tx_doc
+    doc = dict(tx_doc)
+    doc["meta"] = {"wallet": tx_doc.get("wallet"), "protocol": tx_doc.get("protocol")}
+    return doc
+
+
+async def unstored(collection, docs: List[Dict[str, Any]], key: str = "_id") -> List[Dict[str, Any]]:
+    """The transactions in `docs` whose `key` value `collection` doesn't hold yet.
+
+    Time-series collections don't enforce a unique _id, so a batch inserted twice
+    would be stored twice; writers that may re-run a batch filter it through this.
+    Signatures are not unique per row (both sides of a transfer share one), so only
+    writers that store one row per signature should dedupe on "signature".
+    """
+    if not docs:
+        return []
+    stored = set()
+    async for doc in collection.find({key: {"$in": [d[key] for d in docs]}}, {key: 1}):
+        stored.add(doc[key])
+    return [d for d in docs if d[key] not in stored]
+
+
+async def collection_options(db, name: str) -> Optional[Dict[str, Any]]:
+    async for info in db.list_collections(filter={"name": name}):
+        return info.get("options", {})
+    return None
+
+
+async def create_timeseries_collection(db, name: str = TX_COLLECTION):
+    kwargs = {"timeseries": {"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"}}
+    expire = retention_seconds()
+    if expire:
+        kwargs["expireAfterSeconds"] = expire
+    try:
+        await db.create_collection(name, **kwargs)
+        logger.info(f"Created time-series collection '{name}' (retention: {expire or 'none'}s).")
+    except CollectionInvalid:
+        pass
+
+
+async def ensure_transaction_storage(db):
+    """Make sure realtime_transactions matches the configured storage mode."""
+    if TRANSACTION_STORAGE != "timeseries":
+        # per-mint dashboards and analytics filter on token_address
+        await db[TX_COLLECTION].create_index([("token_address", 1), ("timestamp", -1)])
+        return
+    options = await collection_options(db, TX_COLLECTION)
+    if options is None:
+        await create_timeseries_collection(db)
+    elif "timeseries" not in options:
+        logger.warning(
+            f"TRANSACTION_STORAGE=timeseries but '{TX_COLLECTION}' is a plain collection. "
+            f"Run `python migrate_storage.py` to migrate it."
+        )
+        return
+    else:
+        expire = retention_seconds()
+        if options.get("expireAfterSeconds") != expire:
+            await db.command({"collMod": TX_COLLECTION, "expireAfterSeconds": expire if expire else "off"})
+            logger.info(f"Updated '{TX_COLLECTION}' retention to {expire or 'off'}.")
+    # no unique _id in a time-series collection: re-runnable writers look signatures up before inserting
+    await db[TX_COLLECTION].create_index("signature")
+    await db[ROLLUP_COLLECTION].create_index([("token_address", 1), ("hour", 1)])
+    await db[WALLET_ROLLUP_COLLECTION].create_index([("token_address", 1), ("hour", 1), ("volume", -1)])
+
+
+async def rollup_hours(db, start: datetime, end: datetime, source: str = TX_COLLECTION):
+    """Merge hourly per-mint protocol/action and wallet rollups for [start, end) into the rollup collections."""
+    match = {"$match": {"timestamp": {"$gte": start, "$lt": end}}}
+    hour = {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}
+    await db[source].aggregate([
+        match,
+        {"$group": {
+            "_id": {"hour": hour, "token_address": "$token_address", "protocol": "$protocol", "action_type": "$action_type"},
+            "count": {"$sum": 1},
+            "volume": {"$sum": "$amount"},
+        }},
+        {"$set": {"hour": "$_id.hour", "token_address": "$_id.token_address", "protocol": "$_id.protocol",
+                  "action_type": "$_id.action_type"}},
+        {"$merge": {"into": ROLLUP_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True).to_list(None)
+    await db[source].aggregate([
+        match,
+        {"$group": {
+            "_id": {"hour": hour, "token_address": "$token_address", "wallet": "$wallet"},
+            "count": {"$sum": 1},
+            "volume": {"$sum": "$amount"},
+            "buy_volume": {"$sum": {"$cond": [{"$eq": ["$action_type", "buy"]}, "$amount", 0]}},
+            "sell_volume": {"$sum": {"$cond": [{"$eq": ["$action_type", "sell"]}, "$amount", 0]}},
+        }},
+        {"$set": {"hour": "$_id.hour", "token_address": "$_id.token_address", "wallet": "$_id.wallet"}},
+        {"$merge": {"into": WALLET_ROLLUP_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ], allowDiskUse=True).to_list(None)
+
+
+async def rollup_closed_hours(db, source: str = TX_COLLECTION) -> int:
+    """Roll up every fully elapsed hour since the last checkpoint. Returns the number of hours rolled up."""
+    state = await db[STATE_COLLECTION].find_one({"_id": "rollups"}) or {}
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start = state.get("rolled_up_to")
+    if start is None:
+        first = await db[source].find({}, {"timestamp": 1}).sort("timestamp", 1).limit(1).to_list(1)
+        if not first:
+            return 0
+        start = first[0]["timestamp"].replace(minute=0, second=0, microsecond=0)
+    if start >= current_hour:
+        return 0
+    # roll up a day at a time so one call never turns into a huge aggregation
+    hours = 0
+    while start < current_hour:
+        end = min(start + timedelta(days=1), current_hour)
+        await rollup_hours(db, start, end, source=source)
+        hours += int((end - start).total_seconds() // 3600)
+        await db[STATE_COLLECTION].update_one({"_id": "rollups"}, {"$set": {"rolled_up_to": end}}, upsert=True)
+        start = end
+    return hours
+
+
+# Raw transactions shaped like rollup rows (one row per transaction); `hour` keeps the full timestamp,
+# which groups the same under $dateToString formats that stop at the hour.
+_ACTIVITY_ROW = {"_id": 0, "hour": "$timestamp", "token_address": 1, "protocol": 1, "action_type": 1,
+                 "count": {"$literal": 1}, "volume": "$amount"}
+_WALLET_ROW = {"_id": 0, "hour": "$timestamp", "token_address": 1, "wallet": 1, "count": {"$literal": 1},
+               "volume": "$amount",
+               "buy_volume": {"$cond": [{"$eq": ["$action_type", "buy"]}, "$amount", 0]},
+               "sell_volume": {"$cond": [{"$eq": ["$action_type", "sell"]}, "$amount", 0]}}
+
+
+async def rollup_checkpoint(db) -> Optional[datetime]:
+    """End of the last hour rolled up (exclusive), or None before the first rollup."""
+    state = await db[STATE_COLLECTION].find_one({"_id": "rollups"}, {"rolled_up_to": 1}) or {}
+    return state.get("rolled_up_to")
+
+
+async def aggregate_activity(db, stages: List[Dict[str, Any]], start: Optional[datetime] = None,
+                             token: Optional[str] = None, wallets: bool = False,
+                             length: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Run `stages` over hourly activity rows from `start` (all history if None) to now.
+
+    Rows have hour, token_address, protocol, action_type, count and volume, or with
+    `wallets` hour, token_address, wallet, count, volume, buy_volume and sell_volume;
+    `stages` should $sum count/volume rather than count rows. In time-series mode,
+    hours before the rollup checkpoint come from the rollup collections, which
+    outlive the TTL on raw transactions and are far fewer rows, and only the hours
+    since are read raw. `start` should fall on an hour boundary.
+    """
+    token_match = {"token_address": token} if token else {}
+    cutoff = await rollup_checkpoint(db) if TRANSACTION_STORAGE == "timeseries" else None
+    raw_start = start if cutoff is None else max(start or cutoff, cutoff)
+    raw = [{"$match": {**token_match, **({"timestamp": {"$gte": raw_start}} if raw_start else {})}},
+           {"$project": _WALLET_ROW if wallets else _ACTIVITY_ROW}]
+    if cutoff is None:
+        source, pipeline = TX_COLLECTION, raw + stages
+    else:
+        hours = {"$lt": cutoff, **({"$gte": start} if start else {})}
+        source = WALLET_ROLLUP_COLLECTION if wallets else ROLLUP_COLLECTION
+        pipeline = [{"$match": {**token_match, "hour": hours}},
+                    {"$unionWith": {"coll": TX_COLLECTION, "pipeline": raw}}] + stages
+    return await db[source].aggregate(pipeline, allowDiskUse=True).to_list(length)
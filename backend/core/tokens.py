@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Container, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from core.discovery import AdaptiveSchedule, HolderBook
+from core.live_metrics import LiveMetrics
+from core.wallet_registry import WalletRegistry
+
+DEFAULT_DISCOVERY_INTERVAL = 21600
+
+
+class TokenState:
+    """Everything tracked for one mint: its holder set, discovery schedule and live metrics."""
+
+    __slots__ = ("mint", "wallets", "discovery_interval_seconds", "last_discovery_run", "live_metrics",
+                 "holder_count", "mock_price", "added_at", "schedule", "book", "snapshot")
+
+    def __init__(self, mint: str, protocols: Iterable[str], discovery_interval_seconds: int = DEFAULT_DISCOVERY_INTERVAL,
+                 added_at: Optional[datetime] = None):
+        self.mint = mint
+        self.wallets = WalletRegistry()
+        self.discovery_interval_seconds = discovery_interval_seconds
+        self.last_discovery_run: Optional[datetime] = None
+        self.live_metrics = LiveMetrics(protocols)
+        self.holder_count = 0
+        self.mock_price = 1.0
+        self.added_at = added_at or datetime.utcnow()
+        self.schedule = AdaptiveSchedule(discovery_interval_seconds)
+        self.book = HolderBook()
+        # (owner, balance) by rank as last stored in token_holders; discovery diffs against it
+        self.snapshot: List[Tuple[str, float]] = []
+
+    def discovery_due(self, now: datetime) -> bool:
+        return self.schedule.due(now, self.last_discovery_run)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mint": self.mint,
+            "tracked_wallets": len(self.wallets),
+            "holder_count": self.holder_count,
+            "discovery_interval_seconds": self.discovery_interval_seconds,
+            "last_discovery_run": self.last_discovery_run.isoformat() if self.last_discovery_run else None,
+            "discovery": self.schedule.to_dict(),
+            "holder_book": self.book.to_dict(),
+            "added_at": self.added_at.isoformat(),
+        }
+
+
+class TokenTracker:
+    """Set of tracked mints with a wallet -> mints reverse index.
+
+    The reverse index lets one fetched transaction be routed to every tracked mint
+    it touches, and lets one wallet poll serve all mints that wallet holds.
+    """
+
+    def __init__(self, protocols: Iterable[str], default_interval: int = DEFAULT_DISCOVERY_INTERVAL):
+        self.protocols = tuple(protocols)
+        self.default_interval = default_interval
+        self._tokens: Dict[str, TokenState] = {}
+        self._wallet_mints: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, mint: object) -> bool:
+        return mint in self._tokens
+
+    def __iter__(self) -> Iterator[TokenState]:
+        return iter(list(self._tokens.values()))
+
+    def mints(self) -> List[str]:
+        return list(self._tokens)
+
+    def get(self, mint: str) -> Optional[TokenState]:
+        return self._tokens.get(mint)
+
+    def add(self, mint: str, discovery_interval_seconds: Optional[int] = None,
+            added_at: Optional[datetime] = None) -> TokenState:
+        state = self._tokens.get(mint)
+        if state is None:
+            state = self._tokens[mint] = TokenState(
+                mint, self.protocols, discovery_interval_seconds or self.default_interval, added_at)
+        elif discovery_interval_seconds and discovery_interval_seconds != state.discovery_interval_seconds:
+            state.discovery_interval_seconds = discovery_interval_seconds
+            state.schedule.rebase(discovery_interval_seconds)
+        return state
+
+    def remove(self, mint: str) -> bool:
+        state = self._tokens.pop(mint, None)
+        if state is None:
+            return False
+        for wallet in state.wallets:
+            self._unlink(wallet, mint)
+        return True
+
+    def _unlink(self, wallet: str, mint: str):
+        mints = self._wallet_mints.get(wallet)
+        if mints is not None:
+            mints.discard(mint)
+            if not mints:
+                del self._wallet_mints[wallet]
+
+    def set_holders(self, mint: str, holders: Iterable[Tuple[str, float]], holder_count: Optional[int] = None):
+        """Replace a mint's wallet set with `(owner, balance)` pairs from a discovery snapshot."""
+        state = self._tokens.get(mint)
+        if state is None:
+            return
+        registry = WalletRegistry()
+        for owner, balance in holders:
+            registry.add(owner, balance=balance, token_amount=balance)
+        for wallet in state.wallets:
+            if wallet not in registry:
+                self._unlink(wallet, mint)
+        for wallet in registry:
+            self._wallet_mints.setdefault(wallet, set()).add(mint)
+        state.wallets = registry
+        state.holder_count = len(registry) if holder_count is None else holder_count
+
+    def mints_for_wallet(self, wallet: str) -> FrozenSet[str]:
+        return frozenset(self._wallet_mints.get(wallet, ()))
+
+    def due(self, now: datetime) -> List[TokenState]:
+        return [state for state in self._tokens.values() if state.discovery_due(now)]
+
+    def record(self, tx_doc: Dict[str, Any]):
+        state = self._tokens.get(tx_doc.get("token_address"))
+        if state is not None:
+            state.live_metrics.record(tx_doc)
+            volume = state.book.observe(tx_doc)
+            if volume:
+                state.schedule.pressure += volume / max(state.book.total, 1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tokens": len(self._tokens), "wallets_indexed": len(self._wallet_mints)}
+
+
+class SignatureCache:
+    """Bounded LRU of processed transaction signatures, shared by every mint and wallet poll."""
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, signature: object) -> bool:
+        return signature in self._seen
+
+    def recent(self, count: int) -> List[str]:
+        """The `count` most recently processed signatures, oldest first."""
+        return list(self._seen)[-count:] if count > 0 else []
+
+    def add(self, signature: str) -> bool:
+        """Mark a signature as processed. Returns False if it already was."""
+        if signature in self._seen:
+            self._seen.move_to_end(signature)
+            return False
+        self._seen[signature] = None
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        return True
+
+
+def token_balance_changes(tx: Dict[str, Any], mints: Container[str]) -> List[Dict[str, Any]]:
+    """Per (owner, mint) token balance deltas of a jsonParsed transaction, restricted to `mints`.
+
+    One fetched transaction yields a change for every tracked mint it moved, so a
+    swap between two tracked tokens is fetched once and recorded for both.
+    """
+    meta = (tx or {}).get("meta") or {}
+    if meta.get("err") is not None:
+        return []
+    balances: Dict[Tuple[str, str], List[float]] = {}
+    for field, slot in (("preTokenBalances", 0), ("postTokenBalances", 1)):
+        for entry in meta.get(field) or []:
+            mint = entry.get("mint")
+            owner = entry.get("owner")
+            if mint not in mints or not owner:
+                continue
+            amount = (entry.get("uiTokenAmount") or {}).get("uiAmount") or 0.0
+            balances.setdefault((owner, mint), [0.0, 0.0])[slot] += amount
+
+    changes = []
+    for (owner, mint), (pre, post) in balances.items():
+        delta = post - pre
+        if delta == 0:
+            continue
+        changes.append({
+            "wallet": owner,
+            "token_address": mint,
+            "amount": abs(delta),
+            "action_type": "buy" if delta > 0 else "sell",
+            "pre_balance": pre,
+            "post_balance": post,
+        })
+    return changes
+
+
+def mark_transfers(changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in from_address/to_address where a mint moved from exactly one owner to exactly one other.
+
+    Only meaningful for transactions that invoke no DEX: in a swap the other
+    side is a pool, not a counterparty.
+    """
+    by_mint: Dict[str, List[Dict[str, Any]]] = {}
+    for change in changes:
+        by_mint.setdefault(change["token_address"], []).append(change)
+    for group in by_mint.values():
+        senders = [c["wallet"] for c in group if c["action_type"] == "sell"]
+        receivers = [c["wallet"] for c in group if c["action_type"] == "buy"]
+        if len(senders) == 1 and len(receivers) == 1:
+            for change in group:
+                change["from_address"], change["to_address"] = senders[0], receivers[0]
+    return changes
@@ -0,0 +1,133 @@
+import math
+import random
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class WalletRegistry:
+    """Compact in-memory set of tracked wallets.
+
+    Wallets live in parallel arrays (one slot per wallet) with an address -> index
+    map, so membership is a dict lookup and add/remove are O(1) (removal swaps the
+    last slot into the hole). Unknown balances are stored as NaN.
+    """
+
+    __slots__ = ("_index", "_addresses", "_balances", "_token_amounts", "_tracked_since")
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self._addresses: List[str] = []
+        self._balances = array("d")
+        self._token_amounts = array("d")
+        self._tracked_since = array("d")
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __contains__(self, address: object) -> bool:
+        return address in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._addresses)
+
+    def add(self, address: str, balance: Optional[float] = None, token_amount: Optional[float] = None,
+            tracked_since: Optional[datetime] = None) -> bool:
+        """Track a wallet, or refresh its balances if already tracked. Returns True if it was new."""
+        idx = self._index.get(address)
+        if idx is not None:
+            if balance is not None:
+                self._balances[idx] = balance
+            if token_amount is not None:
+                self._token_amounts[idx] = token_amount
+            return False
+
+        since = tracked_since or datetime.utcnow()
+        self._index[address] = len(self._addresses)
+        self._addresses.append(address)
+        self._balances.append(math.nan if balance is None else balance)
+        self._token_amounts.append(math.nan if token_amount is None else token_amount)
+        self._tracked_since.append((since - _EPOCH).total_seconds())
+        return True
+
+    def remove(self, address: str) -> bool:
+        idx = self._index.pop(address, None)
+        if idx is None:
+            return False
+        last = len(self._addresses) - 1
+        if idx != last:
+            moved = self._addresses[last]
+            self._addresses[idx] = moved
+            self._balances[idx] = self._balances[last]
+            self._token_amounts[idx] = self._token_amounts[last]
+            self._tracked_since[idx] = self._tracked_since[last]
+            self._index[moved] = idx
+        self._addresses.pop()
+        self._balances.pop()
+        self._token_amounts.pop()
+        self._tracked_since.pop()
+        return True
+
+    def clear(self):
+        self._index.clear()
+        del self._addresses[:]
+        del self._balances[:]
+        del self._token_amounts[:]
+        del self._tracked_since[:]
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        idx = self._index.get(address)
+        if idx is None:
+            return None
+        return self._record(idx)
+
+    def random_address(self, rng: random.Random = random) -> Optional[str]:
+        if not self._addresses:
+            return None
+        return self._addresses[rng.randrange(len(self._addresses))]
+
+    def addresses(self) -> List[str]:
+        return list(self._addresses)
+
+    def page(self, start: int, count: int) -> List[str]:
+        """Up to `count` addresses starting at slot `start`, wrapping around (for round-robin polling)."""
+        n = len(self._addresses)
+        if not n:
+            return []
+        start %= n
+        batch = self._addresses[start:start + count]
+        if len(batch) < count:
+            batch += self._addresses[:min(count - len(batch), start)]
+        return batch
+
+    def columns(self):
+        """Copies of (addresses, balances, token_amounts, tracked_since) for snapshotting."""
+        return (list(self._addresses), array("d", self._balances), array("d", self._token_amounts),
+                array("d", self._tracked_since))
+
+    @classmethod
+    def from_columns(cls, addresses: List[str], balances: array, token_amounts: array,
+                     tracked_since: array) -> "WalletRegistry":
+        if not len(addresses) == len(balances) == len(token_amounts) == len(tracked_since):
+            raise ValueError("registry columns differ in length")
+        registry = cls()
+        registry._addresses = list(addresses)
+        registry._index = {address: i for i, address in enumerate(registry._addresses)}
+        if len(registry._index) != len(registry._addresses):
+            raise ValueError("duplicate addresses in registry columns")
+        registry._balances = balances
+        registry._token_amounts = token_amounts
+        registry._tracked_since = tracked_since
+        return registry
+
+    def _record(self, idx: int) -> Dict[str, Any]:
+        balance = self._balances[idx]
+        token_amount = self._token_amounts[idx]
+        return {
+            "address": self._addresses[idx],
+            "balance": None if math.isnan(balance) else balance,
+            "token_amount": None if math.isnan(token_amount) else token_amount,
+            "tracked_since": _EPOCH + timedelta(seconds=self._tracked_since[idx]),
+        }
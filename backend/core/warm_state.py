@@ -0,0 +1,205 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.wallet_registry import WalletRegistry
+
+logger = logging.getLogger(__name__)
+
+# "file" or "mongo" enables periodic warm-state snapshots; empty disables them
+WARM_SNAPSHOT_STORE = os.environ.get('WARM_SNAPSHOT_STORE', '').lower()
+WARM_SNAPSHOT_PATH = os.environ.get('WARM_SNAPSHOT_PATH', 'warm_state.bin')
+WARM_SNAPSHOT_INTERVAL = int(os.environ.get('WARM_SNAPSHOT_INTERVAL', '300'))
+# Older snapshots are ignored and state is rebuilt from the database as before
+WARM_SNAPSHOT_MAX_AGE = int(os.environ.get('WARM_SNAPSHOT_MAX_AGE', '21600'))
+
+MAGIC = b"TWSNAP1\n"
+FORMAT_VERSION = 1
+# Mongo documents are capped at 16 MB
+MONGO_MAX_BYTES = 15 * 1024 * 1024
+
+
+class SnapshotWriter:
+    """Builds a compact binary snapshot: a JSON header plus raw array/string blobs.
+
+    Numeric state (the wallet registry columns, ring-counter buckets) is stored as
+    the array's own bytes rather than as per-element JSON, so encoding and decoding
+    are memcpy-speed. The whole body is zlib-compressed.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+        self._blobs: Dict[str, Dict[str, Any]] = {}
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value."""
+        self._values[key] = value
+
+    def _blob(self, key: str, data: bytes, **meta):
+        self._blobs[key] = dict(meta, offset=self._offset, size=len(data))
+        self._chunks.append(data)
+        self._offset += len(data)
+
+    def put_array(self, key: str, values: array):
+        self._blob(key, values.tobytes(), typecode=values.typecode)
+
+    def put_strings(self, key: str, strings: List[str]):
+        self._blob(key, "\n".join(strings).encode(), count=len(strings))
+
+    def to_bytes(self, level: int = 6) -> bytes:
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "written_at": time.time(),
+            "byteorder": sys.byteorder,
+            "values": self._values,
+            "blobs": self._blobs,
+        }, default=str).encode()
+        body = struct.pack("<I", len(header)) + header + b"".join(self._chunks)
+        return MAGIC + zlib.compress(body, level)
+
+
+class SnapshotReader:
+    def __init__(self, data: bytes):
+        if not data.startswith(MAGIC):
+            raise ValueError("not a warm-state snapshot")
+        body = zlib.decompress(data[len(MAGIC):])
+        (header_size,) = struct.unpack_from("<I", body)
+        self.header = json.loads(body[4:4 + header_size])
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot version {self.header.get('version')}")
+        self._data = memoryview(body)[4 + header_size:]
+
+    @property
+    def written_at(self) -> float:
+        return self.header["written_at"]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.header["values"] or key in self.header["blobs"]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.header["values"].get(key, default)
+
+    def _raw(self, key: str) -> memoryview:
+        blob = self.header["blobs"][key]
+        return self._data[blob["offset"]:blob["offset"] + blob["size"]]
+
+    def get_array(self, key: str) -> array:
+        values = array(self.header["blobs"][key]["typecode"])
+        values.frombytes(self._raw(key))
+        if self.header["byteorder"] != sys.byteorder:
+            values.byteswap()
+        return values
+
+    def get_strings(self, key: str) -> List[str]:
+        if not self.header["blobs"][key]["count"]:
+            return []
+        return bytes(self._raw(key)).decode().split("\n")
+
+
+class FileSnapshotStore:
+    """Snapshot on local disk, replaced atomically (temp file + fsync + rename)."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def _write(self, data: bytes):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _read(self) -> Optional[bytes]:
+        try:
+            return self.path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    async def save(self, data: bytes):
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    async def load(self) -> Optional[bytes]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._read)
+
+    def describe(self) -> str:
+        return str(self.path)
+
+
+class MongoSnapshotStore:
+    """Snapshot as a single binary field in storage_state; one replace_one is atomic."""
+
+    def __init__(self, db, doc_id: str = "warm_snapshot"):
+        self.db = db
+        self.doc_id = doc_id
+
+    async def save(self, data: bytes):
+        if len(data) > MONGO_MAX_BYTES:
+            raise ValueError(f"snapshot is {len(data)} bytes, too large for a Mongo document; use the file store")
+        await self.db.storage_state.replace_one(
+            {"_id": self.doc_id}, {"_id": self.doc_id, "data": data, "size": len(data), "written_at": time.time()},
+            upsert=True
+        )
+
+    async def load(self) -> Optional[bytes]:
+        doc = await self.db.storage_state.find_one({"_id": self.doc_id})
+        return bytes(doc["data"]) if doc else None
+
+    def describe(self) -> str:
+        return f"storage_state/{self.doc_id}"
+
+
+def snapshot_store(db) -> Optional[Any]:
+    if WARM_SNAPSHOT_STORE == "file":
+        return FileSnapshotStore(WARM_SNAPSHOT_PATH)
+    if WARM_SNAPSHOT_STORE == "mongo":
+        return MongoSnapshotStore(db)
+    if WARM_SNAPSHOT_STORE:
+        logger.warning(f"Unknown WARM_SNAPSHOT_STORE '{WARM_SNAPSHOT_STORE}'; warm-state snapshots disabled.")
+    return None
+
+
+def put_registry(writer: SnapshotWriter, key: str, registry):
+    addresses, balances, token_amounts, tracked_since = registry.columns()
+    writer.put_strings(f"{key}.addresses", addresses)
+    writer.put_array(f"{key}.balances", balances)
+    writer.put_array(f"{key}.token_amounts", token_amounts)
+    writer.put_array(f"{key}.tracked_since", tracked_since)
+
+
+def read_registry(reader: SnapshotReader, key: str) -> WalletRegistry:
+    return WalletRegistry.from_columns(
+        reader.get_strings(f"{key}.addresses"),
+        reader.get_array(f"{key}.balances"),
+        reader.get_array(f"{key}.token_amounts"),
+        reader.get_array(f"{key}.tracked_since"),
+    )
+
+
+def put_live_metrics(writer: SnapshotWriter, key: str, metrics):
+    writer.put(f"{key}.fields", list(metrics.per_second.fields))
+    for name in ("per_second", "per_minute"):
+        values, stamps = getattr(metrics, name).state()
+        writer.put_array(f"{key}.{name}.values", values)
+        writer.put_array(f"{key}.{name}.stamps", stamps)
+
+
+def restore_live_metrics(reader: SnapshotReader, key: str, metrics) -> bool:
+    """Load saved ring buckets into `metrics`; False if absent or the field layout has changed."""
+    if reader.get(f"{key}.fields") != list(metrics.per_second.fields):
+        return False
+    for name in ("per_second", "per_minute"):
+        getattr(metrics, name).restore(reader.get_array(f"{key}.{name}.values"),
+                                       reader.get_array(f"{key}.{name}.stamps"))
+    return True
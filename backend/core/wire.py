@@ -0,0 +1,136 @@
+import json
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:  # optional: without it every client gets JSON
+    msgpack = None
+
+# Message fields whose string values are Solana addresses (replaced by dictionary ids for compact clients)
+ADDRESS_KEYS = frozenset({
+    "wallet", "wallet_address", "owner", "address", "from_address", "to_address",
+    "token", "token_address", "mint", "monitoring_token",
+})
+
+Payload = Union[str, bytes]
+
+
+class AddressBook:
+    """Process-wide address -> small integer ids.
+
+    Ids are assigned once and never reused, so a broadcast is encoded once for
+    every compact client and each connection only tracks which ids it has been
+    told about. Past `capacity` distinct addresses, new ones stay inline.
+    """
+
+    def __init__(self, capacity: int = 1_000_000):
+        self.capacity = capacity
+        self._ids: Dict[str, int] = {}
+        self._addresses: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def id_for(self, address: str) -> Optional[int]:
+        idx = self._ids.get(address)
+        if idx is None and len(self._addresses) < self.capacity:
+            idx = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+        return idx
+
+    def address(self, idx: int) -> str:
+        return self._addresses[idx]
+
+
+class WireFormat:
+    """One way of encoding outgoing messages: JSON text or MessagePack binary, optionally with address ids."""
+
+    def __init__(self, encoding: str = "json", addresses: bool = False, book: Optional[AddressBook] = None):
+        if encoding == "msgpack" and msgpack is None:
+            raise ValueError("msgpack is not installed")
+        self.encoding = encoding
+        self.addresses = addresses and book is not None
+        self.book = book
+        self.name = f"{encoding}+dict" if self.addresses else encoding
+
+    @property
+    def plain(self) -> bool:
+        """True when messages go out exactly as the server serialized them."""
+        return self.encoding == "json" and not self.addresses
+
+    def dump(self, obj: Any) -> Payload:
+        if self.encoding == "msgpack":
+            return msgpack.packb(obj, use_bin_type=True)
+        return json.dumps(obj, separators=(",", ":"))
+
+    def encode(self, message: str) -> Tuple[Payload, FrozenSet[int]]:
+        """Re-encode a JSON text message; returns the payload and the address ids it references."""
+        if self.plain:
+            return message, frozenset()
+        obj = json.loads(message)
+        used: Set[int] = set()
+        if self.addresses:
+            obj = self._compact(obj, used)
+        return self.dump(obj), frozenset(used)
+
+    def _compact(self, obj: Any, used: Set[int]) -> Any:
+        if isinstance(obj, dict):
+            out = {}
+            for key, value in obj.items():
+                if key in ADDRESS_KEYS and isinstance(value, str):
+                    idx = self.book.id_for(value)
+                    if idx is not None:
+                        used.add(idx)
+                        value = idx
+                else:
+                    value = self._compact(value, used)
+                out[key] = value
+            return out
+        if isinstance(obj, list):
+            return [self._compact(item, used) for item in obj]
+        return obj
+
+    def decode(self, frame: Payload) -> Any:
+        if isinstance(frame, bytes):
+            if msgpack is None:
+                raise ValueError("binary frames need msgpack")
+            return msgpack.unpackb(frame, raw=False)
+        return json.loads(frame)
+
+
+class ClientCodec:
+    """A connection's negotiated wire format plus the address ids it already knows."""
+
+    def __init__(self, wire: WireFormat):
+        self.wire = wire
+        self._known: Set[int] = set()
+
+    def definitions(self, ids: Iterable[int]) -> Optional[Payload]:
+        """An `addresses` message defining the ids this client hasn't seen yet, or None."""
+        missing = [idx for idx in ids if idx not in self._known]
+        if not missing:
+            return None
+        self._known.update(missing)
+        return self.wire.dump({"type": "addresses", "defs": {str(idx): self.wire.book.address(idx) for idx in missing}})
+
+    async def send(self, websocket, encoded: Tuple[Payload, FrozenSet[int]]):
+        payload, ids = encoded
+        defs = self.definitions(ids) if ids else None
+        if defs is not None:
+            await _send(websocket, defs)
+        await _send(websocket, payload)
+
+
+async def _send(websocket, payload: Payload):
+    if isinstance(payload, bytes):
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+
+def negotiate(encoding: Optional[str], addresses: Optional[str], book: AddressBook) -> WireFormat:
+    """Wire format for a connection's ?encoding=json|msgpack&addresses=inline|dict, falling back to JSON."""
+    encoding = (encoding or "json").lower()
+    if encoding not in ("json", "msgpack") or (encoding == "msgpack" and msgpack is None):
+        encoding = "json"
+    return WireFormat(encoding, (addresses or "").lower() == "dict", book)
@@ -0,0 +1,105 @@
+# migrate_storage.py
+# Moves realtime_transactions from a plain collection into a time-series collection.
+import asyncio
+import os
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+os.environ.setdefault('TRANSACTION_STORAGE', 'timeseries')
+
+from core import storage  # noqa: E402  (reads TRANSACTION_STORAGE at import)
+
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME', 'tokenwise_db')
+
+app = typer.Typer(add_completion=False)
+
+
+async def migrate(batch_size: int, drop_legacy: bool):
+    if not MONGO_URL:
+        raise RuntimeError("MONGO_URL is not set in environment")
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+    try:
+        options = await storage.collection_options(db, storage.TX_COLLECTION)
+        legacy = await storage.collection_options(db, storage.LEGACY_TX_COLLECTION)
+
+        if options is not None and "timeseries" not in options:
+            if legacy is not None:
+                raise RuntimeError(f"Both '{storage.TX_COLLECTION}' and '{storage.LEGACY_TX_COLLECTION}' exist as plain collections; resolve manually.")
+            await db[storage.TX_COLLECTION].rename(storage.LEGACY_TX_COLLECTION)
+            print(f"Renamed '{storage.TX_COLLECTION}' to '{storage.LEGACY_TX_COLLECTION}'.")
+            legacy = {}
+
+        await storage.create_timeseries_collection(db)
+        await db[storage.TX_COLLECTION].create_index("signature")
+        # _flush looks copied rows up by _id, which a time-series collection doesn't index by itself
+        await db[storage.TX_COLLECTION].create_index("_id")
+
+        if legacy is None:
+            print("No legacy collection to copy. Done.")
+            return
+
+        # Roll up the whole history first: anything older than the retention window
+        # expires as soon as it lands in the time-series collection.
+        hours = await storage.rollup_closed_hours(db, source=storage.LEGACY_TX_COLLECTION)
+        print(f"Rolled up {hours} hours of history into '{storage.ROLLUP_COLLECTION}'.")
+
+        state = await db[storage.STATE_COLLECTION].find_one({"_id": "migration"}) or {}
+        query = {"_id": {"$gt": state["last_id"]}} if state.get("last_id") is not None else {}
+        total = await db[storage.LEGACY_TX_COLLECTION].count_documents(query)
+        print(f"Copying {total} transactions in batches of {batch_size}...")
+
+        copied = 0
+        batch = []
+        cursor = db[storage.LEGACY_TX_COLLECTION].find(query).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            batch.append(storage.to_storage_doc(doc))
+            if len(batch) >= batch_size:
+                copied += await _flush(db, batch)
+                print(f"  {copied}/{total}")
+        copied += await _flush(db, batch)
+        print(f"Copied {copied} transactions.")
+
+        if drop_legacy:
+            await db[storage.LEGACY_TX_COLLECTION].drop()
+            await db[storage.STATE_COLLECTION].delete_one({"_id": "migration"})
+            print(f"Dropped '{storage.LEGACY_TX_COLLECTION}'.")
+    finally:
+        client.close()
+
+
+async def _flush(db, batch) -> int:
+    if not batch:
+        return 0
+    last_id = batch[-1]["_id"]
+    # a crash between the insert and the checkpoint re-copies this batch on resume, and the
+    # time-series collection would keep both copies: skip _ids that already made it across
+    # (not signatures: both sides of a transfer are separate rows under one signature)
+    docs = await storage.unstored(db[storage.TX_COLLECTION], batch)
+    if docs:
+        await db[storage.TX_COLLECTION].insert_many(docs, ordered=False)
+    # checkpoint so an interrupted migration resumes after the last copied batch
+    await db[storage.STATE_COLLECTION].update_one(
+        {"_id": "migration"}, {"$set": {"last_id": last_id}}, upsert=True
+    )
+    batch.clear()
+    return len(docs)
+
+
+@app.command()
+def main(
+    batch_size: int = typer.Option(5000, help="Documents per insert_many batch."),
+    drop_legacy: bool = typer.Option(False, help="Drop the legacy collection once the copy completes."),
+):
+    """Migrate realtime_transactions into a time-series collection with TTL retention."""
+    asyncio.run(migrate(batch_size, drop_legacy))
+
+
+if __name__ == "__main__":
+    app()
@@ -1,27 +1,45 @@
 # seed_db.py
+# Seeds sample holders and generates synthetic wallets/transactions at production scale.
+#
+#   python seed_db.py                               # sample top holders + tracked wallets
+#   python seed_db.py transactions --count 2000000  # synthetic transaction load
+#   python seed_db.py --help
 import asyncio
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from bson import ObjectId
+
+import numpy as np
+import typer
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+from core import storage  # noqa: E402  (reads TRANSACTION_STORAGE after .env is loaded)
+from core.protocols import PROTOCOL_PROGRAM_IDS  # noqa: E402
+
 MONGO_URL = os.environ.get('MONGO_URL')
 DB_NAME = os.environ.get('DB_NAME', 'tokenwise_db')
 TOKEN_CONTRACT = os.environ.get('TOKEN_CONTRACT', '9BB6NFEcjBCtnNLFko2FqVQBq8HHM13kCyYcdQbgpump')
 
-if not MONGO_URL:
-    raise RuntimeError("MONGO_URL is not set in environment")
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+app = typer.Typer(add_completion=False, help="Seed TokenWise MongoDB with sample and synthetic data.")
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
 
-async def seed_top_holders():
+def get_db():
+    if not MONGO_URL:
+        raise RuntimeError("MONGO_URL is not set in environment")
+    client = AsyncIOMotorClient(MONGO_URL)
+    return client, client[DB_NAME]
+
+async def seed_top_holders(db):
     print("Seeding sample top token holders...")
 
     token_decimals = 6 # For USDC (9BB6NFEcjBCtnNLFko2FqVQBq8HHM13kCyYcdQbgpump)
@@ -156,30 +174,210 @@ async def seed_top_holders():
     print(f"Inserted/Updated {len(sample_holders_data)} sample token holders into 'token_holders' collection.")
 
     # Also track these wallets in the 'wallets' collection so real-time monitoring can pick them up
-    for holder in sample_holders_data:
-        wallet_address = holder["owner"]
-        existing = await db.wallets.find_one({"address": wallet_address})
-        if not existing:
-            wallet_tracker = {
-                "address": wallet_address,
-                "tracked_since": datetime.utcnow(),
-                "active": True,
-                "balance": holder["balance"],
-                "token_amount": holder["balance"],
-                "total_buys": 0,
-                "total_sells": 0
-            }
-            await db.wallets.insert_one(wallet_tracker)
-            print(f"Tracked wallet: {wallet_address[:8]}... with {holder['balance']} tokens")
-        else:
-            print(f"Wallet {wallet_address[:8]}... already tracked. Updating balance.")
-            await db.wallets.update_one(
-                {"address": wallet_address},
-                {"$set": {"balance": holder["balance"], "token_amount": holder["balance"], "last_updated": datetime.utcnow()}}
+    now = datetime.utcnow()
+    result = await db.wallets.bulk_write([
+        UpdateOne(
+            {"address": holder["owner"]},
+            {
+                "$set": {"balance": holder["balance"], "token_amount": holder["balance"], "last_updated": now},
+                "$setOnInsert": {"tracked_since": now, "active": True},
+            },
+            upsert=True
+        )
+        for holder in sample_holders_data
+    ], ordered=False)
+    print(f"Tracked wallets: {result.upserted_count} new, {result.modified_count} updated.")
+    return [h["owner"] for h in sample_holders_data]
+
+
+def synthetic_addresses(prefix: str, count: int, offset: int = 0):
+    """Deterministic 44-char base58-looking addresses, so re-runs hit the same wallets."""
+    pad = BASE58_ALPHABET * 2
+    return [f"{prefix}{i + offset:010d}{pad[(i + offset) % 58:(i + offset) % 58 + 44 - len(prefix) - 10]}"
+            for i in range(count)]
+
+
+async def seed_wallets(db, count: int, batch_size: int = 10000, prefix: str = "Syn"):
+    now = datetime.utcnow()
+    written = 0
+    for start in range(0, count, batch_size):
+        addresses = synthetic_addresses(prefix, min(batch_size, count - start), offset=start)
+        await db.wallets.bulk_write([
+            UpdateOne(
+                {"address": address},
+                {"$setOnInsert": {"address": address, "tracked_since": now, "active": True}},
+                upsert=True
             )
+            for address in addresses
+        ], ordered=False)
+        written += len(addresses)
+    print(f"Upserted {written} synthetic wallets.")
+
+
+def bursty_offsets(rng, count: int, span_seconds: float, burst_factor: float = 20.0, burst_share: float = 0.1):
+    """Arrival times over [0, span): quiet stretches punctuated by bursts at `burst_factor`x the base rate."""
+    # alternate quiet/burst regimes with geometric run lengths, exponential gaps within each
+    regimes = rng.random(count) < burst_share
+    run_starts = np.flatnonzero(np.diff(regimes.astype(np.int8), prepend=-1))
+    run_lengths = np.diff(np.append(run_starts, count))
+    rates = np.where(regimes[run_starts], burst_factor, 1.0)
+    gaps = rng.exponential(1.0, count) / np.repeat(rates, run_lengths)
+    offsets = np.cumsum(gaps)
+    return offsets / offsets[-1] * span_seconds
+
+
+def build_transactions(rng, seed: int, start_index: int, count: int, wallets, wallet_p, start: datetime,
+                       span_seconds: float, price0: float = 1.0):
+    protocols = sorted(set(PROTOCOL_PROGRAM_IDS.values()))
+    # protocol mix weighted by how many program IDs each protocol has, Jupiter/Raydium ahead
+    protocol_p = np.array([list(PROTOCOL_PROGRAM_IDS.values()).count(p) for p in protocols], dtype=float)
+    protocol_p /= protocol_p.sum()
+
+    offsets = bursty_offsets(rng, count, span_seconds)
+    wallet_idx = rng.choice(len(wallets), count, p=wallet_p)
+    protocol_idx = rng.choice(len(protocols), count, p=protocol_p)
+    is_buy = rng.random(count) < 0.52
+    amounts = np.round(rng.lognormal(4.5, 1.6, count), 4)
+    prices = np.round(price0 * np.exp(np.cumsum(rng.normal(0, 0.002, count))), 6)
+    epoch = (start - datetime(1970, 1, 1)).total_seconds()
+    block_times = (epoch + offsets).astype(np.int64)
+    slots = (250_000_000 + (epoch + offsets - 1_600_000_000) * 2.5).astype(np.int64)
+
+    # convert to plain Python lists once; per-element numpy scalar access dominates otherwise
+    timestamps = (np.datetime64(start, "us") + (offsets * 1e6).astype("timedelta64[us]")).tolist()
+    wallet_names = [wallets[j] for j in wallet_idx.tolist()]
+    protocol_names = [protocols[j] for j in protocol_idx.tolist()]
+    actions = ["buy" if b else "sell" for b in is_buy.tolist()]
+    amount_list, price_list = amounts.tolist(), prices.tolist()
+    block_time_list, slot_list = block_times.tolist(), slots.tolist()
+
+    docs = []
+    for i in range(count):
+        signature = f"syn{seed}x{start_index + i:012d}"
+        docs.append(storage.to_storage_doc({
+            "_id": signature,
+            "signature": signature,
+            "timestamp": timestamps[i],
+            "wallet": wallet_names[i],
+            "token_address": TOKEN_CONTRACT,
+            "amount": amount_list[i],
+            "action_type": actions[i],
+            "protocol": protocol_names[i],
+            "block_time": block_time_list[i],
+            "slot": slot_list[i],
+            "price": price_list[i],
+            "from_address": None,
+            "to_address": None,
+            "pre_balance": None,
+            "post_balance": None,
+            "is_mock": True,
+        }))
+    return docs, float(prices[-1]) if count else price0
+
+
+async def _insert_batch(db, docs) -> int:
+    # deterministic signatures make re-runs idempotent: ones already stored are skipped. The lookup is
+    # what does it for a time-series collection, which happily stores a second copy under the same _id
+    docs = await storage.unstored(db.realtime_transactions, docs, key="signature")
+    if not docs:
+        return 0
+    try:
+        result = await db.realtime_transactions.bulk_write([InsertOne(d) for d in docs], ordered=False)
+        return result.inserted_count
+    except BulkWriteError as e:
+        # a concurrent writer got there first (plain collections only): skip the duplicates, anything else is fatal
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+async def seed_transactions(db, count: int, wallets: int, days: float, seed: int, batch_size: int,
+                            concurrency: int, zipf: float, extra_wallets=()):
+    # creates the time-series collection and its signature index when TRANSACTION_STORAGE=timeseries
+    await storage.ensure_transaction_storage(db)
+    rng = np.random.default_rng(seed)
+    pool = list(extra_wallets) + synthetic_addresses("Syn", wallets)
+    # power-law activity: wallet k is picked with weight 1/k^zipf
+    weights = 1.0 / np.arange(1, len(pool) + 1) ** zipf
+    rng.shuffle(weights)
+    weights /= weights.sum()
+
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    span = (end - start).total_seconds()
+    per_batch_span = span * batch_size / max(count, 1)
+
+    t0 = time.perf_counter()
+    inserted = 0
+    pending = set()
+    price = 1.0
+    for i, offset in enumerate(range(0, count, batch_size)):
+        n = min(batch_size, count - offset)
+        batch_start = start + timedelta(seconds=per_batch_span * i)
+        docs, price = build_transactions(rng, seed, offset, n, pool, weights, batch_start, per_batch_span * n / batch_size, price)
+        pending.add(asyncio.create_task(_insert_batch(db, docs)))
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            inserted += sum(t.result() for t in done)
+            elapsed = time.perf_counter() - t0
+            print(f"  {offset + n}/{count} generated, {inserted} inserted ({inserted / elapsed:,.0f} docs/s)")
+    if pending:
+        done, _ = await asyncio.wait(pending)
+        inserted += sum(t.result() for t in done)
+    elapsed = time.perf_counter() - t0
+    print(f"Inserted {inserted} of {count} synthetic transactions in {elapsed:.1f}s "
+          f"({inserted / max(elapsed, 1e-9):,.0f} docs/s); {count - inserted} already present.")
+
+
+def run(coro_fn, *args, **kwargs):
+    async def main():
+        client, db = get_db()
+        try:
+            return await coro_fn(db, *args, **kwargs)
+        finally:
+            client.close()
+    return asyncio.run(main())
+
+
+@app.callback(invoke_without_command=True)
+def default(ctx: typer.Context):
+    """With no sub-command, seed the sample top holders (the original behaviour)."""
+    if ctx.invoked_subcommand is None:
+        run(seed_top_holders)
+        print("Seeding complete.")
+
+
+@app.command()
+def holders():
+    """Bulk-upsert the sample top holders snapshot and their tracked wallets."""
+    run(seed_top_holders)
+
+
+@app.command()
+def wallets(count: int = typer.Option(100_000, help="Number of synthetic tracked wallets."),
+            batch_size: int = typer.Option(10_000, help="Upserts per bulk_write.")):
+    """Bulk-upsert synthetic tracked wallets."""
+    run(seed_wallets, count, batch_size=batch_size)
+
+
+@app.command()
+def transactions(
+    count: int = typer.Option(1_000_000, help="Number of synthetic transactions."),
+    wallets: int = typer.Option(50_000, help="Size of the synthetic wallet pool."),
+    days: float = typer.Option(7.0, help="Spread arrivals over this many days up to now."),
+    seed: int = typer.Option(42, help="RNG seed; the same seed regenerates the same _ids (idempotent)."),
+    batch_size: int = typer.Option(10_000, help="Documents per bulk_write."),
+    concurrency: int = typer.Option(4, help="bulk_write batches in flight."),
+    zipf: float = typer.Option(1.1, help="Power-law exponent for wallet activity."),
+    with_holders: bool = typer.Option(True, help="Also seed the sample holders and let them trade."),
+):
+    """Generate synthetic transactions with power-law wallets, the known protocol mix and bursty arrivals."""
+    async def _seed(db):
+        extra = await seed_top_holders(db) if with_holders else []
+        await seed_transactions(db, count, wallets, days, seed, batch_size, concurrency, zipf, extra_wallets=extra)
+    run(_seed)
 
-    print("Seeding complete.")
-    client.close()
 
 if __name__ == "__main__":
-    asyncio.run(seed_top_holders())
\ No newline at end of file
+    app()
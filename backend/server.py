@@ -1,8 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, HTTPException, WebSocket, WebSocketDisconnect, Header, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
 import os
 import logging
 from pathlib import Path
@@ -15,11 +18,47 @@ import asyncio
 import aiohttp
 import time
 import traceback
-from collections import defaultdict
 import random
+import threading
+import math
+import hmac
 
-app = FastAPI()
+ROOT_DIR = Path(__file__).parent
+# core modules read their settings at import time
+load_dotenv(ROOT_DIR / '.env')
 
+from core.protocols import PROTOCOL_PROGRAM_IDS, detect_protocol
+from core.singleflight import SingleFlight, make_key
+from core.wallet_registry import WalletRegistry
+from core.tokens import TokenTracker, SignatureCache, mark_transfers, token_balance_changes
+from core.positions import PositionEngine
+from core.alerts import AlertEngine, AlertRule
+from core.live_metrics import LiveMetrics
+from core import storage
+from core.archive import ARCHIVE_DIR, TransactionArchiver
+from core.historical import HistoricalAnalytics
+from core import metrics
+from core import profiling
+from core.profiling import TRACER
+from core.eventloop import LoopMonitor, offload
+from core.holder_pool import HolderPool, RpcResultError
+from core.startup import STARTUP_MODE, WarmUp
+from core import warm_state
+from core.warm_state import SnapshotReader, SnapshotWriter
+from core.recent import MAX_READ_LIMIT, Entry, RecentTransactions, json_array
+from core.wire import AddressBook, ClientCodec, WireFormat, negotiate
+from core import admission
+from core.admission import ConnectionCounter, Overloaded, QueryGate, RateLimiter, RateLimitMiddleware, TokenBucket, client_ip
+from core.changes import CHANGE_STREAM_DEBOUNCE, CHANGE_STREAMS, ChangeStreams
+from core.clusters import CLUSTER_MIN_FUNDING_SOL, CLUSTER_MIN_TRANSFER, FUNDING_COLLECTION, SOL, TransferGraph, sol_transfers
+from core.discovery import HolderDiff, diff_holders
+from core.feed import EVENT_LOG_COLLECTION, EVENT_LOG_STORE_MB, EVENT_REPLAY_BATCH, EventLog, should_deliver
+
+app = FastAPI(default_response_class=profiling.TracedJSONResponse)
+
+rate_limiter = RateLimiter(admission.RATE_LIMIT_PER_SECOND, admission.RATE_LIMIT_BURST)
+# inside CORS, so browsers can read the 429
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,6 +67,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 api_router = APIRouter()
+metrics.instrument_app(app)
+app.add_middleware(profiling.TracingMiddleware)
 
 def custom_json_encoder(obj):
     if isinstance(obj, ObjectId):
@@ -38,9 +79,6 @@ def custom_json_encoder(obj):
 
 app.json_encoder = custom_json_encoder
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -50,7 +88,7 @@ logger = logging.getLogger(__name__)
 mongo_url = os.environ.get('MONGO_URL')
 if not mongo_url:
     raise RuntimeError("MONGO_URL is not set in environment")
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[metrics.MongoCommandListener()])
 db = client[os.environ.get('DB_NAME', 'tokenwise_db')]
 
 SOLANA_RPC_URL = os.environ.get('SOLANA_RPC_URL')
@@ -62,20 +100,22 @@ if not SOLANA_RPC_URL or not SOLANA_WS_URL:
 if not TOKEN_CONTRACT:
     logger.warning("TOKEN_CONTRACT is not set in environment. Defaulting to a placeholder.")
     TOKEN_CONTRACT = "9BB6NFEcjBCtnNLFko2FqVQBq8HHM13kCyYcdQbgpump"
-
-PROTOCOL_PROGRAM_IDS = {
-    "JUP4Fb2cqiRUcaTHdrPC8h2gNsA2ETXiPDD33WcGuJB": "Jupiter",
-    "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4": "Jupiter",
-    "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8": "Raydium",
-    "5quBtoiQqxF9Jv6KYKctB59NT3gtJD2Y65kdnB1Uev3h": "Raydium",
-    "27haf8L6oxUeXrHrgEgsexjSY5hbVUWEmvv9Nyxg8vQv": "Raydium",
-    "9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP": "Orca",
-    "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc": "Orca",
-    "DjVE6JNiYqPL2QXyCUUh8rNjHrbz9hXHNYt99MQ59qw1": "Orca",
-    "SwaPpA9LAaLfeLi3a68M4DjnLqgtticKg6CnyNwgAC8": "Saber",
-    "22Y43yTVxuUkoRKdm9thyRhQ3SdgQS7c7kB6UNCiaczD": "Serum",
-    "9xQeWvG816bUx9EPjHmaT23yvVM2ZWbrrpZb9PusVFin": "Serum",
-}
+# Extra mints tracked alongside TOKEN_CONTRACT (comma-separated); more can be added at runtime via /api/tokens
+TRACKED_TOKENS = [TOKEN_CONTRACT] + [m.strip() for m in os.environ.get('TRACKED_TOKENS', '').split(',')
+                                     if m.strip() and m.strip() != TOKEN_CONTRACT]
+# Tracked wallets polled for on-chain transactions per monitor tick (0 = mock feed only)
+TX_POLL_WALLETS_PER_TICK = int(os.environ.get('TX_POLL_WALLETS_PER_TICK', '0'))
+# Targeted getTokenAccountsByOwner refreshes per mint per monitor tick, patching the top-holder snapshot between full scans
+DISCOVERY_REFRESH_PER_TICK = int(os.environ.get('DISCOVERY_REFRESH_PER_TICK', '10'))
+# Mints that already have a holder snapshot wait this long after startup before a full discovery scan
+DISCOVERY_STARTUP_DELAY = int(os.environ.get('DISCOVERY_STARTUP_DELAY', '60'))
+
+# Cost basis method for realized PnL: "average" or "fifo"
+PNL_COST_METHOD = os.environ.get('PNL_COST_METHOD', 'average').lower()
+# Required in X-Admin-Token by /api/admin/* and position replay; unset, those endpoints are disabled
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Offer permessage-deflate on /ws/transactions (used when the client asks for it, as browsers do)
+WS_PER_MESSAGE_DEFLATE = os.environ.get('WS_PER_MESSAGE_DEFLATE', 'true').lower() == 'true'
 
 class TokenHolder(BaseModel):
     owner: str
@@ -100,6 +140,8 @@ class RealtimeTransaction(BaseModel):
     to_address: Optional[str] = None
     pre_balance: Optional[float] = None
     post_balance: Optional[float] = None
+    price: Optional[float] = None
+    is_mock: bool = False  # generated by the demo feed or the seeder, not observed on chain
 
     class Config:
         populate_by_name = True
@@ -113,10 +155,8 @@ class WalletTracker(BaseModel):
     active: bool = True
     balance: Optional[float] = None
     token_amount: Optional[float] = None
-    last_transaction: Optional[datetime] = None
-    total_buys: int = 0
-    total_sells: int = 0
-    profit_loss: Optional[float] = None
+    # trade counts, PnL and last trade are kept per mint by PositionEngine; the PnL endpoint sums them
+    positions: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
 
     class Config:
         populate_by_name = True
@@ -139,7 +179,45 @@ class TokenHolderSnapshot(BaseModel):
 class WalletCreate(BaseModel):
     address: str
 
-async def call_solana_rpc(method: str, params: list, timeout: int = 30, retries: int = 3, initial_delay: float = 5.0):
+class AlertRuleCreate(BaseModel):
+    name: str
+    metric: str  # volume | count | pct_of_holding | tx_amount
+    threshold: float
+    action_type: str = "any"
+    window_seconds: int = 300
+    wallets: Optional[List[str]] = None
+    wallet_set: Optional[str] = None  # "top_holders"
+    protocols: Optional[List[str]] = None
+    token: Optional[str] = None  # mint the rule watches; None for every tracked mint
+    cooldown_seconds: int = 300
+    enabled: bool = True
+
+class TokenCreate(BaseModel):
+    mint: str
+    discovery_interval_seconds: Optional[int] = None
+
+class ProfilingConfig(BaseModel):
+    enabled: Optional[bool] = None
+    slow_request_capacity: Optional[int] = None
+    reset: bool = False
+
+def holders_payload(holders_data: dict) -> List[dict]:
+    snapshot_model = TokenHolderSnapshot(**holders_data)
+    return [h.model_dump(by_alias=True) for h in snapshot_model.holders]
+
+# Concurrent identical reads share one in-flight call instead of each hitting RPC/Mongo.
+rpc_flight = SingleFlight("rpc")
+analytics_flight = SingleFlight("analytics")
+
+async def call_solana_rpc(method: str, params: list, timeout: int = 30, retries: int = 3, initial_delay: float = 5.0, raw: bool = False):
+    with TRACER.span("rpc"):
+        return await rpc_flight.do(
+            make_key(method, params, raw),
+            lambda: _call_solana_rpc(method, params, timeout=timeout, retries=retries, initial_delay=initial_delay, raw=raw)
+        )
+
+async def _call_solana_rpc(method: str, params: list, timeout: int = 30, retries: int = 3, initial_delay: float = 5.0, raw: bool = False):
+    # raw=True returns the undecoded response body; the caller decodes it (and checks for an RPC error)
     payload = {
         "jsonrpc": "2.0",
         "id": 1,
@@ -148,41 +226,63 @@ async def call_solana_rpc(method: str, params: list, timeout: int = 30, retries:
     }
     headers = {"Content-Type": "application/json"}
     
+    rpc_latency = metrics.RPC_LATENCY.labels(method)
     for attempt in range(retries):
+        started = time.perf_counter()
         try:
             async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
                 async with session.post(SOLANA_RPC_URL, json=payload, headers=headers) as response:
                     if response.status == 429:
+                        rpc_latency.observe(time.perf_counter() - started)
+                        metrics.RPC_CALLS.labels(method, "429").inc()
+                        metrics.RPC_RETRIES.labels(method, "rate_limited").inc()
                         delay = initial_delay * (2 ** attempt)
                         logger.warning(f"RPC {method} hit rate limit (429). Retrying in {delay:.2f} seconds (attempt {attempt + 1}/{retries})...")
                         await asyncio.sleep(delay)
                         continue
                     
                     response.raise_for_status()
+                    if raw:
+                        body = await response.read()
+                        rpc_latency.observe(time.perf_counter() - started)
+                        metrics.RPC_CALLS.labels(method, "ok").inc()
+                        return body
                     result = await response.json()
+                    rpc_latency.observe(time.perf_counter() - started)
                     if 'error' in result:
+                        metrics.RPC_CALLS.labels(method, "rpc_error").inc()
                         logger.error(f"RPC {method} failed: {result['error']}")
                         raise HTTPException(status_code=500, detail=f"RPC Error ({result['error'].get('code', 'N/A')}): {result['error'].get('message', 'Unknown RPC error')}")
+                    metrics.RPC_CALLS.labels(method, "ok").inc()
                     return result['result']
         except aiohttp.ClientError as e:
+            rpc_latency.observe(time.perf_counter() - started)
+            metrics.RPC_CALLS.labels(method, "http_error").inc()
             logger.error(f"HTTP error during RPC call {method} (attempt {attempt + 1}/{retries}): {e}")
             if attempt < retries - 1:
+                metrics.RPC_RETRIES.labels(method, "http_error").inc()
                 delay = initial_delay * (2 ** attempt)
                 logger.info(f"Retrying in {delay:.2f} seconds...")
                 await asyncio.sleep(delay)
             else:
                 raise HTTPException(status_code=503, detail=f"Failed to connect to Solana RPC after multiple retries: {e}")
         except asyncio.TimeoutError:
+            rpc_latency.observe(time.perf_counter() - started)
+            metrics.RPC_CALLS.labels(method, "timeout").inc()
             logger.error(f"Timeout during RPC call {method} (attempt {attempt + 1}/{retries})")
             if attempt < retries - 1:
+                metrics.RPC_RETRIES.labels(method, "timeout").inc()
                 delay = initial_delay * (2 ** attempt)
                 logger.info(f"Retrying in {delay:.2f} seconds...")
                 await asyncio.sleep(delay)
             else:
                 raise HTTPException(status_code=504, detail="Solana RPC call timed out after multiple retries.")
         except Exception as e:
+            if not isinstance(e, HTTPException):
+                metrics.RPC_CALLS.labels(method, "error").inc()
             logger.error(f"An unexpected error occurred during RPC call {method} (attempt {attempt + 1}/{retries}): {e}")
             if attempt < retries - 1:
+                metrics.RPC_RETRIES.labels(method, "error").inc()
                 delay = initial_delay * (2 ** attempt)
                 logger.info(f"Retrying in {delay:.2f} seconds...")
                 await asyncio.sleep(delay)
@@ -209,6 +309,23 @@ async def get_token_supply(token_address: str):
         logger.error(f"Error getting token supply: {e}", exc_info=True)
         return None
 
+async def get_owner_token_balance(owner: str, mint: str):
+    """Exact (ui balance, first token account) of `owner` for `mint`, or (None, None) if the lookup failed."""
+    try:
+        result = await call_solana_rpc("getTokenAccountsByOwner", [
+            owner,
+            {"mint": mint},
+            {"encoding": "jsonParsed", "commitment": "confirmed"}
+        ], retries=1)
+        accounts = (result or {}).get("value") or []
+        balance = sum(
+            float(a["account"]["data"]["parsed"]["info"]["tokenAmount"].get("uiAmount") or 0.0) for a in accounts
+        )
+        return balance, accounts[0]["pubkey"] if accounts else None
+    except Exception as e:
+        logger.warning(f"Could not refresh {mint[:8]}... balance of {owner[:8]}...: {e}")
+        return None, None
+
 async def get_signatures_for_address(address: str, limit: int = 50):
     try:
         params = [address, {"limit": limit, "commitment": "confirmed"}]
@@ -235,50 +352,152 @@ async def get_account_balance(address: str):
         logger.error(f"Error getting SOL balance: {e}", exc_info=True)
         return 0
 
+def _holders_fingerprint(holders: List[Dict[str, Any]]) -> int:
+    return hash(tuple((h.get("owner"), float(h.get("balance") or 0.0)) for h in holders))
+
 class WalletManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.tracked_wallets: Dict[str, Dict[str, Any]] = {}
+        self.tracked_wallets = WalletRegistry()
         self.is_monitoring = False
         self.monitor_task = None
         self.last_discovery_run = None
         self.discovery_interval_seconds = 21600
+        self.discovery_hold_until: Optional[datetime] = None
+        self.tokens = TokenTracker(PROTOCOL_PROGRAM_IDS.values(), default_interval=self.discovery_interval_seconds)
+        self.subscriptions: Dict[str, Optional[set]] = {}  # client_id -> subscribed mints (None = everything)
+        self.codecs: Dict[str, ClientCodec] = {}  # client_id -> negotiated non-JSON wire format
+        self.address_book = AddressBook()
+        self.events = EventLog(collection=db[EVENT_LOG_COLLECTION] if EVENT_LOG_STORE_MB else None)
+        self.sse_clients = 0
+        self.seen_signatures = SignatureCache()
+        self._poll_cursor = 0
         self.last_processed_slot: int = 0
-
-    async def connect(self, websocket: WebSocket):
+        self.positions = PositionEngine(method=PNL_COST_METHOD)
+        self.replay_task = None
+        # while a position replay runs: transactions it must fold in before its swap, by _id, and its cutoff
+        self.position_backlog: Optional[Dict[Any, Dict[str, Any]]] = None
+        self.position_replay_until: Optional[datetime] = None
+        self.alerts = AlertEngine()
+        self.live_metrics = LiveMetrics(PROTOCOL_PROGRAM_IDS.values())
+        self.last_rollup_run = None
+        self.archiver = TransactionArchiver(db, ARCHIVE_DIR) if ARCHIVE_DIR else None
+        self.archive_task = None
+        self.last_archive_run = None
+        self.warm_store = warm_state.snapshot_store(db)
+        self.warm_snapshot: Optional[SnapshotReader] = None  # held from load_warm_snapshot until the wallets are restored
+        self.recent = RecentTransactions()
+        self.snapshot_task = None
+        self.last_snapshot_run = datetime.utcnow()
+        self.changes = ChangeStreams(db) if CHANGE_STREAMS else None
+        self.applied_transactions = SignatureCache()  # _ids already applied in memory; their change events are skipped
+        self._holder_writes: Dict[str, int] = {}  # mint -> fingerprint of the holders this process last wrote
+        self.dirty_dashboards: set = set()
+        self._dashboards_changed: Optional[asyncio.Event] = None
+        self.dashboard_task = None
+        self.clusters = TransferGraph()
+        self.linked_transfers = SignatureCache()  # "signature:mint" of transfers already in the graph
+
+    async def connect(self, websocket: WebSocket, wire: Optional[WireFormat] = None,
+                      subscribed: Optional[set] = None, register: bool = True):
         await websocket.accept()
         client_id = str(uuid.uuid4())
+        self.subscriptions[client_id] = subscribed
+        if wire is not None and not wire.plain:
+            websocket.state.codec = ClientCodec(wire)
+        if register:
+            self._register(client_id, websocket)
+        return client_id
+
+    def _register(self, client_id: str, websocket: WebSocket):
         self.active_connections[client_id] = websocket
+        codec = getattr(websocket.state, "codec", None)
+        if codec is not None:
+            self.codecs[client_id] = codec
         logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
-        return client_id
 
-    async def disconnect(self, websocket: WebSocket):
-        client_id_to_remove = None
+    async def resume(self, client_id: str, websocket: WebSocket, seq: int):
+        """Replay what a reconnecting client missed after `seq`, then add it to the live fan-out.
+
+        The client is registered only once it has caught up with the log, with no
+        await in between, so no event is either skipped or delivered twice.
+        """
+        subscribed = self.subscriptions.get(client_id)
+        replayed = 0
+        events, cursor, gap = await self.events.read(seq, subscribed, EVENT_REPLAY_BATCH)
+        if gap:
+            # too far behind (or a cursor from another database): the client refetches full state instead
+            self._register(client_id, websocket)
+            await self.send_personal_message(
+                f'{{"type": "reset", "first_seq": {self.events.first_seq}, "last_seq": {cursor}}}', websocket)
+            return
+        while True:
+            if events:
+                await self.send_personal_message(
+                    f'{{"type": "replay", "events": [{", ".join(e.message for e in events)}], "last_seq": {cursor}}}',
+                    websocket)
+                replayed += len(events)
+            if cursor >= self.events.last_seq:
+                break
+            events, cursor, _ = await self.events.read(cursor, subscribed, EVENT_REPLAY_BATCH)
+        self._register(client_id, websocket)
+        metrics.WS_REPLAYED_EVENTS.inc(replayed)
+        # live events may already follow; everything up to last_seq has been replayed
+        await self.send_personal_message(
+            f'{{"type": "replay_complete", "replayed": {replayed}, "last_seq": {cursor}}}', websocket)
+
+    async def disconnect(self, websocket: WebSocket, client_id: Optional[str] = None):
+        client_id_to_remove = client_id
         for cid, ws in self.active_connections.items():
             if ws == websocket:
                 client_id_to_remove = cid
                 break
         if client_id_to_remove:
-            del self.active_connections[client_id_to_remove]
+            # a client still replaying missed events isn't in active_connections yet
+            self.active_connections.pop(client_id_to_remove, None)
+            self.subscriptions.pop(client_id_to_remove, None)
+            self.codecs.pop(client_id_to_remove, None)
         logger.info(f"WebSocket client disconnected. Total: {len(self.active_connections)}")
         if not self.active_connections and self.is_monitoring:
             await self.stop_monitoring()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         try:
-            await websocket.send_text(message)
+            codec = getattr(websocket.state, "codec", None)
+            if codec is None:
+                await websocket.send_text(message)
+            else:
+                await codec.send(websocket, codec.wire.encode(message))
         except RuntimeError as e:
             logger.warning(f"Could not send to WebSocket (likely closed): {e}")
             await self.disconnect(websocket)
 
-    async def broadcast(self, message: str):
+    async def broadcast(self, message: str, kind: str = "other", token: Optional[str] = None,
+                        include_unsubscribed: bool = True):
+        # every broadcast is logged first; SSE and long-poll readers are served from the log
+        message = self.events.append(kind, token, message, include_unsubscribed).message
         disconnected = []
-        for websocket in list(self.active_connections.values()):
+        sent = 0
+        encoded = {}  # wire format name -> payload, so each format is encoded once per broadcast
+        started = time.perf_counter()
+        for client_id, websocket in list(self.active_connections.items()):
+            if not should_deliver(self.subscriptions.get(client_id), token, include_unsubscribed):
+                continue
             try:
-                await websocket.send_text(message)
+                codec = self.codecs.get(client_id)
+                if codec is None:
+                    await websocket.send_text(message)
+                else:
+                    payload = encoded.get(codec.wire.name)
+                    if payload is None:
+                        payload = encoded[codec.wire.name] = codec.wire.encode(message)
+                    await codec.send(websocket, payload)
+                sent += 1
             except RuntimeError as e:
                 logger.warning(f"Could not send to WebSocket (likely closed): {e}")
                 disconnected.append(websocket)
+        metrics.BROADCAST_LATENCY.labels(kind).observe(time.perf_counter() - started)
+        metrics.WS_MESSAGES.labels(kind).inc(sent)
         for ws in disconnected:
             await self.disconnect(ws)
         if disconnected:
@@ -305,16 +524,47 @@ class WalletManager:
         while self.is_monitoring:
             try:
                 current_time = datetime.utcnow()
-                if self.last_discovery_run is None or \
-                   (current_time - self.last_discovery_run).total_seconds() >= self.discovery_interval_seconds:
-                    logger.info("Initiating scheduled top wallet discovery.")
-                    await self.discover_top_wallets(TOKEN_CONTRACT)
+                for token in self.tokens.due(current_time):
+                    if token.book and self.discovery_hold_until and current_time < self.discovery_hold_until:
+                        # the persisted snapshot is already being served; don't compete with warm-up for the RPC
+                        continue
+                    logger.info(f"Initiating scheduled top wallet discovery for {token.mint} "
+                                f"(interval {token.schedule.interval:.0f}s, pressure {token.schedule.pressure:.2f}).")
+                    await self.discover_top_wallets(token.mint)
+                    token.last_discovery_run = current_time
                     self.last_discovery_run = current_time
 
+                if DISCOVERY_REFRESH_PER_TICK:
+                    await self.refresh_holder_books(DISCOVERY_REFRESH_PER_TICK)
+
+                if TX_POLL_WALLETS_PER_TICK:
+                    await self.poll_wallet_transactions(TX_POLL_WALLETS_PER_TICK)
+
                 if self.tracked_wallets:
                     await self._generate_and_broadcast_mock_transaction()
                 
-                await self.broadcast_dashboard_data()
+                if self.changes is None:
+                    for mint in self._dashboard_mints():
+                        await self.broadcast_dashboard_data(mint)
+                await self.positions.flush(db.wallets)
+                await self.events.flush()
+
+                if storage.TRANSACTION_STORAGE == "timeseries" and (
+                        self.last_rollup_run is None or (current_time - self.last_rollup_run).total_seconds() >= 600):
+                    # roll closed hours up well before raw events reach their TTL
+                    await storage.rollup_closed_hours(db)
+                    self.last_rollup_run = current_time
+
+                if self.archiver and (self.archive_task is None or (
+                        self.archive_task.done() and (current_time - self.last_archive_run).total_seconds() >= 3600)):
+                    # archiving runs off the monitor tick; it checkpoints and only picks up whole aged days
+                    self.archive_task = asyncio.create_task(self._run_archiver())
+                    self.last_archive_run = current_time
+
+                if self.warm_store and (current_time - self.last_snapshot_run).total_seconds() >= warm_state.WARM_SNAPSHOT_INTERVAL and (
+                        self.snapshot_task is None or self.snapshot_task.done()):
+                    self.snapshot_task = asyncio.create_task(self.save_warm_state())
+                    self.last_snapshot_run = current_time
 
             except Exception as e:
                 logger.error(f"Error in periodic wallet monitoring: {e}\n{traceback.format_exc()}")
@@ -326,38 +576,512 @@ class WalletManager:
             logger.warning("No tracked wallets available to generate mock transactions.")
             return
 
-        wallet_address = random.choice(list(self.tracked_wallets.keys()))
+        # spread the mock feed over every tracked mint that has a holder set; until
+        # discovery has run, the primary mint draws from all tracked wallets
+        candidates = [t for t in self.tokens if t.wallets]
+        token = random.choice(candidates) if candidates else self.tokens.add(TOKEN_CONTRACT)
+        wallet_address = (token.wallets if token.wallets else self.tracked_wallets).random_address()
         
         action_type = random.choice(["buy", "sell"])
         amount = round(random.uniform(10, 1000), 4)
         protocol = random.choice(list(PROTOCOL_PROGRAM_IDS.values()))
         
         signature = str(uuid.uuid4()).replace('-', '') + str(int(time.time()))
+        token.mock_price = round(max(token.mock_price * random.uniform(0.98, 1.02), 0.0001), 6)
         
         mock_tx = RealtimeTransaction(
             signature=signature,
             timestamp=datetime.utcnow(),
             wallet=wallet_address,
-            token_address=TOKEN_CONTRACT,
+            token_address=token.mint,
             amount=amount,
             action_type=action_type,
             protocol=protocol,
             block_time=int(time.time()),
-            slot=random.randint(100000000, 200000000)
+            slot=random.randint(100000000, 200000000),
+            price=token.mock_price,
+            is_mock=True
         )
 
         try:
-            await db.realtime_transactions.insert_one(mock_tx.model_dump(by_alias=True))
-            logger.info(f"Generated and saved mock transaction: {mock_tx.action_type} {mock_tx.amount} for {mock_tx.wallet[:8]}...")
-            
-            await self.broadcast(json.dumps({
-                "type": "new_transaction",
-                "data": mock_tx.model_dump(by_alias=True),
-                "timestamp": datetime.utcnow().isoformat()
-            }, default=custom_json_encoder))
+            await self.ingest_transaction(mock_tx)
+            logger.debug(f"Generated and saved mock transaction: {mock_tx.action_type} {mock_tx.amount} for {mock_tx.wallet[:8]}...")
         except Exception as e:
             logger.error(f"Error generating or saving mock transaction: {e}", exc_info=True)
 
+    async def ingest_transaction(self, tx: RealtimeTransaction):
+        tx_doc = tx.model_dump(by_alias=True)
+        backlog = self.position_backlog
+        if backlog is not None:
+            # registered before the insert, so a running replay's cursor skips it and only the fold applies it
+            backlog[tx_doc["_id"]] = tx_doc
+        try:
+            await db.realtime_transactions.insert_one(storage.to_storage_doc(tx_doc))
+        except Exception:
+            if backlog is not None:
+                backlog.pop(tx_doc["_id"], None)
+            raise
+        self.applied_transactions.add(tx_doc["_id"])
+        await self._apply_transaction(tx_doc)
+
+    async def _apply_transaction(self, tx_doc: Dict[str, Any], live: bool = True):
+        """Fold a stored transaction into in-memory state; `live` ones are also broadcast."""
+        # serialized once: the broadcast below and every later "latest N" read reuse it
+        tx_json = json.dumps(tx_doc, default=custom_json_encoder)
+        self.recent.add(tx_doc, tx_json)
+
+        if self.position_backlog is None:
+            await self.positions.ensure_loaded(db.wallets, tx_doc["wallet"], tx_doc["token_address"])
+            self.positions.apply(tx_doc)
+        elif tx_doc["timestamp"] > self.position_replay_until:
+            self.position_backlog.setdefault(tx_doc["_id"], tx_doc)
+        # otherwise it was registered by ingest_transaction, or (another writer's backfill) is left to the replay cursor
+        self.live_metrics.record(tx_doc)
+        self.tokens.record(tx_doc)
+        self._link_transfer(tx_doc)
+        fired_alerts = self.alerts.evaluate(tx_doc)
+        self.mark_dashboard_dirty(tx_doc["token_address"])
+
+        if live:
+            await self.broadcast(
+                f'{{"type": "new_transaction", "data": {tx_json}, "timestamp": "{datetime.utcnow().isoformat()}"}}',
+                kind="new_transaction", token=tx_doc["token_address"])
+        metrics.TRANSACTIONS_INGESTED.labels(tx_doc["action_type"]).inc()
+
+        if fired_alerts and live:
+            await db.alerts.insert_many([dict(a) for a in fired_alerts])
+            for alert in fired_alerts:
+                logger.info(f"🐋 Alert '{alert['rule_name']}' fired for {alert['wallet'][:8]}... ({alert['metric']}={alert['value']:.2f})")
+                await self.broadcast(json.dumps({
+                    "type": "whale_alert",
+                    "data": alert,
+                    "timestamp": datetime.utcnow().isoformat()
+                }, default=custom_json_encoder), kind="whale_alert", token=tx_doc["token_address"])
+
+    def _link_transfer(self, tx_doc: Dict[str, Any]):
+        source, destination = tx_doc.get("from_address"), tx_doc.get("to_address")
+        if not source or not destination or (tx_doc.get("amount") or 0.0) < CLUSTER_MIN_TRANSFER:
+            return
+        # both sides of a transfer between two tracked wallets are stored; link it once
+        if self.linked_transfers.add(f'{tx_doc["signature"]}:{tx_doc["token_address"]}'):
+            self.clusters.add_transfer(source, destination, tx_doc["amount"], tx_doc["token_address"])
+
+    async def record_funding(self, signature: str, tx: Dict[str, Any], block_time: int):
+        """Link wallets by the SOL transfers in a fetched transaction and keep them for the next start."""
+        transfers = sol_transfers(tx)
+        if not transfers or not self.linked_transfers.add(f"{signature}:{SOL}"):
+            return
+        timestamp = datetime.utcfromtimestamp(block_time)
+        for source, destination, sol in transfers:
+            self.clusters.add_transfer(source, destination, sol, SOL)
+        try:
+            await db[FUNDING_COLLECTION].insert_many([
+                {"_id": f"{signature}:{i}", "source": source, "destination": destination, "sol": sol,
+                 "signature": signature, "timestamp": timestamp}
+                for i, (source, destination, sol) in enumerate(transfers)
+            ], ordered=False)
+        except BulkWriteError:
+            pass  # already stored by an earlier run
+
+    async def load_clusters(self):
+        """Rebuild the transfer graph from stored transfers and funding."""
+        try:
+            started = time.perf_counter()
+            graph = TransferGraph()
+            # each transfer is stored once per tracked side; group by signature and mint to count it once
+            pipeline = [
+                {"$match": {"from_address": {"$type": "string"}, "to_address": {"$type": "string"},
+                            "amount": {"$gte": CLUSTER_MIN_TRANSFER}}},
+                {"$group": {"_id": {"s": "$signature", "t": "$token_address"}, "from": {"$first": "$from_address"},
+                            "to": {"$first": "$to_address"}, "amount": {"$first": "$amount"}}},
+            ]
+            async for doc in db.realtime_transactions.aggregate(pipeline, allowDiskUse=True, batchSize=10000):
+                graph.add_transfer(doc["from"], doc["to"], doc["amount"], doc["_id"]["t"])
+            cursor = db[FUNDING_COLLECTION].find({"sol": {"$gte": CLUSTER_MIN_FUNDING_SOL}},
+                                                 {"_id": 0, "source": 1, "destination": 1, "sol": 1}).batch_size(10000)
+            async for doc in cursor:
+                graph.add_transfer(doc["source"], doc["destination"], doc["sol"], SOL)
+            self.clusters = graph
+            stats = graph.stats()
+            logger.info(f"🕸️ Loaded transfer graph: {stats['wallets']} wallets, {stats['edges']} edges, "
+                        f"{stats['clusters']} clusters in {time.perf_counter() - started:.2f}s.")
+        except Exception as e:
+            logger.error(f"Error loading the transfer graph: {e}", exc_info=True)
+
+    def mark_dashboard_dirty(self, mint: str):
+        if self.changes is None:
+            return
+        self.dirty_dashboards.add(mint)
+        if self._dashboards_changed is not None:
+            self._dashboards_changed.set()
+
+    async def _push_dashboards(self):
+        """Change-stream mode: broadcast a mint's dashboard shortly after its data changes, and only then."""
+        while True:
+            await self._dashboards_changed.wait()
+            # let a burst of changes settle into one push
+            await asyncio.sleep(CHANGE_STREAM_DEBOUNCE)
+            self._dashboards_changed.clear()
+            mints, self.dirty_dashboards = self.dirty_dashboards, set()
+            for mint in sorted(mints.intersection(self._dashboard_mints())):
+                await self.broadcast_dashboard_data(mint)
+
+    async def prepare_change_streams(self):
+        await self.changes.prepare()
+
+    async def follow_changes(self):
+        self.changes.watch("wallets", self._on_wallet_change, [{"$match": {"$or": [
+            {"operationType": {"$in": ["insert", "replace"]}},
+            {"updateDescription.updatedFields.active": {"$exists": True}},
+            {"updateDescription.updatedFields.balance": {"$exists": True}},
+        ]}}])
+        self.changes.watch("token_holders", self._on_holders_change,
+                           [{"$match": {"operationType": {"$in": ["insert", "replace", "update"]}}}])
+        if storage.TRANSACTION_STORAGE == "timeseries":
+            # time-series collections have no change streams; writes by other processes show up in queries only
+            logger.warning("Change streams are not available on time-series realtime_transactions; not following it.")
+        else:
+            self.changes.watch("realtime_transactions", self._on_transaction_change,
+                               [{"$match": {"operationType": "insert"}}])
+        self._dashboards_changed = asyncio.Event()
+        self.dashboard_task = asyncio.create_task(self._push_dashboards())
+        self.changes.start(self._resync_after_gap)
+
+    async def stop_changes(self):
+        if self.changes is not None:
+            await self.changes.stop()
+        if self.dashboard_task:
+            self.dashboard_task.cancel()
+            self.dashboard_task = None
+
+    async def _on_transaction_change(self, change: Dict[str, Any]):
+        doc = change.get("fullDocument")
+        if not doc or not self.applied_transactions.add(doc["_id"]):
+            return  # written (and already applied) by this process
+        # another writer's backfill is folded into state but not replayed to clients as live events
+        ts = doc.get("timestamp")
+        live = isinstance(ts, datetime) and (datetime.utcnow() - ts).total_seconds() < 300
+        await self._apply_transaction(doc, live=live)
+
+    async def _on_holders_change(self, change: Dict[str, Any]):
+        doc = change.get("fullDocument")
+        token = self.tokens.get(doc.get("token_address")) if doc else None
+        if token is None:
+            return
+        holders = doc.get("holders") or []
+        self.mark_dashboard_dirty(token.mint)
+        if _holders_fingerprint(holders) == self._holder_writes.get(token.mint):
+            return  # our own snapshot; the book may already have moved past it
+        token.book.load(holders)
+        token.snapshot = [(h["owner"], h.get("balance") or 0.0) for h in holders]
+        self.tokens.set_holders(token.mint, token.snapshot, doc.get("holder_count"))
+        self.alerts.set_holder_balances(token.mint, {h["owner"]: h.get("balance") or 0.0 for h in holders})
+        logger.info(f"Applied external holder snapshot for {token.mint[:8]}... ({len(holders)} holders).")
+
+    async def _on_wallet_change(self, change: Dict[str, Any]):
+        doc = change.get("fullDocument")
+        if not doc or not doc.get("address"):
+            return
+        # a wallet without `active` was only written by the position engine: neither tracked nor untracked
+        if doc.get("active"):
+            self.tracked_wallets.add(doc["address"], balance=doc.get("balance"), token_amount=doc.get("token_amount"),
+                                     tracked_since=doc.get("tracked_since"))
+        elif doc.get("active") is False:
+            self.tracked_wallets.remove(doc["address"])
+
+    async def _resync_after_gap(self, collection: str):
+        # changes were lost: rebuild what that collection feeds from its current contents
+        if collection == "wallets":
+            await self.load_tracked_wallets()
+        elif collection == "token_holders":
+            await self.load_tracked_tokens()
+        else:
+            self.recent = RecentTransactions()
+            await self.prime_recent_transactions()
+        for mint in self.tokens.mints():
+            self.mark_dashboard_dirty(mint)
+
+    @staticmethod
+    def _recent_entries(docs: List[Dict[str, Any]]):
+        entries = []
+        for doc in docs:
+            if '_id' in doc:
+                doc['_id'] = str(doc['_id'])
+            tx_doc = RealtimeTransaction(**doc).model_dump(by_alias=True)
+            entries.append((tx_doc, json.dumps(tx_doc, default=custom_json_encoder)))
+        return entries
+
+    async def _find_recent(self, query: Dict[str, Any], limit: int):
+        docs = await db.realtime_transactions.find(query, {"meta": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
+        return self._recent_entries(docs)
+
+    async def _prime_ring(self, ring, query: Dict[str, Any], snapshot_key: Optional[str]):
+        restored = self._snapshot_entries(snapshot_key) if snapshot_key else None
+        if restored:
+            # only rows newer than the snapshot's newest are read; the ring keeps the latest of both
+            query = {**query, "timestamp": {"$gte": restored[-1][0]["timestamp"]}}
+            ring.prime(restored)
+        ring.prime(await self._find_recent(query, self.recent.capacity))
+
+    async def prime_recent_transactions(self):
+        """Fill the global and per-mint recent-transaction rings, from the warm snapshot and then the database."""
+        try:
+            await self._prime_ring(self.recent.all, {}, "recent_transactions")
+            for doc, _ in self.recent.all.entries:
+                self.applied_transactions.add(doc["_id"])
+            keys = (self.warm_snapshot.get("tokens") or {}) if self.warm_snapshot else {}
+            for mint in self.tokens.mints():
+                saved = keys.get(mint)
+                await self._prime_ring(self.recent.track_token(mint), {"token_address": mint},
+                                       f"{saved['key']}.recent" if saved else None)
+            logger.info(f"Primed recent transactions: {self.recent.stats()}")
+        except Exception as e:
+            logger.error(f"Error priming recent transactions: {e}", exc_info=True)
+
+    async def recent_transactions(self, limit: int, token: Optional[str] = None):
+        """Newest-first `(doc, json)` entries, from the ring when it can answer, else from Mongo."""
+        entries = self.recent.latest(limit, token)
+        if entries is None:
+            entries = await self._find_recent(_token_filter(token), limit)
+        return entries
+
+    async def recent_wallet_transactions(self, wallet: str, limit: int):
+        entries = self.recent.latest_for_wallet(wallet, limit)
+        if entries is not None:
+            return entries
+        query = {storage.WALLET_FILTER_FIELD: wallet}
+        if not 0 < limit <= self.recent.wallet_capacity:
+            return await self._find_recent(query, limit)
+        # cache this wallet: the ring exists before the query so nothing ingested meanwhile is missed
+        ring = self.recent.open_wallet(wallet)
+        ring.prime(await self._find_recent(query, self.recent.wallet_capacity))
+        return ring.latest(limit)
+
+    async def load_alert_rules(self):
+        try:
+            rules = []
+            async for doc in db.alert_rules.find({}, {"_id": 0}):
+                try:
+                    rules.append(AlertRule.from_dict(doc))
+                except ValueError as e:
+                    logger.warning(f"Skipping invalid alert rule {doc.get('id')}: {e}")
+            self.alerts.load_rules(rules)
+            await self.refresh_alert_holders()
+            logger.info(f"Loaded {len(rules)} alert rules from DB.")
+        except Exception as e:
+            logger.error(f"Error loading alert rules: {e}", exc_info=True)
+
+    async def refresh_alert_holders(self):
+        mints = [token.mint for token in self.tokens] or [TOKEN_CONTRACT]
+        async for snapshot in db.token_holders.find({"token_address": {"$in": mints}},
+                                                    {"token_address": 1, "holders.owner": 1, "holders.balance": 1}):
+            self.alerts.set_holder_balances(snapshot["token_address"],
+                                            {h["owner"]: h.get("balance") or 0.0 for h in snapshot.get("holders", [])})
+
+    async def _run_archiver(self):
+        try:
+            await self.archiver.run()
+        except Exception as e:
+            logger.error(f"Error archiving transactions: {e}", exc_info=True)
+
+    def _build_warm_snapshot(self) -> SnapshotWriter:
+        # runs on the loop but only copies arrays and small dicts; compression happens off-loop
+        writer = SnapshotWriter()
+        writer.put("checkpoints", {
+            "last_processed_slot": self.last_processed_slot,
+            "poll_cursor": self._poll_cursor,
+            "last_discovery_run": self.last_discovery_run.isoformat() if self.last_discovery_run else None,
+            "last_rollup_run": self.last_rollup_run.isoformat() if self.last_rollup_run else None,
+        })
+        warm_state.put_registry(writer, "wallets", self.tracked_wallets)
+        warm_state.put_live_metrics(writer, "live_metrics", self.live_metrics)
+        tokens = {}
+        for i, token in enumerate(self.tokens):
+            tokens[token.mint] = {
+                "key": f"token{i}",
+                "last_discovery_run": token.last_discovery_run.isoformat() if token.last_discovery_run else None,
+                "schedule": token.schedule.state(),
+            }
+            warm_state.put_live_metrics(writer, f"token{i}.live_metrics", token.live_metrics)
+            ring = self.recent.track_token(token.mint)
+            if ring.complete:
+                writer.put_strings(f"token{i}.recent", [raw for _, raw in ring.entries])
+        writer.put("tokens", tokens)
+        writer.put_strings("seen_signatures", self.seen_signatures.recent(20_000))
+        if self.recent.all.complete:
+            # json.dumps escapes newlines inside strings, so each serialized transaction is one line
+            writer.put_strings("recent_transactions", [raw for _, raw in self.recent.all.entries])
+        return writer
+
+    async def save_warm_state(self):
+        try:
+            started = time.perf_counter()
+            writer = self._build_warm_snapshot()
+            data = await offload(writer.to_bytes)
+            await self.warm_store.save(data)
+            logger.info(f"💾 Saved warm-state snapshot ({len(data) / 1024:.0f} KiB, {len(self.tracked_wallets)} wallets) "
+                        f"to {self.warm_store.describe()} in {time.perf_counter() - started:.2f}s.")
+        except Exception as e:
+            logger.error(f"Error saving warm-state snapshot: {e}", exc_info=True)
+
+    async def load_warm_snapshot(self):
+        """Read the last snapshot, if there is a usable one, for the warm-up steps that restore from it."""
+        if not self.warm_store:
+            return
+        try:
+            data = await self.warm_store.load()
+            if data is None:
+                return
+            reader = await offload(SnapshotReader, data)
+        except Exception as e:
+            logger.warning(f"Could not read warm-state snapshot ({e}); rebuilding state from the database.")
+            return
+        age = time.time() - reader.written_at
+        if age > warm_state.WARM_SNAPSHOT_MAX_AGE:
+            logger.info(f"Warm-state snapshot is {age / 3600:.1f}h old; rebuilding state from the database.")
+            return
+        self.warm_snapshot = reader
+
+    def _snapshot_entries(self, key: str) -> Optional[List[Entry]]:
+        # a ring from the snapshot: the stored JSON is reused as is, the doc is rebuilt with its datetimes
+        reader = self.warm_snapshot
+        try:
+            if reader is None or key not in reader:
+                return None
+            return [(RealtimeTransaction(**json.loads(raw)).model_dump(by_alias=True), raw)
+                    for raw in reader.get_strings(key)]
+        except Exception as e:
+            logger.warning(f"Could not restore {key} from the warm-state snapshot ({e}); reading it from the database.")
+            return None
+
+    async def restore_warm_state(self) -> bool:
+        """Load hot state from the last snapshot. Returns False (state untouched) if there is none usable."""
+        reader = self.warm_snapshot
+        if reader is None:
+            return False
+        try:
+            started = time.perf_counter()
+            age = time.time() - reader.written_at
+            registry = warm_state.read_registry(reader, "wallets")
+            checkpoints = reader.get("checkpoints") or {}
+            tokens = reader.get("tokens") or {}
+        except Exception as e:
+            logger.warning(f"Could not read warm-state snapshot ({e}); rebuilding state from the database.")
+            return False
+
+        self.tracked_wallets = registry
+        self.last_processed_slot = max(self.last_processed_slot, checkpoints.get("last_processed_slot") or 0)
+        self._poll_cursor = checkpoints.get("poll_cursor") or 0
+        if checkpoints.get("last_rollup_run"):
+            self.last_rollup_run = datetime.fromisoformat(checkpoints["last_rollup_run"])
+        if checkpoints.get("last_discovery_run"):
+            self.last_discovery_run = max(filter(None, (self.last_discovery_run,
+                                                        datetime.fromisoformat(checkpoints["last_discovery_run"]))))
+        restored_metrics = warm_state.restore_live_metrics(reader, "live_metrics", self.live_metrics)
+        for mint, saved in tokens.items():
+            token = self.tokens.get(mint)
+            if token is None:
+                continue
+            if saved.get("last_discovery_run"):
+                saved_run = datetime.fromisoformat(saved["last_discovery_run"])
+                if token.last_discovery_run is None or saved_run > token.last_discovery_run:
+                    token.last_discovery_run = saved_run
+            token.schedule.restore(saved.get("schedule") or {})
+            warm_state.restore_live_metrics(reader, f"{saved['key']}.live_metrics", token.live_metrics)
+        for signature in reader.get_strings("seen_signatures"):
+            self.seen_signatures.add(signature)
+        logger.info(f"♨️ Restored warm state ({age:.0f}s old): {len(registry)} wallets, {len(tokens)} tokens, "
+                    f"live metrics {'restored' if restored_metrics else 'reset'}, in {time.perf_counter() - started:.2f}s.")
+        return True
+
+    async def load_wallets(self):
+        restored = await self.restore_warm_state()
+        self.warm_snapshot = None
+        if not restored:
+            await self.load_tracked_wallets()
+
+    async def replay_positions(self):
+        """Rebuild positions into a fresh engine and swap it in.
+
+        Ingestion keeps running meanwhile; position updates for transactions arriving
+        during the replay are held back and folded into the new engine right before the
+        swap, so none is lost or counted twice.
+        """
+        engine = PositionEngine(method=self.positions.method, flush_batch_size=self.positions.flush_batch_size)
+        self.position_replay_until = datetime.utcnow()
+        self.position_backlog = {}
+        try:
+            count = await engine.replay(db.realtime_transactions, db.wallets,
+                                        until=self.position_replay_until, skip=self.position_backlog)
+            cleared = await engine.clear_stale(db.wallets)
+        except Exception as e:
+            logger.error(f"Error replaying wallet positions: {e}", exc_info=True)
+            backlog, self.position_backlog = self.position_backlog, None
+            for tx in sorted(backlog.values(), key=lambda tx: tx["timestamp"]):
+                await self.positions.ensure_loaded(db.wallets, tx["wallet"], tx["token_address"])
+                self.positions.apply(tx)
+            return 0
+        # no await from here to the swap: nothing can be ingested in between
+        backlog, self.position_backlog = self.position_backlog, None
+        for tx in sorted(backlog.values(), key=lambda tx: tx["timestamp"]):
+            engine.apply(tx)
+        self.positions = engine
+        await engine.flush(db.wallets)
+        logger.info(f"Position replay folded in {len(backlog)} transactions ingested meanwhile; "
+                    f"cleared stale positions on {cleared} wallets.")
+        return count + len(backlog)
+
+
+    async def _store_holder_snapshot(self, mint: str, holders: List[Dict[str, Any]], fields: Dict[str, Any],
+                                     upsert: bool = False) -> HolderDiff:
+        """Save a mint's top-holder snapshot, then only the wallets it changed, and announce the diff."""
+        token = self.tokens.get(mint)
+        current = [(h["owner"], h.get("balance") or 0.0) for h in holders]
+        diff = diff_holders(token.snapshot if token is not None else [], current)
+        self._holder_writes[mint] = _holders_fingerprint(holders)
+        await db.token_holders.update_one({"token_address": mint}, {"$set": fields}, upsert=upsert)
+        if token is not None:
+            token.snapshot = current
+        written = await self._write_changed_wallets(mint, dict(current), diff.changed_owners())
+        if not diff.empty:
+            await self.broadcast(
+                json.dumps({"type": "holder_changes", "token": mint, **diff.to_dict(),
+                            "timestamp": datetime.utcnow().isoformat()}),
+                kind="holder_changes", token=mint, include_unsubscribed=mint == TOKEN_CONTRACT
+            )
+            logger.info(f"Top holders of {mint[:8]}...: {len(diff.entered)} entered, {len(diff.exited)} exited, "
+                        f"{len(diff.moved)} moved, {len(diff.balances)} balance changes; {written} wallets written.")
+        return diff
+
+    async def _write_changed_wallets(self, mint: str, balances: Dict[str, float], owners: List[str]) -> int:
+        """Upsert the given holders' wallet docs in one bulk write and refresh them in the registry."""
+        if not owners:
+            return 0
+        now = datetime.utcnow()
+        ops = []
+        for owner in owners:
+            balance = balances[owner]
+            # balance/token_amount stay those of the primary mint; every mint lands in token_balances
+            fields = {f"token_balances.{mint}": balance, "last_updated": now}
+            new_wallet = WalletTracker(address=owner, balance=balance, token_amount=balance).model_dump(by_alias=True)
+            if mint == TOKEN_CONTRACT:
+                fields.update(balance=balance, token_amount=balance)
+                del new_wallet["balance"], new_wallet["token_amount"]
+            ops.append(UpdateOne({"address": owner},
+                                 {"$set": fields, "$addToSet": {"tokens": mint}, "$setOnInsert": new_wallet},
+                                 upsert=True))
+        # wallets the position engine wrote first (no `active` yet) become tracked like new ones
+        ops.append(UpdateMany({"address": {"$in": owners}, "active": {"$exists": False}}, {"$set": {"active": True}}))
+        # wallets someone explicitly untracked stay out of the registry
+        inactive = {doc["address"] async for doc in db.wallets.find({"address": {"$in": owners}, "active": False},
+                                                                       {"_id": 0, "address": 1})}
+        result = await db.wallets.bulk_write(ops, ordered=False)
+        if result.upserted_count:
+            logger.info(f"📋 Auto-tracked {result.upserted_count} new wallets holding {mint[:8]}...")
+        for owner in owners:
+            if owner not in inactive:
+                self.tracked_wallets.add(owner, balance=balances[owner], token_amount=balances[owner])
+        return len(owners)
 
     async def discover_top_wallets(self, mint_address: str, top_n: int = 100):
         logger.info(f"Discovering top {top_n} wallets for mint: {mint_address}")
@@ -375,46 +1099,28 @@ class WalletManager:
         ]
 
         try:
-            accounts_data = await call_solana_rpc("getProgramAccounts", params)
-            
-            if not accounts_data:
-                logger.warning(f"No token accounts found for mint {mint_address} from RPC. Relying on seeded data if available.")
-                return
+            accounts_payload = await call_solana_rpc("getProgramAccounts", params, raw=True)
 
             supply_info = await get_token_supply(mint_address)
             token_decimals = 0
             if supply_info and supply_info.get("value"):
                 token_decimals = int(supply_info["value"].get("decimals", 0))
 
-            owner_balances = defaultdict(float)
-            owner_token_accounts = {}
+            # decoding and aggregating every token account is the heaviest step of discovery;
+            # it runs in the holder pool and only the top N comes back
+            try:
+                summary = await holder_pool.aggregate(accounts_payload, token_decimals, top_n)
+            except RpcResultError as e:
+                raise HTTPException(status_code=500, detail=f"RPC Error ({e.code}): {e.message}")
 
-            for account in accounts_data:
-                pubkey = account['pubkey']
-                account_info = account['account']['data']['parsed']['info']
-                owner = account_info['owner']
-                token_amount_raw = int(account_info['tokenAmount']['amount'])
-                
-                ui_amount = float(token_amount_raw) / (10**token_decimals)
-
-                if owner and ui_amount > 0:
-                    owner_balances[owner] += ui_amount
-                    if owner not in owner_token_accounts:
-                        owner_token_accounts[owner] = pubkey
-
-            aggregated_holders = []
-            for owner, balance in owner_balances.items():
-                if balance > 0:
-                    aggregated_holders.append(TokenHolder(
-                        owner=owner,
-                        address=owner_token_accounts.get(owner, owner),
-                        balance=balance,
-                        ui_amount=balance,
-                        decimals=token_decimals
-                    ))
-            
-            sorted_holders = sorted(aggregated_holders, key=lambda x: x.balance, reverse=True)
-            top_n_holders = sorted_holders[:top_n]
+            if not summary["accounts"]:
+                logger.warning(f"No token accounts found for mint {mint_address} from RPC. Relying on seeded data if available.")
+                return
+
+            top_n_holders = [
+                TokenHolder(owner=owner, address=address, balance=balance, ui_amount=balance, decimals=token_decimals)
+                for owner, address, balance in summary["top"]
+            ]
 
             holders_to_db = [h.model_dump(by_alias=True) for h in top_n_holders]
 
@@ -429,30 +1135,17 @@ class WalletManager:
                 holder_count=len(top_n_holders),
                 last_updated=datetime.utcnow()
             )
-            await db.token_holders.update_one(
-                {"token_address": mint_address},
-                {"$set": snapshot.model_dump(by_alias=True)},
-                upsert=True
-            )
-
-            for holder_model in top_n_holders:
-                wallet_address = holder_model.owner
-                existing_wallet = await db.wallets.find_one({"address": wallet_address})
-                if not existing_wallet:
-                    wallet_tracker = WalletTracker(
-                        address=wallet_address,
-                        balance=holder_model.balance,
-                        token_amount=holder_model.balance
-                    )
-                    await db.wallets.insert_one(wallet_tracker.model_dump(by_alias=True))
-                    logger.info(f"📋 Auto-tracked wallet: {wallet_address[:8]}... with {holder_model.balance} tokens")
-                else:
-                    await db.wallets.update_one(
-                        {"address": wallet_address},
-                        {"$set": {"balance": holder_model.balance, "token_amount": holder_model.balance, "last_updated": datetime.utcnow()}}
-                    )
-
-            await self.load_tracked_wallets()
+            diff = await self._store_holder_snapshot(mint_address, holders_to_db, snapshot.model_dump(by_alias=True), upsert=True)
+
+            self.tokens.set_holders(mint_address, [(h.owner, h.balance) for h in top_n_holders], summary["holders"])
+            token = self.tokens.get(mint_address)
+            if token is not None:
+                churn = token.book.load(holders_to_db)
+                token.schedule.record_scan(churn)
+                logger.info(f"Top-holder churn for {mint_address[:8]}...: {churn if churn is not None else 'n/a'}; "
+                            f"next full scan in {token.schedule.interval:.0f}s.")
+            if not diff.empty:
+                self.alerts.set_holder_balances(mint_address, {h.owner: h.balance for h in top_n_holders})
             logger.info(f"✅ Discovered and tracking {len(top_n_holders)} wallets using getProgramAccounts.")
 
         except HTTPException as e:
@@ -462,20 +1155,166 @@ class WalletManager:
 
     async def load_tracked_wallets(self):
         try:
-            wallets_data = await db.wallets.find({"active": True}).to_list(1000)
-            self.tracked_wallets = {}
-            for doc in wallets_data:
-                if '_id' in doc:
-                    doc['_id'] = str(doc['_id'])
-                wallet_model = WalletTracker(**doc)
-                self.tracked_wallets[wallet_model.address] = wallet_model.model_dump(by_alias=True)
+            # Stream straight into a fresh registry (no cap, no per-wallet pydantic model)
+            # and swap it in once complete so readers never see a half-loaded set.
+            registry = WalletRegistry()
+            cursor = db.wallets.find(
+                {"active": True},
+                {"_id": 0, "address": 1, "balance": 1, "token_amount": 1, "tracked_since": 1}
+            ).batch_size(5000)
+            async for doc in cursor:
+                registry.add(
+                    doc["address"],
+                    balance=doc.get("balance"),
+                    token_amount=doc.get("token_amount"),
+                    tracked_since=doc.get("tracked_since")
+                )
+            self.tracked_wallets = registry
             logger.info(f"📋 Loaded {len(self.tracked_wallets)} tracked wallets from DB.")
         except Exception as e:
             logger.error(f"Error loading tracked wallets: {e}", exc_info=True)
 
-    async def broadcast_dashboard_data(self):
+    async def load_tracked_tokens(self):
+        try:
+            for mint in TRACKED_TOKENS:
+                self.tokens.add(mint)
+            async for doc in db.tracked_tokens.find({"active": True}, {"_id": 0}):
+                self.tokens.add(doc["mint"], doc.get("discovery_interval_seconds"), doc.get("added_at"))
+            # each mint's wallet set starts from its last holder snapshot until discovery refreshes it
+            cursor = db.token_holders.find(
+                {"token_address": {"$in": self.tokens.mints()}},
+                {"token_address": 1, "holder_count": 1, "last_updated": 1, "holders.owner": 1, "holders.balance": 1,
+                 "holders.address": 1, "holders.decimals": 1}
+            )
+            async for snapshot in cursor:
+                token = self.tokens.get(snapshot["token_address"])
+                token.book.load(snapshot.get("holders", []))
+                token.snapshot = [(h["owner"], h.get("balance") or 0.0) for h in snapshot.get("holders", [])]
+                # resume the discovery schedule from the last full scan instead of rescanning on every restart
+                token.last_discovery_run = snapshot.get("last_updated")
+                if token.last_discovery_run and (self.last_discovery_run is None or token.last_discovery_run > self.last_discovery_run):
+                    self.last_discovery_run = token.last_discovery_run
+                self.tokens.set_holders(
+                    snapshot["token_address"],
+                    [(h["owner"], h.get("balance") or 0.0) for h in snapshot.get("holders", [])],
+                    snapshot.get("holder_count")
+                )
+            logger.info(f"🪙 Tracking {len(self.tokens)} tokens: {', '.join(m[:8] + '...' for m in self.tokens.mints())}")
+        except Exception as e:
+            logger.error(f"Error loading tracked tokens: {e}", exc_info=True)
+
+    async def track_token(self, mint: str, discovery_interval_seconds: Optional[int] = None):
+        state = self.tokens.add(mint, discovery_interval_seconds)
+        if self.recent.all.complete:
+            self.recent.track_token(mint).prime(await self._find_recent({"token_address": mint}, self.recent.capacity))
+        await db.tracked_tokens.update_one(
+            {"mint": mint},
+            {"$set": {"active": True, "discovery_interval_seconds": state.discovery_interval_seconds},
+             "$setOnInsert": {"added_at": state.added_at}},
+            upsert=True
+        )
+        return state
+
+    async def untrack_token(self, mint: str) -> bool:
+        result = await db.tracked_tokens.update_one({"mint": mint}, {"$set": {"active": False}})
+        removed = self.tokens.remove(mint)
+        self.recent.untrack_token(mint)
+        self.alerts.drop_holder_balances(mint)
+        return removed or result.matched_count > 0
+
+    async def refresh_holder_books(self, limit: int):
+        """Patch each mint's top-holder snapshot from exact balances of recently active wallets."""
+        for token in self.tokens:
+            book = token.book
+            for owner in book.take_dirty(limit):
+                balance, token_account = await get_owner_token_balance(owner, token.mint)
+                if balance is not None:
+                    book.apply_refresh(owner, balance, token_account)
+            if book.changed:
+                await self._persist_holder_book(token)
+
+    async def _persist_holder_book(self, token):
+        top = token.book.top()
+        holders = [
+            TokenHolder(owner=owner, address=address, balance=balance, ui_amount=balance,
+                        decimals=token.book.decimals).model_dump(by_alias=True)
+            for owner, address, balance in top
+        ]
+        diff = await self._store_holder_snapshot(token.mint, holders, {"holders": holders, "last_patched": datetime.utcnow()})
+        token.book.changed = False
+        self.tokens.set_holders(token.mint, [(owner, balance) for owner, _, balance in top], token.holder_count)
+        if not diff.empty:
+            self.alerts.set_holder_balances(token.mint, {owner: balance for owner, _, balance in top})
+
+    def _dashboard_mints(self) -> List[str]:
+        mints = {TOKEN_CONTRACT}
+        for subscribed in self.subscriptions.values():
+            if subscribed:
+                mints.update(m for m in subscribed if m in self.tokens)
+        return sorted(mints)
+
+    async def poll_wallet_transactions(self, count: int):
+        """Fetch recent on-chain activity for the next `count` tracked wallets (round-robin).
+
+        Signatures are de-duplicated across wallets and mints, so a transaction is
+        fetched once and recorded for every tracked mint whose balances it moved.
+        """
+        batch = self.tracked_wallets.page(self._poll_cursor, count)
+        self._poll_cursor += len(batch)
+        for wallet in batch:
+            signatures = await get_signatures_for_address(wallet, limit=20)
+            # oldest first so positions see trades in order
+            for info in reversed(signatures or []):
+                signature = info.get("signature")
+                if not signature or info.get("err") is not None or not self.seen_signatures.add(signature):
+                    continue
+                tx = await get_transaction(signature)
+                if not tx:
+                    continue
+                block_time = tx.get("blockTime") or int(time.time())
+                protocol = detect_protocol(tx)
+                await self.record_funding(signature, tx, block_time)
+                changes = token_balance_changes(tx, self.tokens)
+                if protocol == "Unknown":
+                    mark_transfers(changes)
+                for change in changes:
+                    if change["wallet"] not in self.tracked_wallets and not self.tokens.mints_for_wallet(change["wallet"]):
+                        continue
+                    await self.ingest_transaction(RealtimeTransaction(
+                        signature=signature,
+                        timestamp=datetime.utcfromtimestamp(block_time),
+                        block_time=block_time,
+                        slot=tx.get("slot") or 0,
+                        protocol=protocol,
+                        **change
+                    ))
+
+    async def track_wallet(self, address: str) -> Dict[str, Any]:
+        existing = await db.wallets.find_one({"address": address})
+        if existing:
+            await db.wallets.update_one({"address": address}, {"$set": {"active": True}})
+            self.tracked_wallets.add(
+                address,
+                balance=existing.get("balance"),
+                token_amount=existing.get("token_amount"),
+                tracked_since=existing.get("tracked_since")
+            )
+        else:
+            wallet_tracker = WalletTracker(address=address)
+            await db.wallets.insert_one(wallet_tracker.model_dump(by_alias=True))
+            self.tracked_wallets.add(address, tracked_since=wallet_tracker.tracked_since)
+        return self.tracked_wallets.get(address)
+
+    async def untrack_wallet(self, address: str) -> bool:
+        result = await db.wallets.update_one({"address": address}, {"$set": {"active": False}})
+        removed = self.tracked_wallets.remove(address)
+        return removed or result.matched_count > 0
+
+    async def broadcast_dashboard_data(self, mint: Optional[str] = None):
+        mint = mint or TOKEN_CONTRACT
+        token = self.tokens.get(mint)
         try:
-            top_holders_data = await db.token_holders.find_one({"token_address": TOKEN_CONTRACT})
+            top_holders_data = await db.token_holders.find_one({"token_address": mint})
             top_holders_list = []
             holder_count = 0
             if top_holders_data:
@@ -485,74 +1324,285 @@ class WalletManager:
                 top_holders_list = [h.model_dump(by_alias=True) for h in snapshot_model.holders[:10]]
                 holder_count = snapshot_model.holder_count # Get actual seeded count
 
-            recent_txns_data = await db.realtime_transactions.find().sort("timestamp", -1).limit(20).to_list(20)
-            recent_txns_list = []
-            for doc in recent_txns_data:
-                if '_id' in doc:
-                    doc['_id'] = str(doc['_id'])
-                recent_txns_list.append(RealtimeTransaction(**doc).model_dump(by_alias=True))
+            recent_txns = await self.recent_transactions(20, mint)
 
-            protocol_stats = await db.realtime_transactions.aggregate([
-                {"$group": {"_id": "$protocol", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]).to_list(10)
-            
-            active_wallets_raw = await db.realtime_transactions.aggregate([
-                {"$group": {"_id": "$wallet", "tx_count": {"$sum": 1}}},
-                {"$sort": {"tx_count": -1}},
-                {"$limit": 10}
-            ]).to_list(10)
-            active_wallets_list = [{"wallet_address": w["_id"], "tx_count": w["tx_count"]} for w in active_wallets_raw]
+            protocol_stats = await _protocol_usage(mint, 10)
+            active_wallets_list = await _most_active_wallets(mint, 10)
 
             dashboard_data = {
                 "type": "dashboard_update",
+                "token": mint,
                 "monitoring_active": self.is_monitoring,
                 "connected_clients": len(self.active_connections),
                 "tracked_wallets_count": len(self.tracked_wallets), # This should reflect count from load_tracked_wallets
                 "top_holders": top_holders_list,
-                "recent_transactions": recent_txns_list,
                 "protocol_usage": protocol_stats,
                 "most_active_wallets": active_wallets_list,
                 "holder_count": holder_count,
+                "live_metrics": (token.live_metrics if token else self.live_metrics).snapshot(),
                 "timestamp": datetime.utcnow().isoformat()
             }
-            await self.broadcast(json.dumps(dashboard_data, default=custom_json_encoder))
-            logger.info("Dashboard data broadcasted.")
+            payload = await offload(json.dumps, dashboard_data, default=custom_json_encoder)
+            # splice in the already-serialized transactions rather than encoding them again
+            payload = f'{payload[:-1]}, "recent_transactions": {json_array(recent_txns)}}}'
+            await self.broadcast(payload, kind="dashboard_update", token=mint, include_unsubscribed=mint == TOKEN_CONTRACT)
+            logger.debug("Dashboard data broadcasted.")
         except Exception as e:
             logger.error(f"Error broadcasting dashboard data: {e}\n{traceback.format_exc()}")
 
 
 manager = WalletManager()
+loop_monitor = LoopMonitor()
+query_gate = QueryGate(lag=loop_monitor.recent_lag)
+stream_connections = ConnectionCounter()
+holder_pool = HolderPool()
+warm_up = WarmUp()
+warm_up_task: Optional[asyncio.Task] = None
+
+metrics.REGISTRY.gauge_function("tokenwise_ws_clients", "Connected WebSocket clients.", lambda: len(manager.active_connections))
+metrics.REGISTRY.gauge_function("tokenwise_tracked_wallets", "Wallets in the in-memory registry.", lambda: len(manager.tracked_wallets))
+metrics.REGISTRY.gauge_function("tokenwise_tracked_tokens", "Mints being tracked.", lambda: len(manager.tokens))
+metrics.REGISTRY.gauge_function("tokenwise_monitoring_active", "1 while the monitor loop runs.", lambda: int(manager.is_monitoring))
+metrics.REGISTRY.gauge_function("tokenwise_positions_pending_writes", "Wallet positions waiting for the next bulk flush.", lambda: manager.positions.dirty_count)
+metrics.REGISTRY.gauge_function("tokenwise_alert_rules", "Loaded alert rules.", lambda: len(manager.alerts.rules))
+metrics.REGISTRY.gauge_function("tokenwise_sse_clients", "Open Server-Sent Events feed streams.", lambda: manager.sse_clients)
+metrics.REGISTRY.gauge_function("tokenwise_query_slots_in_use", "Expensive queries currently running.", lambda: query_gate.running)
+metrics.REGISTRY.gauge_function("tokenwise_query_queue_depth", "Expensive queries waiting for a slot.", lambda: query_gate.waiting)
+metrics.REGISTRY.gauge_function(
+    "tokenwise_singleflight_in_flight", "Distinct calls currently in flight per coalescing group.",
+    lambda: {(f.name,): f.stats()["in_flight"] for f in (rpc_flight, analytics_flight)}, ("group",))
+metrics.REGISTRY.gauge_function(
+    "tokenwise_singleflight_coalesced_calls", "Calls that joined an in-flight call instead of issuing their own.",
+    lambda: {(f.name,): f.coalesced for f in (rpc_flight, analytics_flight)}, ("group",))
+
+async def _run_warm_up():
+    # token snapshots come before the (much larger) wallet registry so per-mint dashboards fill first
+    # with change streams, the cluster time is taken before loading so the streams pick up from there
+    prepare = [("change_streams", manager.prepare_change_streams)] if manager.changes else []
+    follow = [("follow_changes", manager.follow_changes)] if manager.changes else []
+    await warm_up.run([
+        ("holder_pool", holder_pool.start),
+        ("storage", lambda: storage.ensure_transaction_storage(db)),
+        ("event_log", manager.events.load),
+        *prepare,
+        ("warm_snapshot", manager.load_warm_snapshot),
+        ("tokens", manager.load_tracked_tokens),
+        ("recent_transactions", manager.prime_recent_transactions),
+        ("alert_rules", manager.load_alert_rules),
+        ("wallets", manager.load_wallets),
+        ("clusters", manager.load_clusters),
+        ("monitoring", manager.start_monitoring),
+        *follow,
+    ])
+
+async def _run_warm_up_in_background():
+    try:
+        await _run_warm_up()
+    except Exception:
+        pass  # already logged; /api/health/ready reports the failed step
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Application starting up...")
-    await manager.load_tracked_wallets() # this will load our tracked wallets 
-    await manager.start_monitoring()
+    global warm_up_task
+    logger.info(f"Application starting up ({STARTUP_MODE} warm-up)...")
+    loop_monitor.start()
+    manager.discovery_hold_until = datetime.utcnow() + timedelta(seconds=DISCOVERY_STARTUP_DELAY)
+    if STARTUP_MODE == "background":
+        warm_up_task = asyncio.create_task(_run_warm_up_in_background())
+    else:
+        await _run_warm_up()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutting down...")
+    if warm_up_task and not warm_up_task.done():
+        warm_up_task.cancel()
+    await manager.stop_changes()
     await manager.stop_monitoring()
+    await manager.positions.flush(db.wallets)
+    await manager.events.flush()
+    if manager.warm_store and warm_up.ready:
+        # never overwrite a good snapshot with the state of a half-finished warm-up
+        if manager.snapshot_task and not manager.snapshot_task.done():
+            await manager.snapshot_task
+        await manager.save_warm_state()
+    await loop_monitor.stop()
+    holder_pool.shutdown()
     client.close()
     logger.info("MongoDB connection closed.")
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # fail closed: with no token configured there is nothing a caller could prove
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN).")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+def _refused(e: Overloaded) -> HTTPException:
+    detail = "Too many concurrent queries from this client." if e.status == 429 else "Server is busy, retry shortly."
+    return HTTPException(status_code=e.status, detail=detail, headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+async def admit_query(request: Request):
+    # per-client cap and load shedding; coalesced work takes its own slot via query_gate.run
+    try:
+        async with query_gate.admit(client_ip(request.scope)):
+            yield
+    except Overloaded as e:
+        raise _refused(e)
+
+async def gated_query(request: Request):
+    # admission plus a query slot held for the whole request
+    try:
+        async with query_gate.admit(client_ip(request.scope)), query_gate.slot(query_gate.queue_timeout):
+            yield
+    except Overloaded as e:
+        raise _refused(e)
+
+@api_router.get("/admin/profiling", dependencies=[Depends(require_admin)])
+async def get_profiling(limit: int = 20):
+    return {
+        "enabled": TRACER.enabled,
+        "slow_request_capacity": TRACER.capacity,
+        "traced_requests": TRACER.traced,
+        "slowest_requests": TRACER.slowest(limit)
+    }
+
+@api_router.post("/admin/profiling", dependencies=[Depends(require_admin)])
+async def configure_profiling(config: ProfilingConfig):
+    TRACER.configure(enabled=config.enabled, capacity=config.slow_request_capacity)
+    if config.reset:
+        TRACER.reset()
+    logger.info(f"Request tracing {'enabled' if TRACER.enabled else 'disabled'} (capacity {TRACER.capacity}).")
+    return {"enabled": TRACER.enabled, "slow_request_capacity": TRACER.capacity}
+
+@api_router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def capture_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    if not 0 < seconds <= 120:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 120].")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be in [1, 1000].")
+    # sample this (event loop) thread from a worker thread so blocked loops show up too
+    profiler = profiling.SamplingProfiler(threading.get_ident(), interval=interval_ms / 1000)
+    try:
+        stacks = await asyncio.get_running_loop().run_in_executor(None, profiler.sample, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    filename = f"tokenwise-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.folded"
+    return PlainTextResponse(profiler.folded(stacks),
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@api_router.get("/admin/event-loop", dependencies=[Depends(require_admin)])
+async def get_event_loop_health():
+    return loop_monitor.stats(include_stacks=True)
+
+@api_router.get("/health/live")
+async def liveness():
+    # answers as soon as the event loop runs; never depends on Mongo or the RPC
+    return {"status": "alive", "uptime_seconds": round(time.time() - warm_up.started_at, 3)}
+
+@api_router.get("/health/ready")
+async def readiness():
+    return JSONResponse(warm_up.to_dict(), status_code=200 if warm_up.ready else 503)
+
 @api_router.get("/status")
 async def get_status():
     return {
         "status": "online",
+        "ready": warm_up.ready,
         "monitoring_active": manager.is_monitoring,
         "connected_clients": len(manager.active_connections),
         "tracked_wallets": len(manager.tracked_wallets),
-        "last_discovery_run": manager.last_discovery_run.isoformat() if manager.last_discovery_run else "N/A"
+        "tracked_tokens": len(manager.tokens),
+        "last_discovery_run": manager.last_discovery_run.isoformat() if manager.last_discovery_run else "N/A",
+        "coalescing": {"rpc": rpc_flight.stats(), "analytics": analytics_flight.stats()},
+        "event_loop": loop_monitor.stats(),
+        "holder_pool": holder_pool.stats(),
+        "recent_transactions": manager.recent.stats(),
+        "feed": {**manager.events.stats(), "sse_clients": manager.sse_clients},
+        "admission": {"rate_limit": rate_limiter.stats(), "queries": query_gate.stats(),
+                      "streams": stream_connections.stats()},
+        "change_streams": manager.changes.stats() if manager.changes else None,
+        "clusters": manager.clusters.stats()
     }
 
+def _parse_tokens(tokens: Optional[str]) -> Optional[set]:
+    # comma-separated mints, same meaning as a WebSocket subscribe; None receives everything
+    return {t.strip() for t in tokens.split(",") if t.strip()} or None if tokens else None
+
+@api_router.get("/feed/poll")
+async def poll_feed(since: Optional[int] = None, tokens: Optional[str] = None, timeout: float = 25.0, limit: int = 200):
+    """Long-poll the real-time feed: events after `since`, waiting up to `timeout` seconds for one."""
+    log = manager.events
+    if since is None:
+        # bootstrap: tell the client where the feed currently is
+        return {"last_seq": log.last_seq, "reset": False, "events": []}
+    subscribed = _parse_tokens(tokens)
+    limit = max(1, min(limit, MAX_READ_LIMIT))
+    deadline = time.monotonic() + max(0.0, min(timeout, 30.0))
+    while True:
+        events, cursor, gap = await log.read(since, subscribed, limit)
+        remaining = deadline - time.monotonic()
+        if events or gap or remaining <= 0:
+            break
+        since = cursor  # everything up to here was for other mints
+        await log.wait(since, remaining)
+    # the messages are already JSON; splice them in rather than parsing and re-encoding
+    body = (f'{{"last_seq": {cursor}, "reset": {"true" if gap else "false"}, "events": ['
+            + ", ".join(f'{{"seq": {e.seq}, "message": {e.message}}}' for e in events) + "]}")
+    return Response(body, media_type="application/json")
+
+@api_router.get("/feed/stream")
+async def stream_feed(request: Request, tokens: Optional[str] = None, since: Optional[int] = None,
+                      last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events version of /ws/transactions; reconnecting browsers resume via Last-Event-ID."""
+    log = manager.events
+    subscribed = _parse_tokens(tokens)
+    cursor = log.last_seq
+    resume_from = last_event_id if last_event_id is not None else since
+    if resume_from is not None:
+        try:
+            cursor = int(resume_from)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID / since must be a sequence number.")
+
+    ip = client_ip(request.scope)
+    if not stream_connections.acquire(ip):
+        admission.REJECTED.labels("stream_connections").inc()
+        raise HTTPException(status_code=429, detail="Too many open feed connections from this address.",
+                            headers={"Retry-After": "5"})
+
+    async def events():
+        nonlocal cursor
+        manager.sse_clients += 1
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                batch, cursor_next, gap = await log.read(cursor, subscribed, MAX_READ_LIMIT)
+                if gap:
+                    yield f'data: {{"type": "reset", "first_seq": {log.first_seq}}}\n\n'
+                for event in batch:
+                    yield f"id: {event.seq}\ndata: {event.message}\n\n"
+                cursor = cursor_next
+                if not await log.wait(cursor, 15.0):
+                    yield ": keepalive\n\n"
+        finally:
+            manager.sse_clients -= 1
+            stream_connections.release(ip)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @api_router.get("/token-holders/{mint_address}")
 async def get_token_holders(mint_address: str):
     try:
         logger.info(f"Attempting to fetch token holders for mint: {mint_address} from MongoDB.")
-        holders_data = await db.token_holders.find_one({"token_address": mint_address})
+        with TRACER.span("db"):
+            holders_data = await db.token_holders.find_one({"token_address": mint_address})
         
         if holders_data:
             logger.info(f"Found token holders data in DB for {mint_address}. Data keys: {holders_data.keys()}")
@@ -565,9 +1615,9 @@ async def get_token_holders(mint_address: str):
                 logger.error(f"Token holders data for {mint_address} is missing 'holders' array or it's not a list.")
                 raise HTTPException(status_code=500, detail="Corrupted token holders data in DB.")
 
-            snapshot_model = TokenHolderSnapshot(**holders_data)
-            # Return the list of holders directly
-            return [h.model_dump(by_alias=True) for h in snapshot_model.holders]
+            with TRACER.span("validation"):
+                # Return the list of holders directly
+                return await offload(holders_payload, holders_data)
         else:
             logger.warning(f"No token holders snapshot found in DB for mint: {mint_address}.")
             raise HTTPException(status_code=404, detail="Token holders snapshot not found for this mint.")
@@ -575,21 +1625,258 @@ async def get_token_holders(mint_address: str):
         logger.error(f"Error getting token holders from DB for {mint_address}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve token holders.")
 
-@api_router.get("/wallets/{wallet_address}/transactions")
+@api_router.get("/tokens")
+async def get_tracked_tokens():
+    return {"primary": TOKEN_CONTRACT, "tokens": [t.to_dict() for t in manager.tokens]}
+
+@api_router.post("/tokens")
+async def add_tracked_token(token_in: TokenCreate):
+    if token_in.discovery_interval_seconds is not None and token_in.discovery_interval_seconds < 60:
+        raise HTTPException(status_code=400, detail="discovery_interval_seconds must be at least 60.")
+    try:
+        state = await manager.track_token(token_in.mint, token_in.discovery_interval_seconds)
+        return {"tracked": True, "token": state.to_dict()}
+    except Exception as e:
+        logger.error(f"Error tracking token {token_in.mint}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to track token.")
+
+@api_router.delete("/tokens/{mint}")
+async def remove_tracked_token(mint: str):
+    if mint == TOKEN_CONTRACT:
+        raise HTTPException(status_code=400, detail="The primary TOKEN_CONTRACT cannot be untracked.")
+    try:
+        removed = await manager.untrack_token(mint)
+    except Exception as e:
+        logger.error(f"Error untracking token {mint}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to untrack token.")
+    if not removed:
+        raise HTTPException(status_code=404, detail="Token is not tracked.")
+    return {"tracked": False, "mint": mint}
+
+@api_router.get("/tokens/{mint}/wallets")
+async def get_token_wallets(mint: str, limit: int = 100, offset: int = 0):
+    state = manager.tokens.get(mint)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Token is not tracked.")
+    limit = max(1, min(limit, 1000))
+    addresses = state.wallets.addresses()[max(offset, 0):max(offset, 0) + limit]
+    return {"mint": mint, "total": len(state.wallets), "wallets": [state.wallets.get(a) for a in addresses]}
+
+@api_router.post("/wallets")
+async def add_tracked_wallet(wallet: WalletCreate):
+    try:
+        record = await manager.track_wallet(wallet.address)
+        return {"tracked": True, "wallet": record, "tracked_wallets": len(manager.tracked_wallets)}
+    except Exception as e:
+        logger.error(f"Error tracking wallet {wallet.address}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to track wallet.")
+
+@api_router.delete("/wallets/{wallet_address}")
+async def remove_tracked_wallet(wallet_address: str):
+    try:
+        removed = await manager.untrack_wallet(wallet_address)
+    except Exception as e:
+        logger.error(f"Error untracking wallet {wallet_address}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to untrack wallet.")
+    if not removed:
+        raise HTTPException(status_code=404, detail="Wallet is not tracked.")
+    return {"tracked": False, "wallet_address": wallet_address, "tracked_wallets": len(manager.tracked_wallets)}
+
+@api_router.get("/wallets/{wallet_address}/pnl", dependencies=[Depends(gated_query)])
+async def get_wallet_pnl(wallet_address: str, token: Optional[str] = None):
+    """Realized PnL per mint the wallet traded (or just `token`); each mint has its own lots and prices."""
+    try:
+        doc = await db.wallets.find_one({"address": wallet_address},
+                                        {"_id": 0, "address": 1, f"positions.{token}" if token else "positions": 1})
+    except Exception as e:
+        logger.error(f"Error fetching PnL for wallet {wallet_address}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve wallet PnL.")
+    positions = (doc or {}).get("positions") or {}
+    if not positions:
+        raise HTTPException(status_code=404, detail="No position recorded for this wallet.")
+    return {
+        "wallet_address": wallet_address,
+        "cost_method": manager.positions.method,
+        "positions": [
+            {
+                "token": mint,
+                "net_position": pos.get("net_position", 0.0),
+                "total_buys": pos.get("total_buys", 0),
+                "total_sells": pos.get("total_sells", 0),
+                "buy_volume": pos.get("buy_volume", 0.0),
+                "sell_volume": pos.get("sell_volume", 0.0),
+                "avg_cost_basis": pos.get("avg_cost_basis"),
+                "realized_pnl": pos.get("profit_loss") or 0.0,
+                "cost_method": pos.get("cost_method", manager.positions.method),
+                "last_transaction": pos["last_transaction"].isoformat() if pos.get("last_transaction") else None,
+            }
+            for mint, pos in sorted(positions.items())
+        ],
+        "realized_pnl": sum(pos.get("profit_loss") or 0.0 for pos in positions.values()),
+    }
+
+def _tracked_token(token: Optional[str]):
+    state = manager.tokens.get(token or TOKEN_CONTRACT)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Token is not tracked.")
+    return state
+
+@api_router.get("/clusters")
+async def get_clusters(token: Optional[str] = None, limit: int = 20, min_size: int = 2):
+    """A mint's top holders grouped into linked-wallet clusters, largest combined holdings first."""
+    state = _tracked_token(token)
+    graph = manager.clusters
+    balances = dict(state.snapshot)
+    ranks = {owner: rank for rank, (owner, _) in enumerate(state.snapshot, 1)}
+    total = sum(balances.values())
+    clusters = []
+    for holders in graph.group(balances).values():
+        size = graph.cluster_size(holders[0])
+        if size < min_size:
+            continue
+        holders.sort(key=balances.get, reverse=True)
+        holdings = sum(balances[owner] for owner in holders)
+        clusters.append({
+            "representative": holders[0],
+            "size": size,
+            "holdings": holdings,
+            "share_of_top_holders": holdings / total if total else 0.0,
+            "holders": [{"owner": owner, "rank": ranks[owner], "balance": balances[owner]} for owner in holders],
+        })
+    clusters.sort(key=lambda c: c["holdings"], reverse=True)
+    return {"token": state.mint, "top_holders": len(balances), "clusters": clusters[:max(1, min(limit, 100))],
+            "graph": graph.stats()}
+
+@api_router.get("/clusters/{wallet_address}")
+async def get_wallet_cluster(wallet_address: str, token: Optional[str] = None, limit: int = 100):
+    """The cluster a wallet belongs to: its members, their holdings of a mint, and flows in and out of it."""
+    state = _tracked_token(token)
+    graph = manager.clusters
+    if wallet_address not in graph:
+        raise HTTPException(status_code=404, detail="No transfers or funding recorded for this wallet.")
+    balances = dict(state.snapshot)
+    members = graph.members(wallet_address)
+    holders = [m for m in members if m in balances]
+    return {
+        "wallet_address": wallet_address,
+        "token": state.mint,
+        "size": len(members),
+        "holdings": sum(balances[m] for m in holders),
+        "top_holders": len(holders),
+        "members": [{"address": m, "balance": balances.get(m), "tracked": m in manager.tracked_wallets}
+                    for m in members[:max(1, min(limit, MAX_READ_LIMIT))]],
+        "flows": graph.flows(wallet_address),
+    }
+
+@api_router.post("/positions/replay", dependencies=[Depends(require_admin)])
+async def replay_positions():
+    if manager.replay_task and not manager.replay_task.done():
+        return {"started": False, "message": "Position replay already running."}
+    manager.replay_task = asyncio.create_task(manager.replay_positions())
+    return {"started": True, "cost_method": manager.positions.method}
+
+@api_router.get("/alerts", dependencies=[Depends(gated_query)])
+async def get_alerts(limit: int = 50):
+    limit = max(1, min(limit, 500))
+    alerts = list(manager.alerts.recent_alerts)[-limit:][::-1]
+    if len(alerts) < limit:
+        try:
+            alerts = await db.alerts.find({}, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
+        except Exception as e:
+            logger.error(f"Error fetching alerts: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Failed to retrieve alerts.")
+    return {"alerts": alerts, "engine": manager.alerts.stats(), "timestamp": datetime.utcnow().isoformat()}
+
+@api_router.get("/alerts/rules")
+async def get_alert_rules():
+    return {"rules": [r.to_dict() for r in manager.alerts.rules.values()]}
+
+@api_router.post("/alerts/rules")
+async def create_alert_rule(rule_in: AlertRuleCreate):
+    try:
+        rule = AlertRule(**rule_in.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        await db.alert_rules.insert_one(rule.to_dict())
+    except Exception as e:
+        logger.error(f"Error saving alert rule: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to save alert rule.")
+    manager.alerts.add_rule(rule)
+    return rule.to_dict()
+
+@api_router.delete("/alerts/rules/{rule_id}")
+async def delete_alert_rule(rule_id: str):
+    try:
+        await db.alert_rules.delete_one({"id": rule_id})
+    except Exception as e:
+        logger.error(f"Error deleting alert rule {rule_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to delete alert rule.")
+    if not manager.alerts.remove_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found.")
+    return {"deleted": True, "id": rule_id}
+
+def _history_range(days: int):
+    if not ARCHIVE_DIR:
+        raise HTTPException(status_code=404, detail="Historical archive is not configured (set ARCHIVE_DIR).")
+    end = datetime.utcnow()
+    return end - timedelta(days=max(1, min(days, 3650))), end
+
+@api_router.get("/history/volume", dependencies=[Depends(gated_query)])
+async def get_history_volume(days: int = 90, freq: str = "D", wallet: Optional[str] = None, protocol: Optional[str] = None,
+                             token: Optional[str] = None):
+    start, end = _history_range(days)
+    token = token or TOKEN_CONTRACT
+    if freq not in ("h", "D", "W"):
+        raise HTTPException(status_code=400, detail="freq must be one of h, D, W.")
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(None, lambda: HistoricalAnalytics(ARCHIVE_DIR).volume(start, end, freq, wallet, protocol, token))
+    except Exception as e:
+        logger.error(f"Error querying historical volume: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"start": start.isoformat(), "end": end.isoformat(), "token": token, "freq": freq, "volume": data}
+
+@api_router.get("/history/protocols", dependencies=[Depends(gated_query)])
+async def get_history_protocols(days: int = 90, token: Optional[str] = None):
+    start, end = _history_range(days)
+    token = token or TOKEN_CONTRACT
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(None, HistoricalAnalytics(ARCHIVE_DIR).protocol_share, start, end, token)
+    except Exception as e:
+        logger.error(f"Error querying historical protocol share: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"start": start.isoformat(), "end": end.isoformat(), "token": token, "protocols": data}
+
+@api_router.get("/history/top-wallets", dependencies=[Depends(gated_query)])
+async def get_history_top_wallets(days: int = 90, limit: int = 20, by: str = "net_buy", token: Optional[str] = None):
+    start, end = _history_range(days)
+    token = token or TOKEN_CONTRACT
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(None, HistoricalAnalytics(ARCHIVE_DIR).top_wallets, start, end,
+                                          max(1, min(limit, 500)), by, token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying historical top wallets: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"start": start.isoformat(), "end": end.isoformat(), "token": token, "by": by, "wallets": data}
+
+@api_router.get("/wallets/{wallet_address}/transactions", dependencies=[Depends(gated_query)])
 async def get_wallet_transactions(wallet_address: str, limit: int = 20):
+    limit = max(1, min(limit, MAX_READ_LIMIT))
     try:
-        tx_data = await db.realtime_transactions.find({"wallet": wallet_address}).sort("timestamp", -1).limit(limit).to_list(limit)
-        transactions = []
-        for doc in tx_data:
-            if '_id' in doc:
-                doc['_id'] = str(doc['_id'])
-            transactions.append(RealtimeTransaction(**doc).model_dump(by_alias=True))
+        with TRACER.span("recent"):
+            transactions = [doc for doc, _ in await manager.recent_wallet_transactions(wallet_address, limit)]
         
-        protocol_stats_wallet = await db.realtime_transactions.aggregate([
-            {"$match": {"wallet": wallet_address}},
-            {"$group": {"_id": "$protocol", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]).to_list(10)
+        with TRACER.span("db"):
+            protocol_stats_wallet = await db.realtime_transactions.aggregate([
+                {"$match": {storage.WALLET_FILTER_FIELD: wallet_address}},
+                {"$group": {"_id": "$protocol", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ]).to_list(10)
 
         return {
             "wallet_address": wallet_address,
@@ -601,130 +1888,150 @@ async def get_wallet_transactions(wallet_address: str, limit: int = 20):
         raise HTTPException(status_code=500, detail="Failed to retrieve wallet transactions.")
 
 
-@api_router.get("/analytics/dashboard")
-async def get_dashboard_data():
-    try:
-        total_wallets = await db.wallets.count_documents({"active": True})
-        total_tx = await db.realtime_transactions.count_documents({})
-        buy_count = await db.realtime_transactions.count_documents({"action_type": "buy"})
-        sell_count = await db.realtime_transactions.count_documents({"action_type": "sell"})
-        
-        recent_tx_data = await db.realtime_transactions.find().sort("timestamp", -1).limit(20).to_list(20)
-        recent_tx = []
-        for doc in recent_tx_data:
-            if '_id' in doc:
-                doc['_id'] = str(doc['_id'])
-            recent_tx.append(RealtimeTransaction(**doc).model_dump(by_alias=True))
-
-        protocol_stats = await db.realtime_transactions.aggregate([
-            {"$group": {"_id": "$protocol", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]).to_list(10)
-        
-        active_wallets_raw = await db.realtime_transactions.aggregate([
-            {"$group": {"_id": "$wallet", "tx_count": {"$sum": 1}}},
-            {"$sort": {"tx_count": -1}},
-            {"$limit": 10}
-        ]).to_list(10)
-        active_wallets = [{"wallet_address": w["_id"], "tx_count": w["tx_count"]} for w in active_wallets_raw]
-        
-        holders_data_raw = await db.token_holders.find_one({"token_address": TOKEN_CONTRACT})
-        top_holders = []
-        holder_count = 0
-        if holders_data_raw:
-            if '_id' in holders_data_raw:
-                holders_data_raw['_id'] = str(holders_data_raw['_id'])
+def _token_filter(token: Optional[str]) -> Dict[str, Any]:
+    return {"token_address": token} if token else {}
+
+def _day_start() -> datetime:
+    # the 24 hourly buckets ending with the current one; whole hours let closed ones come from the rollups
+    return (datetime.utcnow() - timedelta(hours=23)).replace(minute=0, second=0, microsecond=0)
+
+def _hour_label(field: str = "$hour") -> Dict[str, Any]:
+    return {"$dateToString": {"format": "%Y-%m-%d %H:00", "date": field}}
+
+async def _protocol_usage(token: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    return await storage.aggregate_activity(db, [
+        {"$group": {"_id": "$protocol", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ], token=token, length=limit)
+
+async def _most_active_wallets(token: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    rows = await storage.aggregate_activity(db, [
+        {"$group": {"_id": "$wallet", "tx_count": {"$sum": "$count"}}},
+        {"$sort": {"tx_count": -1}},
+        {"$limit": limit}
+    ], token=token, wallets=True, length=limit)
+    return [{"wallet_address": w["_id"], "tx_count": w["tx_count"]} for w in rows]
+
+async def _compute_dashboard_data(token: Optional[str] = None):
+    with TRACER.span("db"):
+        total_wallets = await db.wallets.count_documents({"active": True, **({"tokens": token} if token else {})})
+        actions = await storage.aggregate_activity(db, [
+            {"$group": {"_id": "$action_type", "count": {"$sum": "$count"}}}
+        ], token=token)
+    action_counts = {a["_id"]: a["count"] for a in actions}
+    total_tx = sum(action_counts.values())
+    buy_count = action_counts.get("buy", 0)
+    sell_count = action_counts.get("sell", 0)
+    with TRACER.span("recent"):
+        recent_tx = [doc for doc, _ in await manager.recent_transactions(20, token)]
+
+    with TRACER.span("db"):
+        protocol_stats = await _protocol_usage(token, 10)
+        active_wallets = await _most_active_wallets(token, 10)
+        holders_data_raw = await db.token_holders.find_one({"token_address": token or TOKEN_CONTRACT})
+    
+    top_holders = []
+    holder_count = 0
+    if holders_data_raw:
+        if '_id' in holders_data_raw:
+            holders_data_raw['_id'] = str(holders_data_raw['_id'])
+        with TRACER.span("validation"):
             snapshot_model = TokenHolderSnapshot(**holders_data_raw)
             top_holders = [h.model_dump(by_alias=True) for h in snapshot_model.holders[:10]]
-            holder_count = snapshot_model.holder_count
+        holder_count = snapshot_model.holder_count
 
-        return {
-            "total_wallets": total_wallets,
-            "total_transactions": total_tx,
-            "buy_count": buy_count,
-            "sell_count": sell_count,
-            "buy_sell_ratio": round(buy_count / max(sell_count, 1), 2),
-            "recent_transactions": recent_tx,
-            "protocol_usage": protocol_stats,
-            "most_active_wallets": active_wallets,
-            "top_token_holders": top_holders,
-            "monitoring_active": manager.is_monitoring,
-            "connected_clients": len(manager.active_connections),
-            "holder_count": holder_count,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+    return {
+        "total_wallets": total_wallets,
+        "total_transactions": total_tx,
+        "buy_count": buy_count,
+        "sell_count": sell_count,
+        "buy_sell_ratio": round(buy_count / max(sell_count, 1), 2),
+        "recent_transactions": recent_tx,
+        "protocol_usage": protocol_stats,
+        "most_active_wallets": active_wallets,
+        "top_token_holders": top_holders,
+        "monitoring_active": manager.is_monitoring,
+        "connected_clients": len(manager.active_connections),
+        "holder_count": holder_count,
+        "token": token,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@api_router.get("/analytics/dashboard", dependencies=[Depends(admit_query)])
+async def get_dashboard_data(token: Optional[str] = None):
+    try:
+        return await analytics_flight.do(make_key("dashboard", token), lambda: query_gate.run(_compute_dashboard_data(token)))
     except Exception as e:
-        traceback.print_exc()
         logger.error(f"Error in /analytics/dashboard: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal error – check server log")
     
-@api_router.get("/analytics/protocols")
-async def get_protocol_analytics():
+async def _compute_protocol_analytics(token: Optional[str] = None):
+    protocol_stats = await _protocol_usage(token, 20)
+    hourly_stats = await storage.aggregate_activity(db, [
+        {"$group": {
+            "_id": {"protocol": "$protocol", "hour": _hour_label()},
+            "count": {"$sum": "$count"}
+        }},
+        {"$sort": {"_id.hour": 1}}
+    ], start=_day_start(), token=token, length=1000)
+    return {"protocol_stats": protocol_stats, "hourly_breakdown": hourly_stats, "timestamp": datetime.utcnow().isoformat()}
+
+@api_router.get("/analytics/protocols", dependencies=[Depends(admit_query)])
+async def get_protocol_analytics(token: Optional[str] = None):
     try:
-        protocol_stats = await db.realtime_transactions.aggregate([
-            {"$group": {"_id": "$protocol", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]).to_list(20)
-        
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        hourly_stats = await db.realtime_transactions.aggregate([
-            {"$match": {"timestamp": {"$gte": yesterday}}},
-            {"$group": {
-                "_id": {
-                    "protocol": "$protocol",
-                    "hour": {"$dateToString": {"format": "%Y-%m-%d %H:00", "date": "$timestamp"}}
-                },
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id.hour": 1}}
-        ]).to_list(1000)
-        return {"protocol_stats": protocol_stats, "hourly_breakdown": hourly_stats, "timestamp": datetime.utcnow().isoformat()}
+        with TRACER.span("db"):
+            return await analytics_flight.do(make_key("protocols", token), lambda: query_gate.run(_compute_protocol_analytics(token)))
     except Exception as e:
         logger.error(f"Error getting protocol analytics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/analytics/volume")
-async def get_volume_analytics():
+async def _compute_volume_analytics(token: Optional[str] = None):
+    # hourly rows (rolled up where available) rather than raw transactions; see storage.aggregate_activity
+    start = _day_start()
+    buy_volume = {"$sum": {"$cond": [{"$eq": ["$action_type", "buy"]}, "$volume", 0]}}
+    sell_volume = {"$sum": {"$cond": [{"$eq": ["$action_type", "sell"]}, "$volume", 0]}}
+    volume_stats = await storage.aggregate_activity(db, [
+        {"$group": {
+            "_id": None,
+            "total_volume": {"$sum": "$volume"},
+            "buy_volume": buy_volume,
+            "sell_volume": sell_volume,
+            "transaction_count": {"$sum": "$count"}
+        }}
+    ], start=start, token=token, length=1)
+    hourly_volume = await storage.aggregate_activity(db, [
+        {"$group": {
+            "_id": _hour_label(),
+            "volume": {"$sum": "$volume"},
+            "transactions": {"$sum": "$count"},
+            "buy_volume": buy_volume,
+            "sell_volume": sell_volume
+        }},
+        {"$sort": {"_id": 1}}
+    ], start=start, token=token, length=24)
+    top_volume_wallets = await storage.aggregate_activity(db, [
+        {"$group": {
+            "_id": "$wallet",
+            "total_volume": {"$sum": "$volume"},
+            "transaction_count": {"$sum": "$count"}
+        }},
+        {"$sort": {"total_volume": -1}},
+        {"$limit": 20}
+    ], start=start, token=token, wallets=True, length=20)
+    volume_data = volume_stats[0] if volume_stats else {"total_volume": 0, "buy_volume": 0, "sell_volume": 0, "transaction_count": 0}
+    return {
+        "volume_24h": volume_data,
+        "hourly_breakdown": hourly_volume,
+        "top_volume_wallets": top_volume_wallets,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@api_router.get("/analytics/volume", dependencies=[Depends(admit_query)])
+async def get_volume_analytics(token: Optional[str] = None):
     try:
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        volume_stats = await db.realtime_transactions.aggregate([
-            {"$match": {"timestamp": {"$gte": yesterday}}},
-            {"$group": {
-                "_id": None,
-                "total_volume": {"$sum": "$amount"},
-                "buy_volume": {"$sum": {"$cond": [{"$eq": ["$action_type", "buy"]}, "$amount", 0]}},
-                "sell_volume": {"$sum": {"$cond": [{"$eq": ["$action_type", "sell"]}, "$amount", 0]}},
-                "transaction_count": {"$sum": 1}
-            }}
-        ]).to_list(1)
-        hourly_volume = await db.realtime_transactions.aggregate([
-            {"$match": {"timestamp": {"$gte": yesterday}}},
-            {"$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d %H:00", "date": "$timestamp"}},
-                "volume": {"$sum": "$amount"},
-                "transactions": {"$sum": 1},
-                "buy_volume": {"$sum": {"$cond": [{"$eq": ["$action_type", "buy"]}, "$amount", 0]}},
-                "sell_volume": {"$sum": {"$cond": [{"$eq": ["$action_type", "sell"]}, "$amount", 0]}}
-            }},
-            {"$sort": {"_id": 1}}
-        ]).to_list(24)
-        top_volume_wallets = await db.realtime_transactions.aggregate([
-            {"$match": {"timestamp": {"$gte": yesterday}}},
-            {"$group": {
-                "_id": "$wallet",
-                "total_volume": {"$sum": "$amount"},
-                "transaction_count": {"$sum": 1}
-            }},
-            {"$sort": {"total_volume": -1}},
-            {"$limit": 20}
-        ]).to_list(20)
-        volume_data = volume_stats[0] if volume_stats else {"total_volume": 0, "buy_volume": 0, "sell_volume": 0, "transaction_count": 0}
-        return {
-            "volume_24h": volume_data,
-            "hourly_breakdown": hourly_volume,
-            "top_volume_wallets": top_volume_wallets,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        with TRACER.span("db"):
+            return await analytics_flight.do(make_key("volume", token), lambda: query_gate.run(_compute_volume_analytics(token)))
     except Exception as e:
         logger.error(f"Error getting volume analytics: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -732,13 +2039,13 @@ async def get_volume_analytics():
 @api_router.get("/realtime/status")
 async def get_realtime_status():
     try:
-        last_hour = datetime.utcnow() - timedelta(hours=1)
-        recent_tx_count = await db.realtime_transactions.count_documents({"timestamp": {"$gte": last_hour}})
+        recent_tx_count = manager.live_metrics.window("1h")["tx_count"]
         return {
             "monitoring_active": manager.is_monitoring,
             "connected_clients": len(manager.active_connections),
             "tracked_wallets": len(manager.tracked_wallets),
             "monitored_token": TOKEN_CONTRACT,
+            "tracked_tokens": manager.tokens.mints(),
             "recent_transactions_1h": recent_tx_count,
             "last_processed_slot": manager.last_processed_slot,
             "timestamp": datetime.utcnow().isoformat()
@@ -747,22 +2054,87 @@ async def get_realtime_status():
         logger.error(f"Error getting real-time status: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/realtime/metrics")
+async def get_realtime_metrics(points: int = 60, token: Optional[str] = None):
+    live_metrics = manager.live_metrics
+    if token:
+        state = manager.tokens.get(token)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Token is not tracked.")
+        live_metrics = state.live_metrics
+    return {
+        **live_metrics.snapshot(series_points=max(1, min(points, 300))),
+        "token": token,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 @app.websocket("/ws/transactions")
-async def websocket_endpoint(websocket: WebSocket):
-    client_id = await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, encoding: Optional[str] = None, addresses: Optional[str] = None,
+                             resume_from: Optional[int] = None, tokens: Optional[str] = None):
+    # ?encoding=msgpack switches to binary MessagePack frames; ?addresses=dict replaces repeated
+    # addresses with integer ids, defined by an "addresses" message before their first use.
+    # ?resume_from=<seq> (the last "seq" seen) replays missed events before the live feed;
+    # ?tokens=a,b subscribes up front so the replay is filtered the same way
+    ip = client_ip(websocket.scope)
+    refusal = None
+    try:
+        query_gate.check_load()
+    except Overloaded:
+        refusal = (admission.WS_CLOSE_TRY_AGAIN, "Server is busy, reconnect later.")
+    if refusal is None and (rate_limiter.check(ip) or not stream_connections.acquire(ip)):
+        admission.REJECTED.labels("ws_connections").inc()
+        refusal = (admission.WS_CLOSE_POLICY, "Too many connections from this address.")
+    if refusal is not None:
+        # accept first so the browser sees the close code instead of a failed handshake
+        await websocket.accept()
+        await websocket.close(code=refusal[0], reason=refusal[1])
+        return
+    commands = TokenBucket(admission.WS_COMMANDS_PER_SECOND, admission.WS_COMMAND_BURST) \
+        if admission.WS_COMMANDS_PER_SECOND > 0 else None
+    rejected_in_a_row = 0
+    client_id = None
     try:
+        wire = negotiate(encoding, addresses, manager.address_book)
+        client_id = await manager.connect(websocket, wire, _parse_tokens(tokens), register=resume_from is None)
         await manager.send_personal_message(json.dumps({
             "type": "connection_established",
             "message": "Connected to TokenWise real-time feed",
+            "encoding": wire.name,
+            "last_seq": manager.events.last_seq,
             "monitoring_token": TOKEN_CONTRACT,
+            "tracked_tokens": manager.tokens.mints(),
             "tracked_wallets": len(manager.tracked_wallets),
             "timestamp": datetime.utcnow().isoformat()
         }), websocket)
+        if resume_from is not None:
+            await manager.resume(client_id, websocket, resume_from)
         while True:
             try:
-                message = await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
+                frame = await asyncio.wait_for(websocket.receive(), timeout=30.0)
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                # commands may arrive as JSON text or, from MessagePack clients, as binary frames
+                message = frame.get("text") or frame.get("bytes")
                 if message:
-                    data = json.loads(message)
+                    retry_after = commands.take() if commands is not None else 0.0
+                    if retry_after:
+                        rejected_in_a_row += 1
+                        admission.REJECTED.labels("ws_commands").inc()
+                        if rejected_in_a_row > admission.WS_COMMAND_BURST:
+                            await websocket.close(code=admission.WS_CLOSE_POLICY, reason="Command rate limit exceeded.")
+                            break
+                        await manager.send_personal_message(json.dumps({
+                            "type": "error", "error": "rate_limited", "retry_after": round(retry_after, 3)
+                        }), websocket)
+                        continue
+                    rejected_in_a_row = 0
+                    try:
+                        data = wire.decode(message)
+                    except (ValueError, TypeError):
+                        data = None  # malformed JSON / msgpack (their decode errors are ValueErrors)
+                    if not isinstance(data, dict):
+                        await manager.send_personal_message(json.dumps({"type": "error", "error": "bad_command"}), websocket)
+                        continue
                     cmd = data.get("command")
                     if cmd == "ping":
                         await manager.send_personal_message(json.dumps({"type": "pong", "timestamp": datetime.utcnow().isoformat()}), websocket)
@@ -774,19 +2146,46 @@ async def websocket_endpoint(websocket: WebSocket):
                             "tracked_wallets": len(manager.tracked_wallets),
                             "timestamp": datetime.utcnow().isoformat()
                         }), websocket)
-                    elif cmd == "get_recent_transactions":
-                        limit = data.get("limit", 10)
-                        recent_data = await db.realtime_transactions.find().sort("timestamp", -1).limit(limit).to_list(limit)
-                        recent_txns = []
-                        for doc in recent_data:
-                            if '_id' in doc:
-                                doc['_id'] = str(doc['_id'])
-                            recent_txns.append(RealtimeTransaction(**doc).model_dump(by_alias=True))
+                    elif cmd in ("subscribe", "unsubscribe"):
+                        # per-mint channels: a subscribed client only receives events for its mints
+                        tokens = {t for t in data.get("tokens") or [] if isinstance(t, str)}
+                        current = manager.subscriptions.get(client_id)
+                        if cmd == "subscribe":
+                            current = (current or set()) | tokens
+                        elif current is not None:
+                            current = (current - tokens) if tokens else None
+                        manager.subscriptions[client_id] = current or None
+                        await manager.send_personal_message(json.dumps({
+                            "type": "subscriptions",
+                            "tokens": sorted(current) if current else None,
+                            "untracked": sorted(t for t in tokens if t not in manager.tokens),
+                            "timestamp": datetime.utcnow().isoformat()
+                        }), websocket)
+                    elif cmd == "get_metrics":
+                        token_state = manager.tokens.get(data.get("token")) if data.get("token") else None
                         await manager.send_personal_message(json.dumps({
-                            "type": "recent_transactions",
-                            "transactions": recent_txns,
+                            "type": "live_metrics",
+                            "token": token_state.mint if token_state else None,
+                            "data": (token_state.live_metrics if token_state else manager.live_metrics).snapshot(),
                             "timestamp": datetime.utcnow().isoformat()
-                        }, default=custom_json_encoder), websocket)
+                        }), websocket)
+                    elif cmd == "get_recent_transactions":
+                        try:
+                            limit = max(1, min(int(data.get("limit", 10)), MAX_READ_LIMIT))
+                        except (TypeError, ValueError):
+                            limit = 10
+                        token = data.get("token") if isinstance(data.get("token"), str) else None
+                        try:
+                            async with query_gate.admit(ip), query_gate.slot(query_gate.queue_timeout):
+                                recent_txns = await manager.recent_transactions(limit, token)
+                        except Overloaded as e:
+                            await manager.send_personal_message(json.dumps({
+                                "type": "error", "command": cmd, "error": e.reason, "retry_after": e.retry_after
+                            }), websocket)
+                            continue
+                        await manager.send_personal_message(
+                            f'{{"type": "recent_transactions", "transactions": {json_array(recent_txns)}, '
+                            f'"timestamp": "{datetime.utcnow().isoformat()}"}}', websocket)
             except asyncio.TimeoutError:
                 await manager.send_personal_message(json.dumps({"type": "keepalive", "timestamp": datetime.utcnow().isoformat()}), websocket)
     except WebSocketDisconnect:
@@ -794,11 +2193,13 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error for client {client_id}: {e}", exc_info=True)
     finally:
-        await manager.disconnect(websocket)
+        stream_connections.release(ip)
+        if client_id is not None:
+            await manager.disconnect(websocket, client_id)
 
 
 app.include_router(api_router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True, ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
\ No newline at end of file
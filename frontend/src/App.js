@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import './App.css';
 import axios from 'axios';
 
@@ -18,6 +18,8 @@ const App = () => {
   const [walletTransactions, setWalletTransactions] = useState([]);
   const [protocolStats, setProtocolStats] = useState({}); // Now for selected wallet's protocol usage
   const [activeTab, setActiveTab] = useState('dashboard');
+  const lastDashboardFetch = useRef(0);
+  const lastSeq = useRef(null);
 
   const startRealtimeMonitoring = async () => {
     try {
@@ -107,86 +109,156 @@ const App = () => {
   useEffect(() => {
     const wsProtocol = BACKEND_URL.startsWith('https://') ? 'wss://' : 'ws://';
     const wsUrl = `${wsProtocol}${BACKEND_URL.split('//')[1]}/ws/transactions`;
-    const ws = new WebSocket(wsUrl);
-
-    ws.onopen = () => {
-      setWsConnected(true);
-      console.log('WebSocket connected - Real-time monitoring active');
-      setError(null); // Clear connection errors
-
-      const pingInterval = setInterval(() => {
-        if (ws.readyState === WebSocket.OPEN) {
-          ws.send(JSON.stringify({ command: 'ping' }));
+    let ws = null;
+    let wsOpened = false;
+    let eventSource = null;
+    let reconnectTimer = null;
+    let closed = false;
+
+    // Same feed over Server-Sent Events, for networks/proxies that break WebSockets.
+    // EventSource reconnects on its own and resumes from the last event id.
+    const startEventSource = () => {
+      if (eventSource) return;
+      eventSource = new EventSource(`${API}/feed/stream`);
+      eventSource.onopen = () => {
+        setWsConnected(true);
+        setError(null);
+        console.log('Event stream connected (WebSocket unavailable) - Real-time monitoring active');
+      };
+      eventSource.onmessage = (event) => {
+        try {
+          handleFeedMessage(JSON.parse(event.data));
+        } catch (err) {
+          console.error('Error parsing event stream message:', err);
         }
-      }, 30000);
-      ws.pingInterval = pingInterval; 
+      };
+      eventSource.onerror = () => setWsConnected(false);
     };
 
-    ws.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        console.log("WebSocket message type received:", data.type);
-
-        switch (data.type) {
-          case 'new_transaction':
-            setRealtimeTransactions(prev => {
-              const newTransaction = {
-                ...data.data,
-                isNew: true
-              };
-              return [newTransaction, ...prev.slice(0, 49)];
-            });
-            if (data.data.action_type !== 'unknown') {
-              console.log(`🔥 NEW ${data.data.action_type?.toUpperCase()}: ${data.data.amount?.toFixed(2)} tokens via ${data.data.protocol}`);
-            }
-            fetchDashboardData(); 
-            break;
-
-          case 'connection_established':
-            console.log('TokenWise monitoring established for token:', data.monitoring_token);
-            break;
-
-          case 'pong':
-          case 'keepalive':
-            break;
-
-          case 'status':
-            console.log('Monitoring status:', data);
-            break;
-
-          case 'dashboard_update':
-            setDashboardData(data);
-            console.log('Dashboard data updated via WebSocket:', data);
-            break;
-
-          default:
-            console.log('Unknown WebSocket message type:', data.type);
-        }
-      } catch (err) {
-        console.error('Error parsing WebSocket message:', err);
-        setError('Error processing real-time data.');
+    const handleFeedMessage = (data) => {
+      console.log("Feed message type received:", data.type);
+      // broadcast events carry a sequence number; a reconnect resumes right after the last one seen
+      if (typeof data.seq === 'number') lastSeq.current = data.seq;
+
+      switch (data.type) {
+        case 'new_transaction':
+          setRealtimeTransactions(prev => {
+            const newTransaction = {
+              ...data.data,
+              isNew: true
+            };
+            return [newTransaction, ...prev.slice(0, 49)];
+          });
+          if (data.data.action_type !== 'unknown') {
+            console.log(`🔥 NEW ${data.data.action_type?.toUpperCase()}: ${data.data.amount?.toFixed(2)} tokens via ${data.data.protocol}`);
+          }
+          // the aggregate endpoint is expensive; refresh it at most every 5s, not per transaction
+          if (Date.now() - lastDashboardFetch.current > 5000) {
+            lastDashboardFetch.current = Date.now();
+            fetchDashboardData();
+          }
+          break;
+
+        case 'connection_established':
+          console.log('TokenWise monitoring established for token:', data.monitoring_token);
+          break;
+
+        case 'pong':
+        case 'keepalive':
+          break;
+
+        case 'status':
+          console.log('Monitoring status:', data);
+          break;
+
+        case 'dashboard_update':
+          setDashboardData(data);
+          console.log('Dashboard data updated via feed:', data);
+          break;
+
+        case 'replay':
+          // events missed while disconnected, in order
+          data.events.forEach(handleFeedMessage);
+          break;
+
+        case 'replay_complete':
+          console.log(`Caught up after reconnect: ${data.replayed} missed events replayed`);
+          break;
+
+        case 'error':
+          // a command was refused by the server's rate limiting; the next refresh retries it
+          console.warn('Feed command refused:', data.error, data.retry_after);
+          break;
+
+        case 'reset':
+          // events were missed (buffer overrun or server restart): resync the snapshot
+          if (typeof data.last_seq === 'number') lastSeq.current = data.last_seq;
+          fetchDashboardData();
+          break;
+
+        default:
+          console.log('Unknown feed message type:', data.type);
       }
     };
 
-    ws.onclose = (event) => {
-      setWsConnected(false);
-      console.log('WebSocket disconnected:', event.code, event.reason);
-      if (ws.pingInterval) clearInterval(ws.pingInterval); 
-      setError('WebSocket disconnected. Attempting to reconnect...'); 
-      setTimeout(() => {
-        if (!wsConnected) console.log('Attempting to reconnect...'); 
-      }, 5000);
+    const connect = () => {
+      const resume = lastSeq.current !== null ? `?resume_from=${lastSeq.current}` : '';
+      ws = new WebSocket(wsUrl + resume);
+
+      ws.onopen = () => {
+        wsOpened = true;
+        setWsConnected(true);
+        console.log('WebSocket connected - Real-time monitoring active');
+        setError(null); // Clear connection errors
+
+        const pingInterval = setInterval(() => {
+          if (ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ command: 'ping' }));
+          }
+        }, 30000);
+        ws.pingInterval = pingInterval; 
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          handleFeedMessage(JSON.parse(event.data));
+        } catch (err) {
+          console.error('Error parsing WebSocket message:', err);
+          setError('Error processing real-time data.');
+        }
+      };
+
+      ws.onclose = (event) => {
+        setWsConnected(false);
+        console.log('WebSocket disconnected:', event.code, event.reason);
+        if (ws.pingInterval) clearInterval(ws.pingInterval); 
+        if (closed) return;
+        if (!wsOpened) {
+          startEventSource();
+          return;
+        }
+        setError('WebSocket disconnected. Attempting to reconnect...'); 
+        reconnectTimer = setTimeout(() => {
+          console.log('Attempting to reconnect...');
+          connect();
+        }, 5000);
+      };
+
+      ws.onerror = (error) => {
+        console.error('WebSocket error:', error);
+        setWsConnected(false);
+        setError('WebSocket connection error. Check backend and network.');
+      };
     };
 
-    ws.onerror = (error) => {
-      console.error('WebSocket error:', error);
-      setWsConnected(false);
-      setError('WebSocket connection error. Check backend and network.');
-    };
+    connect();
 
     return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
       if (ws.pingInterval) clearInterval(ws.pingInterval);
       ws.close(); 
+      if (eventSource) eventSource.close();
     };
   }, [BACKEND_URL, fetchDashboardData]); 
 
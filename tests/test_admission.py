@@ -0,0 +1,144 @@
+"""Admission control: token buckets, per-client rate limiting, the query gate and connection caps."""
+import asyncio
+
+import pytest
+
+from core.admission import ConnectionCounter, Overloaded, QueryGate, RateLimiter, TokenBucket
+
+
+def test_bucket_spends_burst_then_refills_at_rate():
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    now = bucket.stamp
+    assert [bucket.take(now=now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # empty: one token arrives after 1 / rate seconds
+    assert bucket.take(now=now) == pytest.approx(0.5)
+    assert bucket.take(now=now + 0.25) == pytest.approx(0.25)
+    assert bucket.take(now=now + 0.5) == 0.0
+    # refills never exceed the burst
+    assert bucket.take(cost=3.0, now=now + 100) == 0.0
+    assert bucket.take(now=now + 100) == pytest.approx(0.5)
+
+
+def test_bucket_retry_after_covers_the_whole_cost():
+    bucket = TokenBucket(rate=4.0, burst=1.0)
+    now = bucket.stamp
+    assert bucket.take(cost=3.0, now=now) == pytest.approx(0.5)
+
+
+def test_rate_limiter_keys_and_lru_eviction():
+    limiter = RateLimiter(rate=0.001, burst=1.0, max_keys=2)
+    assert limiter.check("a") == 0.0
+    assert limiter.check("a") > 0
+    assert limiter.check("b") == 0.0
+    assert limiter.check("a") > 0  # "a" is now the most recently seen
+    assert limiter.check("c") == 0.0  # evicts "b", the least recently seen
+    assert limiter.stats()["clients"] == 2
+    assert limiter.check("b") == 0.0  # a fresh bucket
+    assert limiter.check("a") == 0.0  # evicted by "b" in turn
+
+
+def test_rate_limiter_disabled_at_zero_rate():
+    limiter = RateLimiter(rate=0, burst=1.0)
+    assert not limiter.enabled
+    assert all(limiter.check("a") == 0.0 for _ in range(100))
+    assert limiter.stats()["clients"] == 0
+
+
+def _rejection(gate: QueryGate, client: str = "ip") -> Overloaded:
+    async def run():
+        async with gate.admit(client):
+            pass
+
+    with pytest.raises(Overloaded) as info:
+        asyncio.run(run())
+    return info.value
+
+
+def test_gate_sheds_while_the_loop_lags():
+    lag = 0.0
+    gate = QueryGate(shed_lag=0.5, lag=lambda: lag)
+    gate.check_load()
+    lag = 0.6
+    err = _rejection(gate)
+    assert (err.reason, err.status) == ("event_loop_lag", 503)
+
+
+def test_gate_sheds_when_the_queue_is_full():
+    gate = QueryGate(queue_limit=2)
+    gate.waiting = 2
+    err = _rejection(gate)
+    assert (err.reason, err.status) == ("query_queue_full", 503)
+
+
+def test_per_client_cap():
+    async def run():
+        gate = QueryGate(per_client=2)
+        async with gate.admit("a"), gate.admit("a"):
+            async with gate.admit("b"):
+                pass
+            with pytest.raises(Overloaded) as info:
+                async with gate.admit("a"):
+                    pass
+            assert gate.stats()["active_clients"] == 1
+        # released on exit
+        async with gate.admit("a"):
+            pass
+        return gate, info.value
+
+    gate, err = asyncio.run(run())
+    assert (err.reason, err.status) == ("client_concurrency", 429)
+    assert gate.stats()["active_clients"] == 0
+
+
+def test_no_per_client_cap_at_zero():
+    async def run():
+        gate = QueryGate(per_client=0)
+        async with gate.admit("a"), gate.admit("a"), gate.admit("a"):
+            return gate.stats()["active_clients"]
+
+    assert asyncio.run(run()) == 1
+
+
+def test_slot_bounds_concurrency_and_times_out():
+    async def run():
+        gate = QueryGate(concurrency=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with gate.slot():
+                await release.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        assert gate.running == 1
+        with pytest.raises(Overloaded) as info:
+            async with gate.slot(timeout=0.01):
+                pass
+        waiting_after_timeout = gate.waiting
+        # a waiter gets the slot once it is released
+        queued = asyncio.ensure_future(gate.run(asyncio.sleep(0, result="ran")))
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+        release.set()
+        await holder
+        return info.value, waiting_after_timeout, await queued, gate
+
+    err, waiting_after_timeout, result, gate = asyncio.run(run())
+    assert (err.reason, err.status) == ("query_queue_timeout", 503)
+    assert waiting_after_timeout == 0
+    assert result == "ran"
+    assert (gate.running, gate.waiting) == (0, 0)
+
+
+def test_connection_counter_caps_per_address():
+    counter = ConnectionCounter(per_ip=2)
+    assert counter.acquire("a") and counter.acquire("a")
+    assert not counter.acquire("a")
+    assert counter.acquire("b")
+    assert counter.stats() == {"per_ip": 2, "addresses": 2, "busiest": 2}
+    counter.release("a")
+    assert counter.acquire("a")
+    for ip in ("a", "a", "b"):
+        counter.release(ip)
+    assert counter.stats()["addresses"] == 0
+    assert all(ConnectionCounter(per_ip=0).acquire("a") for _ in range(10))
@@ -0,0 +1,126 @@
+"""Whale-alert rules: sliding windows, edge-triggered thresholds, cooldowns and per-mint scoping."""
+import pytest
+
+from core.alerts import AlertEngine, AlertRule, SlidingWindowCounter
+
+
+def _tx(amount: float, wallet: str = "w1", mint: str = "MintA", action: str = "buy", protocol: str = "Jupiter"):
+    return {"wallet": wallet, "token_address": mint, "action_type": action, "protocol": protocol, "amount": amount,
+            "signature": f"sig-{wallet}-{amount}"}
+
+
+def _engine(*rules: AlertRule) -> AlertEngine:
+    engine = AlertEngine()
+    engine.load_rules(rules)
+    return engine
+
+
+def test_sliding_window_evicts_old_buckets():
+    counter = SlidingWindowCounter(10)
+    counter.add(100.2, 5.0)
+    counter.add(100.7, 1.0)
+    counter.add(105.0, 2.0)
+    counter.evict(109.9)
+    assert (counter.total, counter.count) == (8.0, 3)
+    counter.evict(110.0)
+    assert (counter.total, counter.count) == (2.0, 1)
+    counter.evict(200.0)
+    assert (counter.total, counter.count) == (0.0, 0)
+
+
+def test_volume_fires_once_when_the_window_crosses_the_threshold():
+    engine = _engine(AlertRule("big volume", "volume", 100, window_seconds=60, cooldown_seconds=0))
+    assert engine.evaluate(_tx(60), now=1000) == []
+    fired = engine.evaluate(_tx(50), now=1010)
+    assert [(a["rule_name"], a["value"]) for a in fired] == [("big volume", 110.0)]
+    # already above: edge-triggered, so no repeat until the window drops back below
+    assert engine.evaluate(_tx(10), now=1020) == []
+    assert engine.evaluate(_tx(10), now=1080) == []
+    assert len(engine.evaluate(_tx(95), now=1085)) == 1
+
+
+def test_count_and_tx_amount_metrics():
+    engine = _engine(AlertRule("busy", "count", 3, window_seconds=60, cooldown_seconds=0),
+                     AlertRule("whale", "tx_amount", 500, cooldown_seconds=0))
+    names = [[a["rule_name"] for a in engine.evaluate(_tx(amount), now=1000 + i)]
+             for i, amount in enumerate((10, 500, 10, 499))]
+    assert names == [[], ["whale"], ["busy"], []]
+
+
+def test_only_crossed_thresholds_fire():
+    rules = [AlertRule(f"over {t}", "volume", t, window_seconds=60, cooldown_seconds=0) for t in (50, 100, 200)]
+    engine = _engine(*rules)
+    assert [a["rule_name"] for a in engine.evaluate(_tx(120), now=1000)] == ["over 50", "over 100"]
+    assert [a["rule_name"] for a in engine.evaluate(_tx(100), now=1001)] == ["over 200"]
+
+
+def test_cooldown_suppresses_refiring():
+    engine = _engine(AlertRule("whale", "tx_amount", 100, cooldown_seconds=300))
+    assert len(engine.evaluate(_tx(150), now=1000)) == 1
+    assert engine.evaluate(_tx(150), now=1100) == []
+    assert len(engine.evaluate(_tx(150), now=1301)) == 1
+
+
+def test_action_protocol_and_wallet_filters():
+    engine = _engine(AlertRule("sells", "tx_amount", 10, action_type="sell", wallets=["w2"], protocols=["Raydium"],
+                               cooldown_seconds=0))
+    assert engine.evaluate(_tx(50, wallet="w2", action="buy", protocol="Raydium"), now=1000) == []
+    assert engine.evaluate(_tx(50, wallet="w1", action="sell", protocol="Raydium"), now=1000) == []
+    assert engine.evaluate(_tx(50, wallet="w2", action="sell", protocol="Jupiter"), now=1000) == []
+    assert len(engine.evaluate(_tx(50, wallet="w2", action="sell", protocol="Raydium"), now=1000)) == 1
+
+
+def test_unscoped_rule_counts_each_transaction_once():
+    # a transaction without protocol only matches the unscoped bucket, which must not be added to twice
+    engine = _engine(AlertRule("volume", "volume", 15, window_seconds=60, cooldown_seconds=0))
+    assert engine.evaluate(_tx(10, protocol=None), now=1000) == []
+    assert len(engine.evaluate(_tx(10, protocol=None), now=1001)) == 1
+
+
+def test_windows_are_kept_per_mint():
+    engine = _engine(AlertRule("volume", "volume", 100, window_seconds=60, cooldown_seconds=0))
+    assert engine.evaluate(_tx(60, mint="MintA"), now=1000) == []
+    assert engine.evaluate(_tx(60, mint="MintB"), now=1001) == []
+    fired = engine.evaluate(_tx(60, mint="MintA"), now=1002)
+    assert [(a["token"], a["value"]) for a in fired] == [("MintA", 120.0)]
+
+
+def test_token_scoped_rule_ignores_other_mints():
+    engine = _engine(AlertRule("mint B whale", "tx_amount", 10, token="MintB", cooldown_seconds=0))
+    assert engine.evaluate(_tx(50, mint="MintA"), now=1000) == []
+    assert [a["token"] for a in engine.evaluate(_tx(50, mint="MintB"), now=1000)] == ["MintB"]
+
+
+def test_pct_of_holding_uses_the_mints_top_holder_balance():
+    engine = _engine(AlertRule("dumping", "pct_of_holding", 10, action_type="sell", wallet_set="top_holders",
+                               window_seconds=60, cooldown_seconds=0))
+    engine.set_holder_balances("MintA", {"w1": 1000.0})
+    engine.set_holder_balances("MintB", {"w2": 50.0})
+    assert engine.evaluate(_tx(50, action="sell"), now=1000) == []
+    fired = engine.evaluate(_tx(60, action="sell"), now=1001)
+    assert [a["value"] for a in fired] == [pytest.approx(11.0)]
+    # w1 holds no MintB and w3 isn't a top holder of anything
+    assert engine.evaluate(_tx(500, mint="MintB", action="sell"), now=1002) == []
+    assert engine.evaluate(_tx(500, wallet="w3", action="sell"), now=1002) == []
+    assert len(engine.evaluate(_tx(10, wallet="w2", mint="MintB", action="sell"), now=1003)) == 1
+
+    engine.drop_holder_balances("MintB")
+    assert engine.evaluate(_tx(50, wallet="w2", mint="MintB", action="sell"), now=1100) == []
+
+
+def test_windows_survive_holder_set_changes():
+    engine = _engine(AlertRule("volume", "volume", 100, window_seconds=60, cooldown_seconds=0))
+    engine.evaluate(_tx(60), now=1000)
+    engine.set_holder_balances("MintA", {"w9": 1.0})
+    assert len(engine.evaluate(_tx(60), now=1001)) == 1
+
+
+def test_rule_round_trips_and_rejects_bad_input():
+    rule = AlertRule("r", "volume", 5, protocols=["Raydium"], token="MintA", window_seconds=30)
+    assert AlertRule.from_dict(rule.to_dict()).to_dict() == rule.to_dict()
+    with pytest.raises(ValueError):
+        AlertRule("r", "nonsense", 5)
+    with pytest.raises(ValueError):
+        AlertRule("r", "pct_of_holding", 5)
+    with pytest.raises(ValueError):
+        AlertRule("r", "volume", 5, window_seconds=0)
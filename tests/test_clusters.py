@@ -0,0 +1,88 @@
+"""Transfer-graph wallet clustering: union-find merges, hub detection and rebuild, route accounting."""
+from core.clusters import SOL, TransferGraph, sol_transfers
+
+
+def test_transfers_merge_clusters():
+    graph = TransferGraph()
+    assert graph.add_transfer("a", "b", 1.0, "MintA")
+    assert graph.add_transfer("c", "d", 1.0, "MintA")
+    assert graph.clusters == 2
+    assert graph.add_transfer("b", "c", 1.0, SOL)
+    assert graph.clusters == 1 and graph.largest == 4
+    assert sorted(graph.members("a")) == ["a", "b", "c", "d"]
+    assert graph.root("a") == graph.root("d")
+    assert graph.cluster_size("d") == 4
+    # already linked, and self-transfers never link
+    assert not graph.add_transfer("d", "a", 1.0, "MintA")
+    assert not graph.add_transfer("a", "a", 1.0, "MintA")
+
+
+def test_unknown_addresses_stand_alone():
+    graph = TransferGraph()
+    graph.add_transfer("a", "b", 1.0, SOL)
+    assert graph.members("z") == ["z"]
+    assert graph.cluster_size("z") == 1
+    assert graph.root("z") is None
+    groups = graph.group(["a", "b", "z"])
+    assert sorted(groups.values()) == [["a", "b"], ["z"]]
+
+
+def test_repeat_routes_accumulate_on_one_edge():
+    graph = TransferGraph()
+    for _ in range(3):
+        graph.add_transfer("a", "b", 2.0, "MintA")
+    graph.add_transfer("a", "b", 5.0, SOL)
+    graph.add_transfer("b", "x", 1.0, "MintA")
+    assert graph.edge_count == 3
+    assert graph.transfers == 5
+    flows = graph.flows("a")
+    assert flows["MintA"] == {"internal": 7.0, "inflow": 0.0, "outflow": 0.0, "transfers": 4}
+    assert flows[SOL]["internal"] == 5.0
+
+
+def test_hub_is_detected_and_its_merges_undone():
+    graph = TransferGraph(hub_degree=3)
+    graph.add_transfer("a", "b", 1.0, SOL)
+    for wallet in ("a", "c", "d"):
+        graph.add_transfer("hub", wallet, 1.0, "MintA")
+    assert graph.cluster_size("c") == 5
+    # the fourth route makes it a hub: clusters are rebuilt without it
+    assert not graph.add_transfer("hub", "e", 1.0, "MintA")
+    assert graph.hubs == 1 and graph.rebuilds == 1
+    assert sorted(graph.members("a")) == ["a", "b"]
+    assert graph.cluster_size("c") == 1 and graph.cluster_size("hub") == 1
+    # later transfers with the hub are recorded but link nothing
+    assert not graph.add_transfer("f", "hub", 1.0, "MintA")
+    assert graph.cluster_size("f") == 1
+    assert graph.clusters == 1
+
+
+def test_routes_between_hubs_are_not_duplicated():
+    graph = TransferGraph(hub_degree=2)
+    for i in range(3):
+        graph.add_transfer("hub1", f"a{i}", 1.0, SOL)
+        graph.add_transfer(f"b{i}", "hub2", 1.0, SOL)
+    edges = graph.edge_count
+    for _ in range(50):
+        graph.add_transfer("hub1", "hub2", 1.0, SOL)
+    assert graph.edge_count == edges + 1
+    assert graph.flows("hub1")[SOL]["outflow"] == 53.0
+
+
+def test_edges_beyond_the_cap_still_merge():
+    graph = TransferGraph(max_edges=1)
+    graph.add_transfer("a", "b", 1.0, SOL)
+    assert graph.add_transfer("c", "a", 1.0, SOL)
+    assert graph.edge_count == 1 and graph.dropped_edges == 1
+    assert graph.cluster_size("c") == 3
+
+
+def test_sol_transfers_reads_outer_and_inner_instructions():
+    def transfer(source, destination, lamports):
+        return {"program": "system", "parsed": {"type": "transfer", "info": {
+            "source": source, "destination": destination, "lamports": lamports}}}
+
+    tx = {"meta": {"err": None, "innerInstructions": [{"instructions": [transfer("c", "d", 2_000_000_000)]}]},
+          "transaction": {"message": {"instructions": [transfer("a", "b", 500_000_000), transfer("a", "e", 1_000)]}}}
+    assert sol_transfers(tx) == [("a", "b", 0.5), ("c", "d", 2.0)]
+    assert sol_transfers({**tx, "meta": {**tx["meta"], "err": {"InstructionError": [0, "Custom"]}}}) == []
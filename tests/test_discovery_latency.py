@@ -0,0 +1,80 @@
+"""Request latency of the real app while a holder discovery aggregates a large getProgramAccounts response."""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import mongomock_motor
+import motor.motor_asyncio
+
+# the app connects to Mongo and the RPC at import time: point both at in-process fakes first
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("SOLANA_RPC_URL", "http://127.0.0.1:1/")
+os.environ.setdefault("SOLANA_WS_URL", "ws://127.0.0.1:1/")
+os.environ["EVENT_LOG_STORE_MB"] = "0"
+motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+import server  # noqa: E402
+from benchmarks.stub_rpc import SPL_TOKEN_DECIMALS, make_token_accounts  # noqa: E402
+
+MINT = "LatencyTestMint1111111111111111111111111111"
+ACCOUNTS = 60_000
+TOP_N = 100
+INTERVAL_MS = 5
+# /api/health/live does no I/O: anything past this means the loop was blocked by discovery
+LATENCY_BOUND_MS = 150
+
+
+def _rpc_stub(payload: bytes):
+    async def rpc(method, params, **kwargs):
+        if method == "getProgramAccounts":
+            return payload
+        if method == "getAccountInfo":
+            info = {"supply": str(10 ** 15), "decimals": SPL_TOKEN_DECIMALS}
+            return {"value": {"data": {"parsed": {"info": info}}}}
+        raise server.HTTPException(status_code=503, detail=f"{method} is not stubbed")
+    return rpc
+
+
+async def _discover_while_polling():
+    latencies = []
+    done = asyncio.Event()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+
+        async def poll():
+            # latency counts from the intended send time, so a request delayed by a blocked loop is not hidden
+            scheduled = time.perf_counter()
+            while not done.is_set():
+                response = await client.get("/api/health/live")
+                assert response.status_code == 200
+                now = time.perf_counter()
+                latencies.append((now - scheduled) * 1000)
+                scheduled = max(scheduled + INTERVAL_MS / 1000, now)
+                await asyncio.sleep(max(scheduled - now, 0))
+
+        await server.holder_pool.start()
+        poller = asyncio.create_task(poll())
+        try:
+            await asyncio.sleep(0.05)
+            await server.manager.discover_top_wallets(MINT, top_n=TOP_N)
+            await asyncio.sleep(0.05)
+        finally:
+            done.set()
+            await poller
+            server.holder_pool.shutdown()
+    return latencies
+
+
+def test_discovery_keeps_requests_fast(monkeypatch):
+    accounts = make_token_accounts(MINT, ACCOUNTS)
+    payload = json.dumps({"jsonrpc": "2.0", "id": 1, "result": accounts}).encode()
+    monkeypatch.setattr(server, "_call_solana_rpc", _rpc_stub(payload))
+
+    latencies = asyncio.run(_discover_while_polling())
+
+    snapshot = asyncio.run(server.db.token_holders.find_one({"token_address": MINT}))
+    assert snapshot is not None and snapshot["holder_count"] == TOP_N
+    assert len(latencies) > 10
+    assert max(latencies) < LATENCY_BOUND_MS, f"worst request took {max(latencies):.0f} ms during discovery"
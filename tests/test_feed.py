@@ -0,0 +1,140 @@
+"""Sequence-numbered event log shared by SSE, long-poll and WebSocket resume (core.feed)."""
+import asyncio
+import json
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import CollectionInvalid
+
+from core.feed import EventLog, should_deliver, stamp
+
+
+def _log(count: int, capacity: int = 10) -> EventLog:
+    log = EventLog(capacity=capacity)
+    for i in range(1, count + 1):
+        # odd events belong to MintA and skip unsubscribed clients; even ones are global
+        if i % 2:
+            log.append("transaction", "MintA", json.dumps({"type": "transaction", "n": i}), include_unsubscribed=False)
+        else:
+            log.append("dashboard_update", None, json.dumps({"type": "dashboard_update", "n": i}))
+    return log
+
+
+def _seqs(events):
+    return [e.seq for e in events]
+
+
+def test_stamp_puts_seq_first():
+    assert json.loads(stamp(7, '{"type": "x"}')) == {"seq": 7, "type": "x"}
+    assert stamp(3, "{}") == '{"seq": 3}'
+
+
+def test_should_deliver():
+    assert should_deliver(None, "MintA", True)
+    assert not should_deliver(None, "MintA", False)
+    assert should_deliver({"MintA"}, "MintA", False)
+    assert not should_deliver({"MintB"}, "MintA", True)
+    assert should_deliver({"MintB"}, None, False)
+
+
+def test_since_starts_after_the_cursor():
+    log = _log(8)
+    events, cursor, gap = log.since(5, subscribed={"MintA"})
+    assert _seqs(events) == [6, 7, 8]
+    assert (cursor, gap) == (8, False)
+    assert log.since(8) == ([], 8, False)
+    # unsubscribed readers skip events tagged include_unsubscribed=False
+    assert _seqs(log.since(0)[0]) == [2, 4, 6, 8]
+
+
+def test_since_offsets_into_an_evicted_ring():
+    log = _log(25, capacity=10)
+    assert (log.first_seq, log.last_seq) == (16, 25)
+    events, cursor, gap = log.since(20, subscribed={"MintA"})
+    assert _seqs(events) == [21, 22, 23, 24, 25]
+    assert (cursor, gap) == (25, False)
+    # oldest still held: no gap; one before that was evicted
+    assert log.since(15, subscribed={"MintA"})[2] is False
+    events, cursor, gap = log.since(3, subscribed={"MintA"})
+    assert gap and _seqs(events) == list(range(16, 26))
+
+
+def test_cursor_from_a_previous_run_replays_everything_with_a_gap():
+    log = _log(5)
+    events, cursor, gap = log.since(900, subscribed={"MintA"})
+    assert gap
+    assert _seqs(events) == [1, 2, 3, 4, 5]
+    assert cursor == 5
+
+
+def test_limit_returns_the_last_delivered_seq_as_cursor():
+    log = _log(10)
+    events, cursor, gap = log.since(0, subscribed={"MintA"}, limit=3)
+    assert _seqs(events) == [1, 2, 3] and cursor == 3 and not gap
+    events, cursor, _ = log.since(cursor, subscribed={"MintA"}, limit=3)
+    assert _seqs(events) == [4, 5, 6] and cursor == 6
+    # filtered out events are scanned past: the cursor still reaches the end
+    events, cursor, _ = log.since(0, subscribed=None, limit=100)
+    assert _seqs(events) == [2, 4, 6, 8, 10] and cursor == 10
+
+
+def test_empty_log():
+    log = EventLog(capacity=5)
+    assert log.first_seq == 1
+    assert log.since(0) == ([], 0, False)
+
+
+def test_read_falls_back_to_the_capped_collection(monkeypatch):
+    async def run():
+        collection = AsyncMongoMockClient()["feed_test"].feed_events
+
+        async def already_exists(name, **options):
+            # mongomock can't create capped collections; load() treats an existing one the same way
+            assert options["capped"]
+            raise CollectionInvalid(f"collection {name} already exists")
+
+        monkeypatch.setattr(collection.database, "create_collection", already_exists)
+        log = EventLog(capacity=5, collection=collection)
+        await log.load(store_bytes=1024 * 1024)
+        for i in range(1, 13):
+            log.append("transaction", "MintA" if i % 2 else None, json.dumps({"n": i}))
+            await log.flush()
+        first_page = await log.read(2, subscribed={"MintA"}, limit=3)
+        rest = await log.read(first_page[1], subscribed={"MintA"})
+        in_memory = await log.read(rest[1], subscribed={"MintA"})
+        filtered = await log.read(0, subscribed={"MintB"})
+
+        await collection.delete_many({"_id": {"$lte": 4}})  # overwritten in the capped collection too
+        lost = await log.read(1, subscribed={"MintA"})
+
+        reloaded = EventLog(capacity=5, collection=collection)
+        await reloaded.load()
+        return log, first_page, rest, in_memory, filtered, lost, reloaded
+
+    log, first_page, rest, in_memory, filtered, lost, reloaded = asyncio.run(run())
+    assert log.first_seq == 8 and log.saved == 12
+    events, cursor, gap = first_page
+    assert _seqs(events) == [3, 4, 5] and cursor == 5 and not gap
+    # the store read stops where the memory segment starts
+    events, cursor, gap = rest
+    assert _seqs(events) == [6, 7] and cursor == 7 and not gap
+    assert _seqs(in_memory[0]) == [8, 9, 10, 11, 12]
+    assert _seqs(filtered[0]) == [2, 4, 6] and filtered[1] == 7
+    events, cursor, gap = lost
+    assert gap and _seqs(events) == [8, 9, 10, 11, 12]
+    # numbering continues across restarts from the stored events
+    assert reloaded.last_seq == 12 and reloaded.first_seq == 8
+    assert reloaded.append("x", None, "{}").seq == 13
+
+
+def test_wait_wakes_on_append_and_times_out():
+    async def run():
+        log = EventLog(capacity=5)
+        log.append("x", None, "{}")
+        assert await log.wait(0, timeout=0.01)
+        assert not await log.wait(1, timeout=0.01)
+        waiter = asyncio.ensure_future(log.wait(1, timeout=5))
+        await asyncio.sleep(0)
+        log.append("x", None, "{}")
+        return await waiter
+
+    assert asyncio.run(run())
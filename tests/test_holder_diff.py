@@ -0,0 +1,44 @@
+"""Diffing of ranked top-holder snapshots (entrants, exits, rank moves, balance deltas)."""
+from core.discovery import diff_holders
+
+
+def test_identical_snapshots_are_empty():
+    holders = [("a", 300.0), ("b", 200.0), ("c", 100.0)]
+    diff = diff_holders(holders, list(holders))
+    assert diff.empty
+    assert diff.changed_owners() == []
+
+
+def test_entered_exited_moved_and_balances():
+    previous = [("a", 300.0), ("b", 200.0), ("c", 100.0)]
+    current = [("b", 350.0), ("a", 300.0), ("d", 150.0)]
+    diff = diff_holders(previous, current)
+    assert diff.entered == [("d", 3, 150.0)]
+    assert diff.exited == [("c", 3, 100.0)]
+    assert diff.moved == [("b", 2, 1), ("a", 1, 2)]
+    assert diff.balances == [("b", 200.0, 350.0)]
+    assert not diff.empty
+    # "a" only changed rank: nothing to write for it
+    assert diff.changed_owners() == ["d", "b"]
+
+
+def test_balance_changes_within_tolerance_are_ignored():
+    diff = diff_holders([("a", 100.0)], [("a", 100.0 + 1e-12)])
+    assert diff.empty
+    assert diff_holders([("a", 100.0)], [("a", 100.5)], tolerance=1.0).empty
+
+
+def test_first_snapshot_enters_everyone():
+    diff = diff_holders([], [("a", 2.0), ("b", 1.0)])
+    assert diff.entered == [("a", 1, 2.0), ("b", 2, 1.0)]
+    assert diff.exited == diff.moved == diff.balances == []
+
+
+def test_to_dict_reports_deltas():
+    diff = diff_holders([("a", 10.0), ("b", 5.0)], [("b", 12.0), ("c", 1.0)])
+    assert diff.to_dict() == {
+        "entered": [{"owner": "c", "rank": 2, "balance": 1.0}],
+        "exited": [{"owner": "a", "previous_rank": 1, "previous_balance": 10.0}],
+        "moved": [{"owner": "b", "previous_rank": 2, "rank": 1}],
+        "balances": [{"owner": "b", "previous_balance": 5.0, "balance": 12.0, "delta": 7.0}],
+    }
@@ -0,0 +1,111 @@
+"""Per-wallet, per-mint positions and realized PnL under both cost methods."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from core.positions import PositionEngine
+
+T0 = datetime(2024, 1, 1)
+
+
+def _tx(i: int, action: str, amount: float, price, wallet: str = "w1", mint: str = "MintA"):
+    return {"_id": f"tx{i}", "wallet": wallet, "token_address": mint, "action_type": action, "amount": amount,
+            "price": price, "timestamp": T0 + timedelta(seconds=i)}
+
+
+def _apply(engine: PositionEngine, rows):
+    for i, row in enumerate(rows):
+        engine.apply(_tx(i, *row))
+
+
+def test_average_cost_realized_pnl():
+    engine = PositionEngine("average")
+    _apply(engine, [("buy", 10, 1.0), ("buy", 10, 3.0), ("sell", 5, 4.0)])
+    pos = engine.positions[("w1", "MintA")]
+    # avg cost 2.0: 5 * (4 - 2)
+    assert pos.realized_pnl == pytest.approx(10.0)
+    assert pos.net_position == 15
+    assert pos.avg_cost_basis == pytest.approx(2.0)
+
+
+def test_fifo_realized_pnl_consumes_oldest_lots():
+    engine = PositionEngine("fifo")
+    _apply(engine, [("buy", 10, 1.0), ("buy", 10, 3.0), ("sell", 15, 4.0)])
+    pos = engine.positions[("w1", "MintA")]
+    # 10 @ 1.0 then 5 @ 3.0 matched against 15 @ 4.0
+    assert pos.realized_pnl == pytest.approx(15 * 4.0 - (10 * 1.0 + 5 * 3.0))
+    assert list(pos.lots) == [[5.0, 3.0]]
+    assert pos.avg_cost_basis == pytest.approx(3.0)
+
+
+def test_selling_more_than_held_only_realizes_the_held_part():
+    engine = PositionEngine("average")
+    _apply(engine, [("buy", 4, 2.0), ("sell", 10, 5.0), ("buy", 6, 1.0)])
+    pos = engine.positions[("w1", "MintA")]
+    assert pos.realized_pnl == pytest.approx(4 * (5.0 - 2.0))
+    # the buy covers the 6 short first, leaving nothing held and no basis
+    assert pos.net_position == 0
+    assert pos.avg_cost_basis is None
+
+
+def test_missing_price_marks_at_the_mints_last_price():
+    engine = PositionEngine("average")
+    _apply(engine, [("buy", 10, 2.0), ("sell", 10, None)])
+    assert engine.positions[("w1", "MintA")].realized_pnl == pytest.approx(0.0)
+
+
+def test_mints_keep_separate_positions():
+    engine = PositionEngine("fifo")
+    _apply(engine, [("buy", 10, 1.0, "w1", "MintA"), ("buy", 5, 10.0, "w1", "MintB"),
+                    ("sell", 5, 2.0, "w1", "MintA"), ("sell", 5, 8.0, "w1", "MintB")])
+    assert engine.positions[("w1", "MintA")].realized_pnl == pytest.approx(5.0)
+    assert engine.positions[("w1", "MintB")].realized_pnl == pytest.approx(-10.0)
+
+
+def test_unknown_cost_method_is_rejected():
+    with pytest.raises(ValueError):
+        PositionEngine("lifo")
+
+
+def test_flush_reload_and_replay():
+    async def run():
+        db = AsyncMongoMockClient()["positions_test"]
+        rows = [("buy", 10, 1.0), ("buy", 10, 3.0), ("sell", 15, 4.0), ("buy", 2, 5.0, "w2", "MintB")]
+        txs = [_tx(i, *row) for i, row in enumerate(rows)]
+
+        engine = PositionEngine("fifo")
+        for tx in txs:
+            await engine.ensure_loaded(db.wallets, tx["wallet"], tx["token_address"])
+            engine.apply(tx)
+        assert await engine.flush(db.wallets) == 2
+        stored = await db.wallets.find_one({"address": "w1"})
+
+        reloaded = PositionEngine("fifo")
+        await reloaded.ensure_loaded(db.wallets, "w1", "MintA")
+
+        await db.transactions.insert_many([dict(tx) for tx in txs])
+        # a stale position and pre-per-mint fields that the history no longer supports
+        await db.wallets.update_one({"address": "w1"}, {"$set": {"positions.Gone": {"net_position": 3.0},
+                                                                 "net_position": 1.0, "total_buys": 0}})
+        replayed = PositionEngine("fifo")
+        count = await replayed.replay(db.transactions, db.wallets, until=txs[2]["timestamp"], skip={"tx1"})
+        cleared = await replayed.clear_stale(db.wallets)
+        after = await db.wallets.find_one({"address": "w1"})
+        return stored, reloaded, replayed, count, cleared, after
+
+    stored, reloaded, replayed, count, cleared, after = asyncio.run(run())
+    # a wallet first written by the engine is neither tracked nor untracked
+    assert "active" not in stored
+    assert stored["positions"]["MintA"]["profit_loss"] == pytest.approx(35.0)
+    assert stored["positions"]["MintA"]["open_lots"] == [[5.0, 3.0]]
+    assert list(reloaded.positions[("w1", "MintA")].lots) == [[5.0, 3.0]]
+
+    # tx1 skipped and tx3 past `until`: 10 @ 1.0 bought, then 15 sold with only 10 held
+    assert count == 2
+    assert replayed.positions[("w1", "MintA")].realized_pnl == pytest.approx(10 * (4.0 - 1.0))
+    assert ("w2", "MintB") not in replayed
+    assert cleared == 2
+    assert set(after["positions"]) == {"MintA"}
+    assert "net_position" not in after and "total_buys" not in after
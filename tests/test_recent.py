@@ -0,0 +1,82 @@
+"""In-memory "latest N transactions" rings (core.recent)."""
+import json
+from datetime import datetime, timedelta
+
+from core.recent import RecentTransactions, _Ring, _sort_key, json_array
+
+T0 = datetime(2024, 1, 1)
+
+
+def _entry(i: int, wallet: str = "w1", mint: str = "MintA"):
+    doc = {"_id": f"tx{i}", "wallet": wallet, "token_address": mint, "timestamp": T0 + timedelta(seconds=i)}
+    return doc, json.dumps({"_id": doc["_id"]})
+
+
+def _add(ring: _Ring, *indexes: int):
+    for i in indexes:
+        doc, raw = _entry(i)
+        ring.add(_sort_key(doc), (doc, raw))
+
+
+def _ids(entries):
+    return [doc["_id"] for doc, _ in entries]
+
+
+def test_sort_key_accepts_iso_strings():
+    assert _sort_key({"timestamp": T0}) == _sort_key({"timestamp": T0.isoformat()})
+    assert _sort_key({}) == 0.0
+
+
+def test_add_keeps_timestamp_order_and_drops_the_oldest():
+    ring = _Ring(3)
+    _add(ring, 5, 2, 8)
+    assert _ids(ring.entries) == ["tx2", "tx5", "tx8"]
+    _add(ring, 6)  # overflow drops the oldest
+    assert _ids(ring.entries) == ["tx5", "tx6", "tx8"]
+    _add(ring, 1)  # older than everything kept: ignored
+    assert _ids(ring.entries) == ["tx5", "tx6", "tx8"]
+    assert ring.keys == sorted(ring.keys)
+
+
+def test_prime_merges_without_duplicating_ingested_entries():
+    ring = _Ring(5)
+    _add(ring, 9)  # ingested while the priming query ran
+    assert ring.latest(1) is None  # not complete yet
+    ring.prime([_entry(i) for i in (9, 8, 7)])
+    assert ring.complete
+    assert _ids(ring.entries) == ["tx7", "tx8", "tx9"]
+
+
+def test_latest_is_newest_first_and_refuses_reads_past_a_full_ring():
+    ring = _Ring(3)
+    ring.prime([_entry(i) for i in (1, 2)])
+    assert _ids(ring.latest(5)) == ["tx2", "tx1"]  # not full: this is everything there is
+    _add(ring, 3, 4)
+    assert _ids(ring.latest(2)) == ["tx4", "tx3"]
+    assert _ids(ring.latest(3)) == ["tx4", "tx3", "tx2"]
+    # full ring: older rows may exist beyond it
+    assert ring.latest(4) is None
+    assert ring.latest(0) is None
+
+
+def test_scopes_share_entries_and_count_hits():
+    recent = RecentTransactions(capacity=10, wallet_capacity=2, max_wallets=1)
+    recent.all.prime([])
+    recent.track_token("MintA").prime([])
+    recent.open_wallet("w1").prime([])
+    for i, mint in enumerate(("MintA", "MintB", "MintA")):
+        recent.add(*_entry(i, mint=mint))
+    assert _ids(recent.latest(10)) == ["tx2", "tx1", "tx0"]
+    assert _ids(recent.latest(10, token="MintA")) == ["tx2", "tx0"]
+    assert recent.latest(10, token="MintB") is None  # untracked mint: read from Mongo
+    assert recent.latest_for_wallet("w1", 3) is None  # beyond the wallet ring's capacity
+    assert _ids(recent.latest_for_wallet("w1", 2)) == ["tx2", "tx1"]
+    recent.open_wallet("w2")  # evicts w1
+    assert recent.latest_for_wallet("w1", 1) is None
+    assert (recent.hits, recent.misses) == (3, 3)
+
+
+def test_json_array_joins_the_serialized_entries():
+    entries = [_entry(1), _entry(2)]
+    assert json.loads(json_array(entries)) == [{"_id": "tx1"}, {"_id": "tx2"}]
+    assert json_array([]) == "[]"
@@ -0,0 +1,93 @@
+"""Coalescing of concurrent identical calls by core.singleflight."""
+import asyncio
+
+import pytest
+
+from core.singleflight import SingleFlight, make_key
+
+
+def test_make_key_ignores_dict_order():
+    assert make_key("getBalance", {"a": 1, "b": 2}) == make_key("getBalance", {"b": 2, "a": 1})
+    assert make_key("getBalance", ["x"]) != make_key("getBalance", ["y"])
+
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight("test")
+        started = 0
+        release = asyncio.Event()
+
+        async def fetch():
+            nonlocal started
+            started += 1
+            await release.wait()
+            return {"value": 42}
+
+        callers = [asyncio.ensure_future(flight.do("k", fetch)) for _ in range(10)]
+        other = asyncio.ensure_future(flight.do("other", fetch))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, other)
+        return flight, started, results
+
+    flight, started, results = asyncio.run(run())
+    assert started == 2
+    assert all(result == {"value": 42} for result in results)
+    assert flight.stats() == {"calls": 11, "executions": 2, "coalesced": 9, "in_flight": 0}
+
+
+def test_nothing_is_cached_after_completion():
+    async def run():
+        flight = SingleFlight("test")
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return len(calls)
+
+        return [await flight.do("k", fetch) for _ in range(3)]
+
+    assert asyncio.run(run()) == [1, 2, 3]
+
+
+def test_errors_reach_every_waiter():
+    async def run():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fail():
+            await release.wait()
+            raise RuntimeError("rpc down")
+
+        callers = [asyncio.ensure_future(flight.do("k", fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return flight, await asyncio.gather(*callers, return_exceptions=True)
+
+    flight, results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def run():
+        flight = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "done"
+
+        leaving = asyncio.ensure_future(flight.do("k", fetch))
+        staying = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return flight, await staying
+
+    flight, result = asyncio.run(run())
+    assert result == "done"
+    assert flight.executions == 1
@@ -0,0 +1,29 @@
+"""Dedupe of re-run transaction batches (core.storage.unstored)."""
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from core import storage
+
+
+def _unstored(stored, docs, **kwargs):
+    async def run():
+        collection = AsyncMongoMockClient()["storage_test"].realtime_transactions
+        await collection.insert_many(stored)
+        return await storage.unstored(collection, docs, **kwargs)
+    return asyncio.run(run())
+
+
+def test_rows_sharing_a_signature_are_kept():
+    # both sides of a transfer: one signature, two rows
+    stored = [{"_id": "tx1", "signature": "sig", "wallet": "sender"}]
+    batch = [{"_id": "tx1", "signature": "sig", "wallet": "sender"},
+             {"_id": "tx2", "signature": "sig", "wallet": "receiver"}]
+    assert _unstored(stored, batch) == [batch[1]]
+
+
+def test_dedupe_by_signature_on_request():
+    stored = [{"_id": "a", "signature": "sig1"}]
+    batch = [{"_id": "b", "signature": "sig1"}, {"_id": "c", "signature": "sig2"}]
+    assert _unstored(stored, batch, key="signature") == [batch[1]]
+    assert _unstored(stored, [], key="signature") == []
@@ -0,0 +1,73 @@
+"""Array-backed wallet registry: swap-remove, balance refresh, paging and column round-trips."""
+from array import array
+from datetime import datetime
+
+import pytest
+
+from core.wallet_registry import WalletRegistry
+
+
+def _registry(n: int) -> WalletRegistry:
+    registry = WalletRegistry()
+    for i in range(n):
+        registry.add(f"w{i}", balance=float(i), token_amount=float(i * 10), tracked_since=datetime(2024, 1, 1, i))
+    return registry
+
+
+def _assert_consistent(registry: WalletRegistry):
+    assert len(registry._index) == len(registry._addresses) == len(registry._balances) \
+        == len(registry._token_amounts) == len(registry._tracked_since)
+    for address, idx in registry._index.items():
+        assert registry._addresses[idx] == address
+
+
+def test_remove_swaps_the_last_slot_into_the_hole():
+    registry = _registry(5)
+    assert registry.remove("w1")
+    _assert_consistent(registry)
+    assert registry.addresses() == ["w0", "w4", "w2", "w3"]
+    # the moved wallet keeps its own columns
+    assert registry.get("w4") == {"address": "w4", "balance": 4.0, "token_amount": 40.0,
+                                  "tracked_since": datetime(2024, 1, 1, 4)}
+    assert "w1" not in registry and registry.get("w1") is None
+    assert not registry.remove("w1")
+
+
+def test_remove_last_and_only_wallets():
+    registry = _registry(2)
+    assert registry.remove("w1")
+    assert registry.remove("w0")
+    _assert_consistent(registry)
+    assert len(registry) == 0 and registry.random_address() is None
+
+
+def test_add_existing_refreshes_known_balances_only():
+    registry = _registry(1)
+    assert not registry.add("w0", balance=7.5)
+    assert registry.get("w0")["balance"] == 7.5
+    assert registry.get("w0")["token_amount"] == 0.0
+    assert registry.add("new")
+    assert registry.get("new")["balance"] is None and registry.get("new")["token_amount"] is None
+
+
+def test_page_wraps_around():
+    registry = _registry(5)
+    assert registry.page(3, 4) == ["w3", "w4", "w0", "w1"]
+    assert registry.page(8, 2) == ["w3", "w4"]
+    assert registry.page(0, 10) == ["w0", "w1", "w2", "w3", "w4"]
+    assert WalletRegistry().page(0, 3) == []
+
+
+def test_columns_round_trip():
+    registry = _registry(3)
+    registry.remove("w0")
+    restored = WalletRegistry.from_columns(*registry.columns())
+    assert restored.addresses() == registry.addresses()
+    assert [restored.get(a) for a in restored] == [registry.get(a) for a in registry]
+
+
+def test_from_columns_rejects_bad_columns():
+    with pytest.raises(ValueError):
+        WalletRegistry.from_columns(["a", "b"], array("d", [1.0]), array("d", [1.0]), array("d", [1.0]))
+    with pytest.raises(ValueError):
+        WalletRegistry.from_columns(["a", "a"], array("d", [1.0, 2.0]), array("d", [1.0, 2.0]), array("d", [1.0, 2.0]))